@@ -0,0 +1,47 @@
+"""
+Compare CircleBounds.contains, which preselects points with a box in RA, Dec
+before computing angular distances, with computing the angular distance of
+every point from the center of the circle.
+
+Usage:
+
+    python benchmarkBoundsContains.py [n_points]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+from lsst.sims.utils import CircleBounds, BoxBounds, haversine
+
+
+def haversine_only(bounds, ra, dec):
+    return haversine(np.radians(ra), np.radians(dec), bounds.RA, bounds.DEC) < bounds.radius
+
+
+def time_function(func, *args):
+    t_start = time.time()
+    func(*args)
+    return time.time() - t_start
+
+
+if __name__ == "__main__":
+
+    n_points = 10000000
+    if len(sys.argv) > 1:
+        n_points = int(sys.argv[1])
+
+    # a catalog covering a patch of sky 20 degrees on a side
+    rng = np.random.RandomState(18)
+    ra = 40.0 + (rng.random_sample(n_points) - 0.5)*20.0
+    dec = -30.0 + (rng.random_sample(n_points) - 0.5)*20.0
+
+    print('%-10s %15s %15s %15s' % ('radius', 'contains (s)', 'haversine (s)', 'box (s)'))
+    for radius in (0.5, 2.0, 8.0):
+        circle = CircleBounds(np.radians(40.0), np.radians(-30.0), np.radians(radius))
+        box = BoxBounds(np.radians(40.0), np.radians(-30.0), np.radians(radius))
+        np.testing.assert_array_equal(circle.contains(ra, dec), haversine_only(circle, ra, dec))
+        print('%-10.1f %15.4f %15.4f %15.4f' %
+              (radius,
+               time_function(circle.contains, ra, dec),
+               time_function(haversine_only, circle, ra, dec),
+               time_function(box.contains, ra, dec)))
@@ -0,0 +1,73 @@
+"""
+Compare the vectorized gnomonic projection used by _pupilCoordsFromObserved
+with palpy, for chunks of points some of which cannot be projected (i.e.
+are more than 90 degrees from the telescope pointing).
+
+palpy.ds2tpVector raises an exception for such chunks in some versions of
+palpy; before _gnomonicProjection, _pupilCoordsFromObserved then fell back
+to calling palpy.ds2tp once per point.  That fallback is timed as
+'palpy loop'.
+
+Usage:
+
+    python benchmarkGnomonicProjection.py [n_points]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+import palpy
+from lsst.sims.utils.FocalPlaneUtils import _gnomonicProjection
+
+
+def palpy_loop(ra, dec, ra_pointing, dec_pointing):
+    """
+    The per-point fallback formerly used by _pupilCoordsFromObserved
+    """
+    x = []
+    y = []
+    for rr, dd in zip(ra, dec):
+        try:
+            xx, yy = palpy.ds2tp(rr, dd, ra_pointing, dec_pointing)
+        except ValueError:
+            xx = np.NaN
+            yy = np.NaN
+        x.append(xx)
+        y.append(yy)
+    return np.array(x), np.array(y)
+
+
+def palpy_vector(ra, dec, ra_pointing, dec_pointing):
+    try:
+        return palpy.ds2tpVector(ra, dec, ra_pointing, dec_pointing)
+    except ValueError:
+        return palpy_loop(ra, dec, ra_pointing, dec_pointing)
+
+
+def time_function(func, *args):
+    t_start = time.time()
+    func(*args)
+    return time.time() - t_start
+
+
+if __name__ == "__main__":
+
+    n_points = 1000000
+    if len(sys.argv) > 1:
+        n_points = int(sys.argv[1])
+
+    rng = np.random.RandomState(61)
+    ra_pointing = 1.0
+    dec_pointing = -0.5
+    ra = ra_pointing + (rng.random_sample(n_points)-0.5)*0.05
+    dec = dec_pointing + (rng.random_sample(n_points)-0.5)*0.05
+
+    print('%-20s %15s %15s %15s' % ('bad points', 'vectorized (s)', 'palpy (s)', 'palpy loop (s)'))
+    for n_bad in (0, 1, 1000):
+        ra_test = ra.copy()
+        ra_test[rng.choice(n_points, n_bad, replace=False)] = ra_pointing + np.pi
+        print('%-20d %15.4f %15.4f %15.4f' %
+              (n_bad,
+               time_function(_gnomonicProjection, ra_test, dec, ra_pointing, dec_pointing),
+               time_function(palpy_vector, ra_test, dec, ra_pointing, dec_pointing),
+               time_function(palpy_loop, ra_test, dec, ra_pointing, dec_pointing)))
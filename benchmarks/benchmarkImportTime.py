@@ -0,0 +1,57 @@
+"""
+Measure how long it takes to import lsst.sims.utils (or one of its names)
+in a fresh python interpreter, and which of its heavy dependencies
+(astropy, healpy, palpy, future) each import actually loads.
+
+Usage:
+
+    python benchmarkImportTime.py [n_trials]
+"""
+from __future__ import print_function
+import os
+import sys
+import subprocess
+import numpy as np
+
+heavy_dependencies = ['astropy', 'healpy', 'palpy', 'future']
+
+entry_points = ["import lsst.sims.utils",
+                "from lsst.sims.utils import m5_flat_sed",
+                "from lsst.sims.utils import stellarMags",
+                "from lsst.sims.utils import angularSeparation",
+                "from lsst.sims.utils import ModifiedJulianDate",
+                "from lsst.sims.utils import ObservationMetaData",
+                "from lsst.sims.utils import healbin",
+                "from lsst.sims.utils import pupilCoordsFromRaDec",
+                "from lsst.sims.utils import *"]
+
+
+def time_import(statement):
+    """
+    Execute statement in a fresh python interpreter.  Return the wall clock
+    time it took (in seconds) and the list of heavy dependencies it loaded.
+    """
+    script = ("import sys, time\n" +
+              "import numpy\n" +
+              "t_start = time.time()\n" +
+              statement + "\n" +
+              "print(time.time() - t_start)\n" +
+              "print(' '.join(sorted(set(m.split('.')[0] for m in sys.modules))))")
+
+    output = subprocess.check_output([sys.executable, "-c", script], env=os.environ)
+    lines = output.decode('utf-8').strip().split('\n')
+    loaded = set(lines[-1].split())
+    return float(lines[-2]), [dep for dep in heavy_dependencies if dep in loaded]
+
+
+if __name__ == "__main__":
+
+    n_trials = 5
+    if len(sys.argv) > 1:
+        n_trials = int(sys.argv[1])
+
+    print('%-50s %12s   %s' % ('statement', 'median (s)', 'heavy dependencies loaded'))
+    for statement in entry_points:
+        results = [time_import(statement) for ii in range(n_trials)]
+        print('%-50s %12.4f   %s' % (statement, np.median([rr[0] for rr in results]),
+                                     ', '.join(results[0][1])))
@@ -0,0 +1,41 @@
+"""
+Compare the cost of calculating the RA, Dec of every pixel of a sensor-sized
+grid with raDecFromPupilCoordsGrid and with raDecFromPupilCoords.
+
+Usage:
+
+    python benchmarkPupilCoordsGrid.py [n_pixels_per_side]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+from lsst.sims.utils import ObservationMetaData
+from lsst.sims.utils import _raDecFromPupilCoords, _raDecFromPupilCoordsGrid
+
+
+if __name__ == "__main__":
+
+    n_side = 2000
+    if len(sys.argv) > 1:
+        n_side = int(sys.argv[1])
+
+    obs = ObservationMetaData(pointingRA=10.0, pointingDec=10.0, rotSkyPos=33.0, mjd=59580.05)
+
+    # a sensor (about 13 arcminutes on a side) away from the center of the focal plane
+    xPupil = np.linspace(0.01, 0.0138, n_side)
+    yPupil = np.linspace(-0.02, -0.0162, n_side)
+
+    # warm up (e.g. loading the IERS tables)
+    _raDecFromPupilCoords(xPupil[:10], yPupil[:10], obs_metadata=obs)
+
+    for dtype in (np.float64, np.float32):
+        t_start = time.time()
+        _raDecFromPupilCoordsGrid(xPupil, yPupil, obs, dtype=dtype)
+        print('grid interpolation (%s) of %d pixels: %.4f s' %
+              (np.dtype(dtype).name, n_side*n_side, time.time() - t_start))
+
+    t_start = time.time()
+    xMesh, yMesh = np.meshgrid(xPupil, yPupil)
+    _raDecFromPupilCoords(xMesh.flatten(), yMesh.flatten(), obs_metadata=obs)
+    print('exact transformation of %d pixels: %.4f s' % (n_side*n_side, time.time() - t_start))
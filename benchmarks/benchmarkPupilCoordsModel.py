@@ -0,0 +1,51 @@
+"""
+Compare the cost of transforming positions between ICRS RA, Dec and pupil
+coordinates with PupilCoordsModel and with the exact transformations.
+
+Usage:
+
+    python benchmarkPupilCoordsModel.py [n_points]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+from lsst.sims.utils import ObservationMetaData, PupilCoordsModel
+from lsst.sims.utils import _pupilCoordsFromRaDec, _raDecFromPupilCoords
+
+
+if __name__ == "__main__":
+
+    n_points = 1000000
+    if len(sys.argv) > 1:
+        n_points = int(sys.argv[1])
+
+    obs = ObservationMetaData(pointingRA=10.0, pointingDec=10.0, rotSkyPos=33.0, mjd=59580.05)
+
+    t_start = time.time()
+    model = PupilCoordsModel(obs)
+    print('fitting the model: %.4f s (max residuals %.2e, %.2e arcsec)' %
+          (time.time() - t_start, model.maxResidual, model.maxInverseResidual))
+
+    # points within the fitted field of view
+    rng = np.random.RandomState(44)
+    rr = np.radians(1.7)*np.sqrt(rng.random_sample(n_points))
+    theta = rng.random_sample(n_points)*2.0*np.pi
+    ra = np.radians(10.0) + rr*np.cos(theta)/np.cos(np.radians(10.0))
+    dec = np.radians(10.0) + rr*np.sin(theta)
+
+    t_start = time.time()
+    xPupil, yPupil = _pupilCoordsFromRaDec(ra, dec, obs_metadata=obs)
+    t_exact = time.time() - t_start
+    t_start = time.time()
+    model._pupilCoordsFromRaDec(ra, dec)
+    t_model = time.time() - t_start
+    print('pupil coordinates of %d points: exact %.4f s, model %.4f s' % (n_points, t_exact, t_model))
+
+    t_start = time.time()
+    _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=obs)
+    t_exact = time.time() - t_start
+    t_start = time.time()
+    model._raDecFromPupilCoords(xPupil, yPupil)
+    t_model = time.time() - t_start
+    print('RA, Dec of %d points: exact %.4f s, model %.4f s' % (n_points, t_exact, t_model))
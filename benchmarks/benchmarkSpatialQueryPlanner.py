@@ -0,0 +1,93 @@
+"""
+Compare querying a catalog once per visit (with each visit's to_SQL) with
+querying it once per region planned by SpatialQueryPlanner, using an
+SQLite database as a stand-in for the catalog database.
+
+The visits are a deep drilling field visited many times (with small dithers)
+plus a number of visits scattered over the sky.  For each approach, the
+number of queries (round trips), the number of rows transferred and the
+time spent are printed.
+
+Usage:
+
+    python benchmarkSpatialQueryPlanner.py [n_stars] [n_deep_visits]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import numpy as np
+import healpy as hp
+from lsst.sims.utils import ObservationMetaDataBatch, SpatialQueryPlanner
+
+# the SQLite stand-in for the catalog database is shared with the unit tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests'))
+from testModules.pointDatabase import createPointDatabase  # noqa: E402
+
+
+def fetch(connection, where):
+    rows = connection.execute('SELECT id, ra, dec FROM stars WHERE %s' % where).fetchall()
+    return np.array(rows).reshape(len(rows), 3)
+
+
+def query_per_visit(connection, boundsList):
+    n_rows = 0
+    visit_rows = []
+    for bounds in boundsList:
+        rows = fetch(connection, bounds.to_SQL('ra', 'dec'))
+        n_rows += len(rows)
+        visit_rows.append(rows[:, 0])
+    return len(boundsList), n_rows, visit_rows
+
+
+def query_planned(connection, planner, use_healpix):
+    n_rows = 0
+    visit_rows = [[] for bounds in planner.boundsList]
+    for region in planner.regions:
+        if use_healpix:
+            rows = fetch(connection, region.to_healpixSQL('hpid'))
+        else:
+            rows = fetch(connection, region.to_SQL('ra', 'dec'))
+        n_rows += len(rows)
+        for visit, dex in planner.visitRows(region, rows[:, 1], rows[:, 2]):
+            visit_rows[visit].append(rows[dex, 0])
+    return len(planner.regions), n_rows, [np.concatenate(rows) for rows in visit_rows]
+
+
+if __name__ == "__main__":
+
+    n_stars = 1000000
+    n_deep = 500
+    if len(sys.argv) > 1:
+        n_stars = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        n_deep = int(sys.argv[2])
+
+    nside = 64
+    rng = np.random.RandomState(77)
+    ra = rng.random_sample(n_stars)*360.0
+    dec = np.degrees(np.arcsin(rng.random_sample(n_stars)*2.0 - 1.0))
+    hpid = hp.ang2pix(nside, np.radians(90.0 - dec), np.radians(ra), nest=True)
+    connection = createPointDatabase(ra, dec, hpid=hpid, tableName='stars')
+
+    raVisit = np.concatenate((53.1 + rng.normal(0.0, 0.2, n_deep), rng.random_sample(50)*360.0))
+    decVisit = np.concatenate((-28.1 + rng.normal(0.0, 0.2, n_deep), rng.random_sample(50)*60.0 - 80.0))
+    batch = ObservationMetaDataBatch(raVisit, decVisit, 59580.0 + np.arange(len(raVisit)),
+                                     boundType='circle', boundLength=1.75)
+    boundsList = [obs.bounds for obs in batch]
+
+    print('%-28s %10s %15s %10s' % ('', 'queries', 'rows', 'time (s)'))
+
+    t_start = time.time()
+    n_queries, n_rows, control = query_per_visit(connection, boundsList)
+    print('%-28s %10d %15d %10.2f' % ('one query per visit', n_queries, n_rows, time.time() - t_start))
+
+    for use_healpix in (True, False):
+        t_start = time.time()
+        planner = SpatialQueryPlanner(boundsList, nside=nside)
+        n_queries, n_rows, test = query_planned(connection, planner, use_healpix)
+        label = 'planned (%s)' % ('HEALPix ranges' if use_healpix else 'RA, Dec')
+        print('%-28s %10d %15d %10.2f' % (label, n_queries, n_rows, time.time() - t_start))
+
+        for control_rows, test_rows in zip(control, test):
+            np.testing.assert_array_equal(np.sort(control_rows), np.sort(test_rows))
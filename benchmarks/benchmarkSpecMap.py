@@ -0,0 +1,50 @@
+"""
+Compare resolving the sedFilename of every object in a catalog one at a
+time with SpecMap.__getitem__ (with and without its memo of regular
+expression look-ups) with resolving them all at once with
+SpecMap.resolve_many.  The catalog draws its names from a few thousand
+distinct spectra, as real catalogs do.
+
+Usage:
+
+    python benchmarkSpecMap.py [n_objects] [n_spectra]
+"""
+from __future__ import print_function
+from builtins import range
+import sys
+import time
+import numpy as np
+from lsst.sims.utils import SpecMap
+
+
+if __name__ == "__main__":
+
+    n_objects = 1000000
+    n_spectra = 3000
+    if len(sys.argv) > 1:
+        n_objects = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        n_spectra = int(sys.argv[2])
+
+    rng = np.random.RandomState(812)
+    templates = ['kp10_%d.fits_g40_%d', 'km30_%d.fits_g10_%d', 'lte%03d-3.5-0.0a+0.0.BT-Settl.spec_%d',
+                 'bergeron_%d_85.dat_%d', 'Exp.%dE08.02Z.spec_%d', 'burrows+2006c91.21_T%d_g5.5_cf_%d']
+    spectra = [templates[ii % len(templates)] % (ii, 100 + ii) for ii in range(n_spectra)]
+    names = np.array(spectra)[rng.randint(0, n_spectra, n_objects)]
+
+    print('%-32s %10s' % ('', 'time (s)'))
+
+    results = []
+    for label, memoSize in (('one at a time, no memo', 0), ('one at a time, memoized', 10000)):
+        specMap = SpecMap(memoSize=memoSize)
+        t_start = time.time()
+        results.append([specMap[name] for name in names])
+        print('%-32s %10.2f' % (label, time.time() - t_start))
+
+    specMap = SpecMap()
+    t_start = time.time()
+    results.append(specMap.resolve_many(names).tolist())
+    print('%-32s %10.2f' % ('resolve_many', time.time() - t_start))
+
+    for test in results[1:]:
+        assert test == results[0]
@@ -6,7 +6,8 @@ from lsst.sims.utils import arcsecFromRadians, cartesianFromSpherical, spherical
 from lsst.sims.utils import radiansFromArcsec
 from lsst.sims.utils import haversine
 
-__all__ = ["_solarRaDec", "solarRaDec",
+__all__ = ["AstrometryContext",
+           "_solarRaDec", "solarRaDec",
            "_distanceToSun", "distanceToSun",
            "applyRefraction", "refractionCoefficients",
            "_applyPrecession", "applyPrecession",
@@ -16,51 +17,250 @@ __all__ = ["_solarRaDec", "solarRaDec",
            "_observedFromAppGeo", "observedFromAppGeo",
            "_appGeoFromObserved", "appGeoFromObserved",
            "_observedFromICRS", "observedFromICRS",
-           "_icrsFromObserved", "icrsFromObserved"]
+           "_icrsFromObserved", "icrsFromObserved",
+           "_observedFromICRSMultiVisit", "observedFromICRSMultiVisit"]
 
 
-def _solarRaDec(mjd, epoch=2000.0):
+class AstrometryContext(object):
+    """
+    This class caches the star-independent parameters that PALPY needs
+    to transform between ICRS, apparent geocentric and observed coordinates
+    for a single ObservationMetaData (i.e. the outputs of palpy.mappa and
+    palpy.aoppa).  Computing those parameters is much more expensive than
+    applying them to a modest number of stars, so code that makes many
+    calls to the transformations in this module for the same telescope
+    pointing should build one AstrometryContext and pass it to each of
+    those calls as the kwarg 'context'.
+
+    Parameters are computed lazily and memoized by epoch (for palpy.mappa)
+    and by (wavelength, includeRefraction) (for palpy.aoppa).  If the mjd
+    or site of the underlying ObservationMetaData is changed, the cached
+    parameters are discarded.
+    """
+
+    def __init__(self, obs_metadata):
+        """
+        @param [in] obs_metadata is the ObservationMetaData characterizing
+        the telescope site and the date of the observation
+        """
+        if obs_metadata is None:
+            raise RuntimeError("Cannot instantiate AstrometryContext; obs_metadata is None")
+
+        self._obs_metadata = obs_metadata
+        self._mjd = obs_metadata.mjd
+        self._site = obs_metadata.site
+        self._mappa_cache = {}
+        self._aoppa_cache = {}
+
+    @property
+    def obs_metadata(self):
+        """
+        The ObservationMetaData characterized by this AstrometryContext
+        """
+        return self._obs_metadata
+
+    @property
+    def mjd(self):
+        """
+        The ModifiedJulianDate of the ObservationMetaData characterized
+        by this AstrometryContext
+        """
+        self._check_state()
+        return self._mjd
+
+    def _check_state(self):
+        """
+        Discard the cached parameters if the mjd or site of the
+        underlying ObservationMetaData has been changed since they
+        were computed.
+        """
+        if self._obs_metadata.mjd is not self._mjd or self._obs_metadata.site is not self._site:
+            self._mjd = self._obs_metadata.mjd
+            self._site = self._obs_metadata.site
+            self._mappa_cache = {}
+            self._aoppa_cache = {}
+
+    def mappaParams(self, epoch):
+        """
+        @param [in] epoch is the julian epoch (in years) of the mean equinox
+
+        @param [out] the numpy array of star-independent mean-to-apparent
+        parameters calculated by palpy.mappa
+        """
+        self._check_state()
+
+        if epoch not in self._mappa_cache:
+            if self._mjd is None:
+                raise RuntimeError("Cannot calculate mean-to-apparent parameters; "
+                                   "obs_metadata.mjd is None")
+            self._mappa_cache[epoch] = palpy.mappa(epoch, self._mjd.TDB)
+
+        return self._mappa_cache[epoch]
+
+    def aoppaParams(self, wavelength, includeRefraction):
+        """
+        @param [in] wavelength is the effective wavelength in microns
+
+        @param [in] includeRefraction is a boolean indicating whether or not
+        to include the effects of refraction
+
+        @param [out] the numpy array of observatory parameters calculated by
+        palpy.aoppa
+        """
+        self._check_state()
+
+        key = (wavelength, bool(includeRefraction))
+        if key not in self._aoppa_cache:
+            self._aoppa_cache[key] = _calculateObservatoryParameters(self._obs_metadata,
+                                                                     wavelength,
+                                                                     includeRefraction)
+        return self._aoppa_cache[key]
+
+
+def _resolveObsMetaData(obs_metadata, context, method_name):
+    """
+    Reconcile the obs_metadata and context kwargs passed to one of the
+    coordinate transformations.
+
+    @param [in] obs_metadata is an ObservationMetaData or None
+
+    @param [in] context is an AstrometryContext or None
+
+    @param [in] method_name is the name of the calling method
+    (for constructing helpful error messages)
+
+    @param [out] the ObservationMetaData to be used by the calling method
+    """
+    if context is None:
+        return obs_metadata
+
+    if obs_metadata is None:
+        return context.obs_metadata
+
+    if obs_metadata is not context.obs_metadata:
+        raise RuntimeError("The obs_metadata passed to %s " % method_name +
+                           "is not the ObservationMetaData characterized by context")
+
+    return obs_metadata
+
+
+def _mappaParams(epoch, mjd, context):
+    """
+    Return the output of palpy.mappa(epoch, mjd.TDB), using the
+    parameters cached in context if possible.
+
+    @param [in] epoch is the julian epoch (in years) of the mean equinox
+
+    @param [in] mjd is a ModifiedJulianDate or None (in which case the
+    mjd of context is used)
+
+    @param [in] context is an AstrometryContext or None
+    """
+    if context is None:
+        return palpy.mappa(epoch, mjd.TDB)
+
+    if mjd is not None and mjd is not context.mjd:
+        raise RuntimeError("The mjd you passed in is not the mjd of the "
+                           "ObservationMetaData characterized by context")
+
+    return context.mappaParams(epoch)
+
+
+def _groupByVisit(visit_index, n_visits, method_name):
+    """
+    Sort the rows of a multi-visit calculation by visit.
+
+    @param [in] visit_index is a numpy array of ints indicating which
+    visit each row belongs to
+
+    @param [in] n_visits is the number of visits available
+
+    @param [in] method_name is the name of the calling method
+    (for constructing helpful error messages)
+
+    @param [out] a list of (visit, row_indices) tuples, one per distinct
+    visit in visit_index; row_indices is a numpy array of the rows
+    belonging to that visit
+    """
+    if not isinstance(visit_index, np.ndarray) or \
+       not np.issubdtype(visit_index.dtype, np.integer):
+
+        raise RuntimeError("The visit_index passed to %s " % method_name +
+                           "must be a numpy array of ints")
+
+    if len(visit_index) == 0:
+        return []
+
+    if visit_index.min() < 0 or visit_index.max() >= n_visits:
+        raise RuntimeError("The visit_index passed to %s " % method_name +
+                           "refers to visits that were not provided; "
+                           "there are only %d visits" % n_visits)
+
+    sorted_dex = np.argsort(visit_index, kind='mergesort')
+    unique_visits, starts = np.unique(visit_index[sorted_dex], return_index=True)
+    ends = np.append(starts[1:], len(sorted_dex))
+
+    return [(visit, sorted_dex[start:end])
+            for visit, start, end in zip(unique_visits, starts, ends)]
+
+
+def _sliceOrNone(arr, dex):
+    """
+    Return arr[dex] if arr is not None; return None otherwise
+    """
+    if arr is None:
+        return None
+    return arr[dex]
+
+
+def _solarRaDec(mjd, epoch=2000.0, context=None):
     """
     Return the RA and Dec of the Sun in radians
 
     @param [in] mjd is the date represented as a
-    ModifiedJulianDate object.
+    ModifiedJulianDate object.  Can be None if context is specified.
 
     @param [in] epoch is the mean epoch of the coordinate system
     (default is 2000.0)
 
+    @param [in] context is an optional AstrometryContext caching
+    the star-independent parameters for this date
+
     @param [out] RA of Sun in radians
 
     @param [out] Dec of Sun in radians
     """
 
-    params = palpy.mappa(epoch, mjd.TDB)
+    params = _mappaParams(epoch, mjd, context)
     # params[4:7] is a unit vector pointing from the Sun
     # to the Earth (see the docstring for palpy.mappa)
 
     return palpy.dcc2s(-1.0 * params[4:7])
 
 
-def solarRaDec(mjd, epoch=2000.0):
+def solarRaDec(mjd, epoch=2000.0, context=None):
     """
     Return the RA and Dec of the Sun in degrees
 
     @param [in] mjd is the date represented as a
-    ModifiedJulianDate object.
+    ModifiedJulianDate object.  Can be None if context is specified.
 
     @param [in] epoch is the mean epoch of the coordinate system
     (default is 2000.0)
 
+    @param [in] context is an optional AstrometryContext caching
+    the star-independent parameters for this date
+
     @param [out] RA of Sun in degrees
 
     @param [out] Dec of Sun in degress
     """
 
-    solarRA, solarDec = _solarRaDec(mjd, epoch=epoch)
+    solarRA, solarDec = _solarRaDec(mjd, epoch=epoch, context=context)
     return np.degrees(solarRA), np.degrees(solarDec)
 
 
-def _distanceToSun(ra, dec, mjd, epoch=2000.0):
+def _distanceToSun(ra, dec, mjd, epoch=2000.0, context=None):
     """
     Calculate the distance from an (ra, dec) point to the Sun (in radians).
 
@@ -69,20 +269,23 @@ def _distanceToSun(ra, dec, mjd, epoch=2000.0):
     @param [in] dec in radians
 
     @param [in] mjd is the date represented as a
-    ModifiedJulianDate object.
+    ModifiedJulianDate object.  Can be None if context is specified.
 
     @param [in] epoch is the epoch of the coordinate system
     (default is 2000.0)
 
+    @param [in] context is an optional AstrometryContext caching
+    the star-independent parameters for this date
+
     @param [out] distance on the sky to the Sun in radians
     """
 
-    sunRa, sunDec = _solarRaDec(mjd, epoch=epoch)
+    sunRa, sunDec = _solarRaDec(mjd, epoch=epoch, context=context)
 
     return haversine(ra, dec, sunRa, sunDec)
 
 
-def distanceToSun(ra, dec, mjd, epoch=2000.0):
+def distanceToSun(ra, dec, mjd, epoch=2000.0, context=None):
     """
     Calculate the distance from an (ra, dec) point to the Sun (in degrees).
 
@@ -91,15 +294,19 @@ def distanceToSun(ra, dec, mjd, epoch=2000.0):
     @param [in] dec in degrees
 
     @param [in] mjd is the date represented as a
-    ModifiedJulianDate object.
+    ModifiedJulianDate object.  Can be None if context is specified.
 
     @param [in] epoch is the epoch of the coordinate system
     (default is 2000.0)
 
+    @param [in] context is an optional AstrometryContext caching
+    the star-independent parameters for this date
+
     @param [out] distance on the sky to the Sun in degrees
     """
 
-    return np.degrees(_distanceToSun(np.radians(ra), np.radians(dec), mjd, epoch=epoch))
+    return np.degrees(_distanceToSun(np.radians(ra), np.radians(dec), mjd,
+                                     epoch=epoch, context=context))
 
 
 def refractionCoefficients(wavelength=0.5, site=None):
@@ -384,7 +591,7 @@ def _applyProperMotion(ra, dec, pm_ra, pm_dec, parallax, v_rad,
 
 
 def appGeoFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None,
-                   v_rad=None, epoch=2000.0, mjd=None):
+                   v_rad=None, epoch=2000.0, mjd=None, context=None):
     """
     Convert the mean position (RA, Dec) in the International Celestial Reference
     System (ICRS) to the mean apparent geocentric position
@@ -409,7 +616,10 @@ def appGeoFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None,
     measure RA (default: 2000.0)
 
     @param [in] mjd is an instantiation of the ModifiedJulianDate class
-    representing the date of the observation
+    representing the date of the observation (can be None if context is specified)
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for the date of the observation
 
     @param [out] a 2-D numpy array in which the first row is the apparent
     geocentric RA and the second row is the apparent geocentric Dec (both in degrees)
@@ -432,13 +642,14 @@ def appGeoFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None,
 
     output = _appGeoFromICRS(np.radians(ra), np.radians(dec),
                              pm_ra=pm_ra_in, pm_dec=pm_dec_in,
-                             parallax=px_in, v_rad=v_rad, epoch=epoch, mjd=mjd)
+                             parallax=px_in, v_rad=v_rad, epoch=epoch, mjd=mjd,
+                             context=context)
 
     return np.degrees(output)
 
 
 def _appGeoFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None,
-                    v_rad=None, epoch=2000.0, mjd=None):
+                    v_rad=None, epoch=2000.0, mjd=None, context=None):
     """
     Convert the mean position (RA, Dec) in the International Celestial Reference
     System (ICRS) to the mean apparent geocentric position
@@ -466,13 +677,16 @@ def _appGeoFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None,
     measure RA (default: 2000.0)
 
     @param [in] mjd is an instantiation of the ModifiedJulianDate class
-    representing the date of the observation
+    representing the date of the observation (can be None if context is specified)
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for the date of the observation
 
     @param [out] a 2-D numpy array in which the first row is the apparent
     geocentric RAand the second row is the apparent geocentric Dec (both in radians)
     """
 
-    if mjd is None:
+    if mjd is None and context is None:
         raise RuntimeError("cannot call appGeoFromICRS; mjd is None")
 
     include_px = False
@@ -517,7 +731,7 @@ def _appGeoFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None,
     # epoch of mean equinox to be used (Julian)
     #
     # date (MJD)
-    prms = palpy.mappa(epoch, mjd.TDB)
+    prms = _mappaParams(epoch, mjd, context)
 
     # palpy.mapqk does a quick mean to apparent place calculation using
     # the output of palpy.mappa
@@ -547,7 +761,7 @@ def _appGeoFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None,
     return np.array([raOut, decOut])
 
 
-def _icrsFromAppGeo(ra, dec, epoch=2000.0, mjd=None):
+def _icrsFromAppGeo(ra, dec, epoch=2000.0, mjd=None, context=None):
     """
     Convert the apparent geocentric position in (RA, Dec) to
     the mean position in the International Celestial Reference
@@ -574,7 +788,10 @@ def _icrsFromAppGeo(ra, dec, epoch=2000.0, mjd=None):
     measure RA (default: 2000.0)
 
     @param [in] mjd is an instantiation of the ModifiedJulianDate class
-    representing the date of the observation
+    representing the date of the observation (can be None if context is specified)
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for the date of the observation
 
     @param [out] a 2-D numpy array in which the first row is the mean ICRS RA and
     the second row is the mean ICRS Dec (both in radians)
@@ -592,7 +809,7 @@ def _icrsFromAppGeo(ra, dec, epoch=2000.0, mjd=None):
     # epoch of mean equinox to be used (Julian)
     #
     # date (MJD)
-    params = palpy.mappa(epoch, mjd.TDB)
+    params = _mappaParams(epoch, mjd, context)
 
     if are_arrays:
         raOut, decOut = palpy.ampqkVector(ra, dec, params)
@@ -602,7 +819,7 @@ def _icrsFromAppGeo(ra, dec, epoch=2000.0, mjd=None):
     return np.array([raOut, decOut])
 
 
-def icrsFromAppGeo(ra, dec, epoch=2000.0, mjd=None):
+def icrsFromAppGeo(ra, dec, epoch=2000.0, mjd=None, context=None):
     """
     Convert the apparent geocentric position in (RA, Dec) to
     the mean position in the International Celestial Reference
@@ -629,20 +846,24 @@ def icrsFromAppGeo(ra, dec, epoch=2000.0, mjd=None):
     measure RA (default: 2000.0)
 
     @param [in] mjd is an instantiation of the ModifiedJulianDate class
-    representing the date of the observation
+    representing the date of the observation (can be None if context is specified)
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for the date of the observation
 
     @param [out] a 2-D numpy array in which the first row is the mean ICRS RA and
     the second row is the mean ICRS Dec (both in degrees)
     """
 
     raOut, decOut = _icrsFromAppGeo(np.radians(ra), np.radians(dec),
-                                    epoch=epoch, mjd=mjd)
+                                    epoch=epoch, mjd=mjd, context=context)
 
     return np.array([np.degrees(raOut), np.degrees(decOut)])
 
 
 def observedFromAppGeo(ra, dec, includeRefraction=True,
-                       altAzHr=False, wavelength=0.5, obs_metadata=None):
+                       altAzHr=False, wavelength=0.5, obs_metadata=None,
+                       context=None):
     """
     Convert apparent geocentric (RA, Dec) to observed (RA, Dec).  More
     specifically: apply refraction and diurnal aberration.
@@ -661,7 +882,10 @@ def observedFromAppGeo(ra, dec, includeRefraction=True,
     @param [in] wavelength is effective wavelength in microns (default: 0.5)
 
     @param [in] obs_metadata is an ObservationMetaData characterizing the
-    observation.
+    observation.  Can be None if context is specified.
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
 
     @param [out] a 2-D numpy array in which the first row is the observed RA
     and the second row is the observed Dec (both in degrees)
@@ -675,7 +899,7 @@ def observedFromAppGeo(ra, dec, includeRefraction=True,
         raDec, altAz = _observedFromAppGeo(np.radians(ra), np.radians(dec),
                                            includeRefraction=includeRefraction,
                                            altAzHr=altAzHr, wavelength=wavelength,
-                                           obs_metadata=obs_metadata)
+                                           obs_metadata=obs_metadata, context=context)
 
         return np.degrees(raDec), np.degrees(altAz)
 
@@ -683,7 +907,7 @@ def observedFromAppGeo(ra, dec, includeRefraction=True,
         output = _observedFromAppGeo(np.radians(ra), np.radians(dec),
                                      includeRefraction=includeRefraction,
                                      altAzHr=altAzHr, wavelength=wavelength,
-                                     obs_metadata=obs_metadata)
+                                     obs_metadata=obs_metadata, context=context)
 
         return np.degrees(output)
 
@@ -752,7 +976,8 @@ def _calculateObservatoryParameters(obs_metadata, wavelength, includeRefraction)
 
 
 def _observedFromAppGeo(ra, dec, includeRefraction=True,
-                        altAzHr=False, wavelength=0.5, obs_metadata=None):
+                        altAzHr=False, wavelength=0.5, obs_metadata=None,
+                        context=None):
     """
     Convert apparent geocentric (RA, Dec) to observed (RA, Dec).  More specifically:
     apply refraction and diurnal aberration.
@@ -771,7 +996,10 @@ def _observedFromAppGeo(ra, dec, includeRefraction=True,
     @param [in] wavelength is effective wavelength in microns (default: 0.5)
 
     @param [in] obs_metadata is an ObservationMetaData characterizing the
-    observation.
+    observation.  Can be None if context is specified.
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
 
     @param [out] a 2-D numpy array in which the first row is the observed RA
     and the second row is the observed Dec (both in radians)
@@ -785,6 +1013,8 @@ def _observedFromAppGeo(ra, dec, includeRefraction=True,
     are_arrays = _validate_inputs(
         [ra, dec], ['ra', 'dec'], "observedFromAppGeo")
 
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "observedFromAppGeo")
+
     if obs_metadata is None:
         raise RuntimeError(
             "Cannot call observedFromAppGeo without an obs_metadata")
@@ -797,8 +1027,11 @@ def _observedFromAppGeo(ra, dec, includeRefraction=True,
         raise RuntimeError(
             "Cannot call observedFromAppGeo: obs_metadata has no mjd")
 
-    obsPrms = _calculateObservatoryParameters(
-        obs_metadata, wavelength, includeRefraction)
+    if context is None:
+        obsPrms = _calculateObservatoryParameters(
+            obs_metadata, wavelength, includeRefraction)
+    else:
+        obsPrms = context.aoppaParams(wavelength, includeRefraction)
 
     # palpy.aopqk does an apparent to observed place
     # correction
@@ -839,7 +1072,7 @@ def _observedFromAppGeo(ra, dec, includeRefraction=True,
 
 
 def appGeoFromObserved(ra, dec, includeRefraction=True,
-                       wavelength=0.5, obs_metadata=None):
+                       wavelength=0.5, obs_metadata=None, context=None):
     """
     Convert observed (RA, Dec) to apparent geocentric (RA, Dec).  More
     specifically: undo the effects of refraction and diurnal aberration.
@@ -857,7 +1090,10 @@ def appGeoFromObserved(ra, dec, includeRefraction=True,
     @param [in] wavelength is effective wavelength in microns (default: 0.5)
 
     @param [in] obs_metadata is an ObservationMetaData characterizing the
-    observation.
+    observation.  Can be None if context is specified.
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
 
     @param [out] a 2-D numpy array in which the first row is the apparent
     geocentric RA and the second row is the apparentGeocentric Dec (both
@@ -867,13 +1103,14 @@ def appGeoFromObserved(ra, dec, includeRefraction=True,
     raOut, decOut = _appGeoFromObserved(np.radians(ra), np.radians(dec),
                                         includeRefraction=includeRefraction,
                                         wavelength=wavelength,
-                                        obs_metadata=obs_metadata)
+                                        obs_metadata=obs_metadata,
+                                        context=context)
 
     return np.array([np.degrees(raOut), np.degrees(decOut)])
 
 
 def _appGeoFromObserved(ra, dec, includeRefraction=True,
-                        wavelength=0.5, obs_metadata=None):
+                        wavelength=0.5, obs_metadata=None, context=None):
     """
     Convert observed (RA, Dec) to apparent geocentric (RA, Dec).
     More specifically: undo the effects of refraction and diurnal aberration.
@@ -891,7 +1128,10 @@ def _appGeoFromObserved(ra, dec, includeRefraction=True,
     @param [in] wavelength is effective wavelength in microns (default: 0.5)
 
     @param [in] obs_metadata is an ObservationMetaData characterizing the
-    observation.
+    observation.  Can be None if context is specified.
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
 
     @param [out] a 2-D numpy array in which the first row is the apparent
     geocentric RA and the second row is the apparentGeocentric Dec (both
@@ -900,6 +1140,8 @@ def _appGeoFromObserved(ra, dec, includeRefraction=True,
 
     are_arrays = _validate_inputs([ra, dec], ['ra', 'dec'], "appGeoFromObserved")
 
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "appGeoFromObserved")
+
     if obs_metadata is None:
         raise RuntimeError("Cannot call appGeoFromObserved without an obs_metadata")
 
@@ -909,7 +1151,10 @@ def _appGeoFromObserved(ra, dec, includeRefraction=True,
     if obs_metadata.mjd is None:
         raise RuntimeError("Cannot call appGeoFromObserved: obs_metadata has no mjd")
 
-    obsPrms = _calculateObservatoryParameters(obs_metadata, wavelength, includeRefraction)
+    if context is None:
+        obsPrms = _calculateObservatoryParameters(obs_metadata, wavelength, includeRefraction)
+    else:
+        obsPrms = context.aoppaParams(wavelength, includeRefraction)
 
     if are_arrays:
         raOut, decOut = palpy.oapqkVector('r', ra, dec, obsPrms)
@@ -920,7 +1165,8 @@ def _appGeoFromObserved(ra, dec, includeRefraction=True,
 
 
 def observedFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None, v_rad=None,
-                     obs_metadata=None, epoch=None, includeRefraction=True):
+                     obs_metadata=None, epoch=None, includeRefraction=True,
+                     context=None):
     """
     Convert mean position (RA, Dec) in the International Celestial Reference Frame
     to observed (RA, Dec).
@@ -947,13 +1193,16 @@ def observedFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None, v_rad=None
     Can be a numpy array or a number or None (default=None).
 
     @param [in] obs_metadata is an ObservationMetaData object describing the
-    telescope pointing.
+    telescope pointing.  Can be None if context is specified.
 
     @param [in] epoch is the julian epoch (in years) against which the mean
     equinoxes are measured.
 
     @param [in] includeRefraction toggles whether or not to correct for refraction
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
+
     @param [out] a 2-D numpy array in which the first row is the observed
     RA and the second row is the observed Dec (both in degrees)
     """
@@ -976,13 +1225,14 @@ def observedFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None, v_rad=None
     output = _observedFromICRS(np.radians(ra), np.radians(dec),
                                pm_ra=pm_ra_in, pm_dec=pm_dec_in, parallax=parallax_in,
                                v_rad=v_rad, obs_metadata=obs_metadata, epoch=epoch,
-                               includeRefraction=includeRefraction)
+                               includeRefraction=includeRefraction, context=context)
 
     return np.degrees(output)
 
 
 def _observedFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None, v_rad=None,
-                      obs_metadata=None, epoch=None, includeRefraction=True):
+                      obs_metadata=None, epoch=None, includeRefraction=True,
+                      context=None):
     """
     Convert mean position (RA, Dec) in the International Celestial Reference Frame
     to observed (RA, Dec)-like coordinates.
@@ -1009,18 +1259,23 @@ def _observedFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None, v_rad=Non
     Can be a numpy array or a number or None (default=None).
 
     @param [in] obs_metadata is an ObservationMetaData object describing the
-    telescope pointing.
+    telescope pointing.  Can be None if context is specified.
 
     @param [in] epoch is the julian epoch (in years) against which the mean
     equinoxes are measured.
 
     @param [in] includeRefraction toggles whether or not to correct for refraction
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
+
     @param [out] a 2-D numpy array in which the first row is the observed
     RA and the second row is the observed Dec (both in radians)
 
     """
 
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "observedFromICRS")
+
     if obs_metadata is None:
         raise RuntimeError("Cannot call observedFromICRS; obs_metadata is none")
 
@@ -1032,15 +1287,17 @@ def _observedFromICRS(ra, dec, pm_ra=None, pm_dec=None, parallax=None, v_rad=Non
 
     ra_apparent, dec_apparent = _appGeoFromICRS(ra, dec, pm_ra=pm_ra,
                                                 pm_dec=pm_dec, parallax=parallax,
-                                                v_rad=v_rad, epoch=epoch, mjd=obs_metadata.mjd)
+                                                v_rad=v_rad, epoch=epoch, mjd=obs_metadata.mjd,
+                                                context=context)
 
     ra_out, dec_out = _observedFromAppGeo(ra_apparent, dec_apparent, obs_metadata=obs_metadata,
-                                          includeRefraction=includeRefraction)
+                                          includeRefraction=includeRefraction, context=context)
 
     return np.array([ra_out, dec_out])
 
 
-def icrsFromObserved(ra, dec, obs_metadata=None, epoch=None, includeRefraction=True):
+def icrsFromObserved(ra, dec, obs_metadata=None, epoch=None, includeRefraction=True,
+                     context=None):
     """
     Convert observed RA, Dec into mean International Celestial Reference Frame (ICRS)
     RA, Dec.  This method undoes the effects of precession, nutation, aberration (annual
@@ -1064,25 +1321,30 @@ def icrsFromObserved(ra, dec, obs_metadata=None, epoch=None, includeRefraction=T
     @param [in] dec is the observed Dec in degrees.  Can be a numpy array or a number.
 
     @param [in] obs_metadata is an ObservationMetaData object describing the
-    telescope pointing.
+    telescope pointing.  Can be None if context is specified.
 
     @param [in] epoch is the julian epoch (in years) against which the mean
     equinoxes are measured.
 
     @param [in] includeRefraction toggles whether or not to correct for refraction
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
+
     @param [out] a 2-D numpy array in which the first row is the mean ICRS
     RA and the second row is the mean ICRS Dec (both in degrees)
     """
 
     ra_out, dec_out = _icrsFromObserved(np.radians(ra), np.radians(dec),
                                         obs_metadata=obs_metadata,
-                                        epoch=epoch, includeRefraction=includeRefraction)
+                                        epoch=epoch, includeRefraction=includeRefraction,
+                                        context=context)
 
     return np.array([np.degrees(ra_out), np.degrees(dec_out)])
 
 
-def _icrsFromObserved(ra, dec, obs_metadata=None, epoch=None, includeRefraction=True):
+def _icrsFromObserved(ra, dec, obs_metadata=None, epoch=None, includeRefraction=True,
+                      context=None):
     """
     Convert observed RA, Dec into mean International Celestial Reference Frame (ICRS)
     RA, Dec.  This method undoes the effects of precession, nutation, aberration (annual
@@ -1106,19 +1368,24 @@ def _icrsFromObserved(ra, dec, obs_metadata=None, epoch=None, includeRefraction=
     @param [in] dec is the observed Dec in radians.  Can be a numpy array or a number.
 
     @param [in] obs_metadata is an ObservationMetaData object describing the
-    telescope pointing.
+    telescope pointing.  Can be None if context is specified.
 
     @param [in] epoch is the julian epoch (in years) against which the mean
     equinoxes are measured.
 
     @param [in] includeRefraction toggles whether or not to correct for refraction
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
+
     @param [out] a 2-D numpy array in which the first row is the mean ICRS
     RA and the second row is the mean ICRS Dec (both in radians)
     """
 
     _validate_inputs([ra, dec], ['ra', 'dec'], "icrsFromObserved")
 
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "icrsFromObserved")
+
     if obs_metadata is None:
         raise RuntimeError("Cannot call icrsFromObserved; obs_metadata is None")
 
@@ -1129,9 +1396,148 @@ def _icrsFromObserved(ra, dec, obs_metadata=None, epoch=None, includeRefraction=
         raise RuntimeError("Cannot call icrsFromObserved; you have not specified an epoch")
 
     ra_app, dec_app = _appGeoFromObserved(ra, dec, obs_metadata=obs_metadata,
-                                          includeRefraction=includeRefraction)
+                                          includeRefraction=includeRefraction,
+                                          context=context)
 
     ra_icrs, dec_icrs = _icrsFromAppGeo(ra_app, dec_app, epoch=epoch,
-                                        mjd=obs_metadata.mjd)
+                                        mjd=obs_metadata.mjd, context=context)
 
     return np.array([ra_icrs, dec_icrs])
+
+
+def observedFromICRSMultiVisit(ra, dec, visit_index, obs_metadata_list,
+                               pm_ra=None, pm_dec=None, parallax=None, v_rad=None,
+                               epoch=None, includeRefraction=True):
+    """
+    Convert mean position (RA, Dec) in the International Celestial Reference Frame
+    to observed (RA, Dec) for sources observed in many different visits.
+
+    This method works in degrees.
+
+    @param [in] ra is the unrefracted RA in degrees (ICRS).  A numpy array.
+
+    @param [in] dec is the unrefracted Dec in degrees (ICRS).  A numpy array.
+
+    @param [in] visit_index is a numpy array of ints indicating which
+    element of obs_metadata_list each source was observed in
+
+    @param [in] obs_metadata_list is a list of ObservationMetaData (or an
+    ObservationMetaDataBatch) characterizing the visits
+
+    @param [in] pm_ra is proper motion in RA multiplied by cos(Dec) (arcsec/yr)
+    Can be a numpy array or None (default=None).
+
+    @param [in] pm_dec is proper motion in dec (arcsec/yr)
+    Can be a numpy array or None (default=None).
+
+    @param [in] parallax is parallax in arcsec
+    Can be a numpy array or None (default=None).
+
+    @param [in] v_rad is radial velocity (km/s)
+    Can be a numpy array or None (default=None).
+
+    @param [in] epoch is the julian epoch (in years) against which the mean
+    equinoxes are measured.
+
+    @param [in] includeRefraction toggles whether or not to correct for refraction
+
+    @param [out] a 2-D numpy array in which the first row is the observed
+    RA and the second row is the observed Dec (both in degrees), in the
+    same order as the inputs
+    """
+
+    if pm_ra is not None:
+        pm_ra_in = radiansFromArcsec(pm_ra)
+    else:
+        pm_ra_in = None
+
+    if pm_dec is not None:
+        pm_dec_in = radiansFromArcsec(pm_dec)
+    else:
+        pm_dec_in = None
+
+    if parallax is not None:
+        parallax_in = radiansFromArcsec(parallax)
+    else:
+        parallax_in = None
+
+    output = _observedFromICRSMultiVisit(np.radians(ra), np.radians(dec),
+                                         visit_index, obs_metadata_list,
+                                         pm_ra=pm_ra_in, pm_dec=pm_dec_in,
+                                         parallax=parallax_in, v_rad=v_rad,
+                                         epoch=epoch, includeRefraction=includeRefraction)
+
+    return np.degrees(output)
+
+
+def _observedFromICRSMultiVisit(ra, dec, visit_index, obs_metadata_list,
+                                pm_ra=None, pm_dec=None, parallax=None, v_rad=None,
+                                epoch=None, includeRefraction=True):
+    """
+    Convert mean position (RA, Dec) in the International Celestial Reference Frame
+    to observed (RA, Dec) for sources observed in many different visits.
+
+    The star-independent parameters are calculated once per distinct visit
+    in visit_index and _observedFromICRS is called once on all of the sources
+    belonging to that visit.  This is much faster than looping over visits
+    in Python when there are many visits with a few sources each.
+
+    This method works in radians.
+
+    @param [in] ra is the unrefracted RA in radians (ICRS).  A numpy array.
+
+    @param [in] dec is the unrefracted Dec in radians (ICRS).  A numpy array.
+
+    @param [in] visit_index is a numpy array of ints indicating which
+    element of obs_metadata_list each source was observed in
+
+    @param [in] obs_metadata_list is a list of ObservationMetaData (or an
+    ObservationMetaDataBatch) characterizing the visits
+
+    @param [in] pm_ra is proper motion in RA multiplied by cos(Dec) (radians/yr)
+    Can be a numpy array or None (default=None).
+
+    @param [in] pm_dec is proper motion in dec (radians/yr)
+    Can be a numpy array or None (default=None).
+
+    @param [in] parallax is parallax in radians
+    Can be a numpy array or None (default=None).
+
+    @param [in] v_rad is radial velocity (km/s)
+    Can be a numpy array or None (default=None).
+
+    @param [in] epoch is the julian epoch (in years) against which the mean
+    equinoxes are measured.
+
+    @param [in] includeRefraction toggles whether or not to correct for refraction
+
+    @param [out] a 2-D numpy array in which the first row is the observed
+    RA and the second row is the observed Dec (both in radians), in the
+    same order as the inputs
+    """
+
+    are_arrays = _validate_inputs([ra, dec, visit_index], ['ra', 'dec', 'visit_index'],
+                                  "observedFromICRSMultiVisit")
+
+    if not are_arrays:
+        raise RuntimeError("observedFromICRSMultiVisit only accepts numpy arrays")
+
+    if epoch is None:
+        raise RuntimeError("Cannot call observedFromICRSMultiVisit; you have not specified an epoch")
+
+    output = np.empty((2, len(ra)), dtype=float)
+
+    for visit, dex in _groupByVisit(visit_index, len(obs_metadata_list),
+                                    "observedFromICRSMultiVisit"):
+
+        context = AstrometryContext(obs_metadata_list[visit])
+
+        output[:, dex] = _observedFromICRS(ra[dex], dec[dex],
+                                           pm_ra=_sliceOrNone(pm_ra, dex),
+                                           pm_dec=_sliceOrNone(pm_dec, dex),
+                                           parallax=_sliceOrNone(parallax, dex),
+                                           v_rad=_sliceOrNone(v_rad, dex),
+                                           epoch=epoch, includeRefraction=includeRefraction,
+                                           context=context)
+
+    return output
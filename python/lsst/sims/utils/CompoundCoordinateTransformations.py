@@ -17,7 +17,7 @@ __all__ = ["_altAzPaFromRaDec", "altAzPaFromRaDec",
            "getRotSkyPos", "_getRotSkyPos"]
 
 
-def altAzPaFromRaDec(ra, dec, obs, includeRefraction=True):
+def altAzPaFromRaDec(ra, dec, obs, includeRefraction=True, context=None):
     """
     Convert RA, Dec, longitude, latitude and MJD into altitude, azimuth
     and parallactic angle using PALPY
@@ -34,6 +34,9 @@ def altAzPaFromRaDec(ra, dec, obs, includeRefraction=True):
     @param [in] includeRefraction is a boolean that turns refraction on and off
     (default True)
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs
+
     @param [out] altitude in degrees
 
     @param [out] azimuth in degrees
@@ -46,12 +49,13 @@ def altAzPaFromRaDec(ra, dec, obs, includeRefraction=True):
     """
 
     alt, az, pa = _altAzPaFromRaDec(np.radians(ra), np.radians(dec),
-                                    obs, includeRefraction=includeRefraction)
+                                    obs, includeRefraction=includeRefraction,
+                                    context=context)
 
     return np.degrees(alt), np.degrees(az), np.degrees(pa)
 
 
-def _altAzPaFromRaDec(raRad, decRad, obs, includeRefraction=True):
+def _altAzPaFromRaDec(raRad, decRad, obs, includeRefraction=True, context=None):
     """
     Convert RA, Dec, longitude, latitude and MJD into altitude, azimuth
     and parallactic angle using PALPY
@@ -68,6 +72,9 @@ def _altAzPaFromRaDec(raRad, decRad, obs, includeRefraction=True):
     @param [in] includeRefraction is a boolean that turns refraction on and off
     (default True)
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs
+
     @param [out] altitude in radians
 
     @param [out] azimuth in radians
@@ -84,7 +91,8 @@ def _altAzPaFromRaDec(raRad, decRad, obs, includeRefraction=True):
 
     raObs, decObs = \
     _observedFromICRS(raRad, decRad, obs_metadata=obs,
-                      epoch=2000.0, includeRefraction=includeRefraction)
+                      epoch=2000.0, includeRefraction=includeRefraction,
+                      context=context)
 
     lst = calcLmstLast(obs.mjd.UT1, obs.site.longitude_rad)
     last = lst[1]
@@ -103,7 +111,7 @@ def _altAzPaFromRaDec(raRad, decRad, obs, includeRefraction=True):
     return alt, az, pa
 
 
-def raDecFromAltAz(alt, az, obs, includeRefraction=True):
+def raDecFromAltAz(alt, az, obs, includeRefraction=True, context=None):
     """
     Convert altitude and azimuth to RA and Dec
 
@@ -117,6 +125,9 @@ def raDecFromAltAz(alt, az, obs, includeRefraction=True):
     @param [in] includeRefraction is a boolean that turns refraction on and off
     (default True)
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs
+
     @param [out] RA in degrees (in the International Celestial Reference System)
 
     @param [out] Dec in degrees (in the International Celestial Reference System)
@@ -125,12 +136,13 @@ def raDecFromAltAz(alt, az, obs, includeRefraction=True):
     """
 
     ra, dec = _raDecFromAltAz(np.radians(alt), np.radians(az), obs,
-                              includeRefraction=includeRefraction)
+                              includeRefraction=includeRefraction,
+                              context=context)
 
     return np.degrees(ra), np.degrees(dec)
 
 
-def _raDecFromAltAz(altRad, azRad, obs, includeRefraction=True):
+def _raDecFromAltAz(altRad, azRad, obs, includeRefraction=True, context=None):
     """
     Convert altitude and azimuth to RA and Dec
 
@@ -144,6 +156,9 @@ def _raDecFromAltAz(altRad, azRad, obs, includeRefraction=True):
     @param [in] includeRefraction is a boolean that turns refraction on and off
     (default True)
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs
+
     @param [out] RA in radians (in the International Celestial Reference System)
 
     @param [out] Dec in radians (in the International Celestial Reference System)
@@ -182,12 +197,13 @@ def _raDecFromAltAz(altRad, azRad, obs, includeRefraction=True):
 
     raRad, decRad = _icrsFromObserved(raObs, decObs,
                                       obs_metadata=obs, epoch=2000.0,
-                                      includeRefraction=includeRefraction)
+                                      includeRefraction=includeRefraction,
+                                      context=context)
 
     return raRad, decRad
 
 
-def getRotSkyPos(ra, dec, obs, rotTel):
+def getRotSkyPos(ra, dec, obs, rotTel, context=None):
     """
     @param [in] ra is the RA in degrees.  Can be a numpy array or a single value.
     (In the International Celestial Reference System)
@@ -203,6 +219,9 @@ def getRotSkyPos(ra, dec, obs, rotTel):
     If a numpy array, should have the same length as ra and dec.  In this case,
     each rotTel will be associated with the corresponding ra, dec pair.
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs
+
     @param [out] rotSkyPos in degrees
 
     WARNING: As of 13 April 2015, this method does not agree with OpSim on
@@ -214,12 +233,12 @@ def getRotSkyPos(ra, dec, obs, rotTel):
     """
 
     rotSky = _getRotSkyPos(np.radians(ra), np.radians(dec),
-                           obs, np.radians(rotTel))
+                           obs, np.radians(rotTel), context=context)
 
     return np.degrees(rotSky)
 
 
-def _getRotSkyPos(raRad, decRad, obs, rotTelRad):
+def _getRotSkyPos(raRad, decRad, obs, rotTelRad, context=None):
     """
     @param [in] raRad is the RA in radians.  Can be a numpy array or a single value.
     (In the International Celestial Reference System)
@@ -235,6 +254,9 @@ def _getRotSkyPos(raRad, decRad, obs, rotTelRad):
     If a numpy array, should have the same length as raRad and decRad.  In this case,
     each rotTelRad will be associated with the corresponding raRad, decRad pair.
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs
+
     @param [out] rotSkyPos in radians
 
     WARNING: As of 13 April 2015, this method does not agree with OpSim on
@@ -244,12 +266,12 @@ def _getRotSkyPos(raRad, decRad, obs, rotTelRad):
     of the exposure (rotTelPos is calculated at the beginning of the exposure;
     expmjd is reckoned at the middle of the exposure).
     """
-    altRad, azRad, paRad = _altAzPaFromRaDec(raRad, decRad, obs)
+    altRad, azRad, paRad = _altAzPaFromRaDec(raRad, decRad, obs, context=context)
 
     return (rotTelRad - paRad) % (2. * np.pi)
 
 
-def getRotTelPos(ra, dec, obs, rotSky):
+def getRotTelPos(ra, dec, obs, rotSky, context=None):
     """
     @param [in] ra is RA in degrees.  Can be a numpy array or a single value.
     (In the International Celestial Reference System)
@@ -266,6 +288,9 @@ def getRotTelPos(ra, dec, obs, rotSky):
     have the same length as ra and dec.  In this case, each rotSkyPos
     will be associated with the corresponding ra, dec pair.
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs
+
     @param [out] rotTelPos in degrees.
 
     WARNING: As of 13 April 2015, this method does not agree with OpSim on
@@ -276,12 +301,12 @@ def getRotTelPos(ra, dec, obs, rotSky):
     expmjd is reckoned at the middle of the exposure).
     """
     rotTel = _getRotTelPos(np.radians(ra), np.radians(dec),
-                           obs, np.radians(rotSky))
+                           obs, np.radians(rotSky), context=context)
 
     return np.degrees(rotTel)
 
 
-def _getRotTelPos(raRad, decRad, obs, rotSkyRad):
+def _getRotTelPos(raRad, decRad, obs, rotSkyRad, context=None):
     """
     @param [in] raRad is RA in radians.  Can be a numpy array or a single value.
     (In the International Celestial Reference System)
@@ -298,6 +323,9 @@ def _getRotTelPos(raRad, decRad, obs, rotSkyRad):
     have the same length as raRad and decRad.  In this case, each rotSkyPos
     will be associated with the corresponding raRad, decRad pair.
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs
+
     @param [out] rotTelPos in radians.
 
     WARNING: As of 13 April 2015, this method does not agree with OpSim on
@@ -307,6 +335,6 @@ def _getRotTelPos(raRad, decRad, obs, rotSkyRad):
     of the exposure (rotTelPos is calculated at the beginning of the exposure;
     expmjd is reckoned at the middle of the exposure).
     """
-    altRad, azRad, paRad = _altAzPaFromRaDec(raRad, decRad, obs)
+    altRad, azRad, paRad = _altAzPaFromRaDec(raRad, decRad, obs, context=context)
 
     return (rotSkyRad + paRad) % (2. * np.pi)
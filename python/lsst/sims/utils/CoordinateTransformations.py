@@ -1,12 +1,14 @@
 """
 This file contains coordinate transformation methods that are very thin wrappers
-of palpy methods, or that have no dependence on palpy at all
+of palpy methods, or that have no dependence on palpy at all.
+
+palpy is imported by the functions that use it, so that importing the
+pure numpy functions (e.g. angularSeparation, haversine) does not load it.
 """
 from __future__ import division
 
 import numpy as np
 import numbers
-import palpy
 
 from lsst.sims.utils.CodeUtilities import _validate_inputs
 
@@ -115,6 +117,8 @@ def _galacticFromEquatorial(ra, dec):
     @param [out] gLat is galactic latitude in radians
     '''
 
+    import palpy
+
     if isinstance(ra, np.ndarray):
         gLong, gLat = palpy.eqgalVector(ra, dec)
     else:
@@ -155,6 +159,8 @@ def _equatorialFromGalactic(gLong, gLat):
     @param [out] dec is declination in radians (J2000)
     '''
 
+    import palpy
+
     if isinstance(gLong, np.ndarray):
         ra, dec = palpy.galeqVector(gLong, gLat)
     else:
@@ -270,6 +276,8 @@ def equationOfEquinoxes(d):
     @param [out] the equation of equinoxes in radians.
     """
 
+    import palpy
+
     if isinstance(d, np.ndarray):
         return palpy.eqeqxVector(d)
     else:
@@ -288,6 +296,8 @@ def calcGmstGast(mjd):
     @param [out] gast Greenwich apparent sidereal time in hours
     """
 
+    import palpy
+
     date = np.floor(mjd)
     ut1 = mjd - date
     if isinstance(mjd, np.ndarray):
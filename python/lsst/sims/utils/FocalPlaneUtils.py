@@ -1,19 +1,25 @@
-from builtins import zip
 import numpy as np
 import palpy
 from lsst.sims.utils.CodeUtilities import _validate_inputs
 from lsst.sims.utils import _observedFromICRS, _icrsFromObserved
-from lsst.sims.utils import radiansFromArcsec
+from lsst.sims.utils import radiansFromArcsec, arcsecFromRadians, haversine
+from lsst.sims.utils import cartesianFromSpherical, _altAzPaFromRaDec
+from lsst.sims.utils import AstrometryContext
+from lsst.sims.utils.AstrometryUtils import _resolveObsMetaData
+from lsst.sims.utils.AstrometryUtils import _groupByVisit, _sliceOrNone
 
 __all__ = ["_pupilCoordsFromObserved",
            "_pupilCoordsFromRaDec", "pupilCoordsFromRaDec",
-           "_raDecFromPupilCoords", "raDecFromPupilCoords"]
+           "_raDecFromPupilCoords", "raDecFromPupilCoords",
+           "_raDecFromPupilCoordsGrid", "raDecFromPupilCoordsGrid",
+           "_fieldOfViewIndices", "fieldOfViewIndices",
+           "_pupilCoordsFromRaDecMultiVisit", "pupilCoordsFromRaDecMultiVisit"]
 
 
 def pupilCoordsFromRaDec(ra_in, dec_in,
                          pm_ra=None, pm_dec=None, parallax=None,
                          v_rad=None, includeRefraction=True,
-                         obs_metadata=None, epoch=2000.0):
+                         obs_metadata=None, epoch=2000.0, context=None):
     """
     Take an input RA and dec from the sky and convert it to coordinates
     on the focal plane.
@@ -49,10 +55,13 @@ def pupilCoordsFromRaDec(ra_in, dec_in,
     @param [in] includeRefraction is a boolean controlling the application of refraction.
 
     @param [in] obs_metadata is an ObservationMetaData instantiation characterizing the
-    telescope location and pointing.
+    telescope location and pointing.  Can be None if context is specified.
 
     @param [in] epoch is the epoch of mean ra and dec in julian years (default=2000.0)
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
+
     @param [out] returns a numpy array whose first row is the x coordinate on the pupil in
     radians and whose second row is the y coordinate in radians
     """
@@ -76,14 +85,15 @@ def pupilCoordsFromRaDec(ra_in, dec_in,
                                  pm_ra=pm_ra_in, pm_dec=pm_dec_in,
                                  parallax=parallax_in, v_rad=v_rad,
                                  includeRefraction=includeRefraction,
-                                 obs_metadata=obs_metadata, epoch=epoch)
+                                 obs_metadata=obs_metadata, epoch=epoch,
+                                 context=context)
 
 
 def _pupilCoordsFromRaDec(ra_in, dec_in,
                           pm_ra=None, pm_dec=None,
                           parallax=None, v_rad=None,
                           includeRefraction=True,
-                          obs_metadata=None, epoch=2000.0):
+                          obs_metadata=None, epoch=2000.0, context=None):
     """
     Take an input RA and dec from the sky and convert it to coordinates
     on the focal plane.
@@ -119,10 +129,13 @@ def _pupilCoordsFromRaDec(ra_in, dec_in,
     @param [in] includeRefraction is a boolean controlling the application of refraction.
 
     @param [in] obs_metadata is an ObservationMetaData instantiation characterizing the
-    telescope location and pointing.
+    telescope location and pointing.  Can be None if context is specified.
 
     @param [in] epoch is the epoch of mean ra and dec in julian years (default=2000.0)
 
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
+
     @param [out] returns a numpy array whose first row is the x coordinate on the pupil in
     radians and whose second row is the y coordinate in radians
     """
@@ -130,6 +143,8 @@ def _pupilCoordsFromRaDec(ra_in, dec_in,
     are_arrays = _validate_inputs([ra_in, dec_in], ['ra_in', 'dec_in'],
                                   "pupilCoordsFromRaDec")
 
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "pupilCoordsFromRaDec")
+
     if obs_metadata is None:
         raise RuntimeError("Cannot call pupilCoordsFromRaDec without obs_metadata")
 
@@ -151,13 +166,83 @@ def _pupilCoordsFromRaDec(ra_in, dec_in,
                                         parallax=parallax, v_rad=v_rad,
                                         obs_metadata=obs_metadata,
                                         epoch=epoch,
-                                        includeRefraction=includeRefraction)
+                                        includeRefraction=includeRefraction,
+                                        context=context)
 
     return _pupilCoordsFromObserved(ra_obs, dec_obs, obs_metadata,
-                                    epoch=epoch, includeRefraction=includeRefraction)
+                                    epoch=epoch, includeRefraction=includeRefraction,
+                                    context=context)
+
+
+# palpy.ds2tp refuses to project points for which the cosine of the angular
+# distance from the tangent point is smaller than this
+_ds2tpTiny = 1.0e-6
+
+
+def _gnomonicProjection(ra, dec, ra_pointing, dec_pointing):
+    """
+    Project points onto the plane tangent to the sphere at a pointing.  This is
+    a vectorized version of palpy.ds2tp that returns NaN for the points that
+    palpy.ds2tp cannot project (points 90 degrees or more from the pointing,
+    or NaNs) instead of raising an exception.
+
+    Parameters
+    ----------
+    ra, dec are the spherical coordinates of the points in radians
+    (numbers or numpy arrays)
+
+    ra_pointing, dec_pointing are the spherical coordinates of the
+    tangent point in radians
+
+    Returns
+    -------
+    xi and eta, the coordinates of the points on the tangent plane in radians
+    """
+    sin_dec_pointing = np.sin(dec_pointing)
+    cos_dec_pointing = np.cos(dec_pointing)
+    sin_dec = np.sin(dec)
+    cos_dec = np.cos(dec)
+    ra_diff = ra - ra_pointing
+    sin_ra_diff = np.sin(ra_diff)
+    cos_ra_diff = np.cos(ra_diff)
+
+    denom = sin_dec*sin_dec_pointing + cos_dec*cos_dec_pointing*cos_ra_diff
+    denom = np.where(denom > _ds2tpTiny, denom, np.NaN)
+
+    xi = cos_dec*sin_ra_diff/denom
+    eta = (sin_dec*cos_dec_pointing - cos_dec*sin_dec_pointing*cos_ra_diff)/denom
+    return xi, eta
+
+
+def _inverseGnomonicProjection(xi, eta, ra_pointing, dec_pointing):
+    """
+    Transform points on the plane tangent to the sphere at a pointing back
+    into spherical coordinates.  This is a vectorized version of palpy.dtp2s
+    (the inverse of _gnomonicProjection).
+
+    Parameters
+    ----------
+    xi, eta are the coordinates of the points on the tangent plane in radians
+    (numbers or numpy arrays)
+
+    ra_pointing, dec_pointing are the spherical coordinates of the
+    tangent point in radians
+
+    Returns
+    -------
+    ra and dec, the spherical coordinates of the points in radians
+    (ra is in the range [0, 2pi))
+    """
+    sin_dec_pointing = np.sin(dec_pointing)
+    cos_dec_pointing = np.cos(dec_pointing)
+    denom = cos_dec_pointing - eta*sin_dec_pointing
+    ra = np.mod(np.arctan2(xi, denom) + ra_pointing, 2.0*np.pi)
+    dec = np.arctan2(sin_dec_pointing + eta*cos_dec_pointing, np.sqrt(xi*xi + denom*denom))
+    return ra, dec
 
 
-def _pupilCoordsFromObserved(ra_obs, dec_obs, obs_metadata, epoch=2000.0, includeRefraction=True):
+def _pupilCoordsFromObserved(ra_obs, dec_obs, obs_metadata, epoch=2000.0, includeRefraction=True,
+                             context=None):
     """
     Convert Observed RA, Dec into pupil coordinates
 
@@ -168,19 +253,24 @@ def _pupilCoordsFromObserved(ra_obs, dec_obs, obs_metadata, epoch=2000.0, includ
     dec_obs is the observed Dec in radians
 
     obs_metadata is an ObservationMetaData characterizing the telescope location and pointing
+    (can be None if context is specified)
 
     epoch is the epoch of the mean RA and Dec in julian years (default=2000.0)
 
     includeRefraction is a boolean controlling the application of refraction.
 
+    context is an optional AstrometryContext caching the star-independent
+    parameters for obs_metadata
+
     Returns
     --------
     A numpy array whose first row is the x coordinate on the pupil in
     radians and whose second row is the y coordinate in radians
     """
 
-    are_arrays = _validate_inputs([ra_obs, dec_obs], ['ra_obs', 'dec_obs'],
-                                  "pupilCoordsFromObserved")
+    _validate_inputs([ra_obs, dec_obs], ['ra_obs', 'dec_obs'], "pupilCoordsFromObserved")
+
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "pupilCoordsFromObserved")
 
     if obs_metadata.rotSkyPos is None:
         raise RuntimeError("Cannot call pupilCoordsFromObserved; "
@@ -188,39 +278,14 @@ def _pupilCoordsFromObserved(ra_obs, dec_obs, obs_metadata, epoch=2000.0, includ
 
     theta = obs_metadata._rotSkyPos
 
-    ra_pointing, dec_pointing = _observedFromICRS(obs_metadata._pointingRA,
-                                                  obs_metadata._pointingDec,
-                                                  obs_metadata=obs_metadata,
-                                                  epoch=epoch,
-                                                  includeRefraction=includeRefraction)
+    ra_pointing, dec_pointing = obs_metadata._observedPointing(epoch=epoch,
+                                                               includeRefraction=includeRefraction,
+                                                               context=context)
 
-    # palpy.ds2tp performs the gnomonic projection on ra_in and dec_in
+    # perform the gnomonic projection on ra_in and dec_in
     # with a tangent point at (pointingRA, pointingDec)
     #
-    if not are_arrays:
-        try:
-            x, y = palpy.ds2tp(ra_obs, dec_obs, ra_pointing, dec_pointing)
-        except:
-            x = np.NaN
-            y = np.NaN
-    else:
-        try:
-            x, y = palpy.ds2tpVector(ra_obs, dec_obs, ra_pointing, dec_pointing)
-        except:
-            # apparently, one of your ra/dec values was improper; we will have to do this
-            # element-wise, putting NaN in the place of the bad values
-            x = []
-            y = []
-            for rr, dd in zip(ra_obs, dec_obs):
-                try:
-                    xx, yy = palpy.ds2tp(rr, dd, ra_pointing, dec_pointing)
-                except:
-                    xx = np.NaN
-                    yy = np.NaN
-                x.append(xx)
-                y.append(yy)
-            x = np.array(x)
-            y = np.array(y)
+    x, y = _gnomonicProjection(ra_obs, dec_obs, ra_pointing, dec_pointing)
 
     # The extra negative sign on x_out comes from the following:
     # The Gnomonic projection as calculated by palpy is such that,
@@ -239,7 +304,7 @@ def _pupilCoordsFromObserved(ra_obs, dec_obs, obs_metadata, epoch=2000.0, includ
     return np.array([x_out, y_out])
 
 
-def raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0):
+def raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0, context=None):
     """
     @param [in] xPupil -- pupil coordinates in radians.
     Can be a numpy array or a number.
@@ -248,11 +313,14 @@ def raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0):
     Can be a numpy array or a number.
 
     @param [in] obs_metadata -- an instantiation of ObservationMetaData characterizing
-    the state of the telescope
+    the state of the telescope (can be None if context is specified)
 
     @param [in] epoch -- julian epoch of the mean equinox used for the coordinate
     transformations (in years; defaults to 2000)
 
+    @param [in] context -- an optional AstrometryContext caching the star-independent
+    parameters for obs_metadata
+
     @param [out] a 2-D numpy array in which the first row is RA and the second
     row is Dec (both in degrees; both in the International Celestial Reference System)
 
@@ -263,12 +331,12 @@ def raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0):
 
     output = _raDecFromPupilCoords(xPupil, yPupil,
                                    obs_metadata=obs_metadata,
-                                   epoch=epoch)
+                                   epoch=epoch, context=context)
 
     return np.degrees(output)
 
 
-def _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0):
+def _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0, context=None):
     """
     @param [in] xPupil -- pupil coordinates in radians.
     Can be a numpy array or a number.
@@ -277,11 +345,14 @@ def _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0):
     Can be a numpy array or a number.
 
     @param [in] obs_metadata -- an instantiation of ObservationMetaData characterizing
-    the state of the telescope
+    the state of the telescope (can be None if context is specified)
 
     @param [in] epoch -- julian epoch of the mean equinox used for the coordinate
     transformations (in years; defaults to 2000)
 
+    @param [in] context -- an optional AstrometryContext caching the star-independent
+    parameters for obs_metadata
+
     @param [out] a 2-D numpy array in which the first row is RA and the second
     row is Dec (both in radians; both in the International Celestial Reference System)
 
@@ -292,6 +363,8 @@ def _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0):
 
     are_arrays = _validate_inputs([xPupil, yPupil], ['xPupil', 'yPupil'], "raDecFromPupilCoords")
 
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "raDecFromPupilCoords")
+
     if obs_metadata is None:
         raise RuntimeError("Cannot call raDecFromPupilCoords without obs_metadata")
 
@@ -310,10 +383,8 @@ def _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0):
         raise RuntimeError("Cannot calculate x_pupil, y_pupil without mjd " +
                            "in obs_metadata")
 
-    ra_pointing, dec_pointing = _observedFromICRS(obs_metadata._pointingRA,
-                                                  obs_metadata._pointingDec,
-                                                  obs_metadata=obs_metadata,
-                                                  epoch=epoch, includeRefraction=True)
+    ra_pointing, dec_pointing = obs_metadata._observedPointing(epoch=epoch, includeRefraction=True,
+                                                               context=context)
 
     # This is the same as theta in pupilCoordsFromRaDec, except without the minus sign.
     # This is because we will be reversing the rotation performed in that other method.
@@ -334,6 +405,551 @@ def _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=None, epoch=2000.0):
 
     ra_icrs, dec_icrs = _icrsFromObserved(raObs, decObs,
                                           obs_metadata=obs_metadata,
-                                          epoch=epoch, includeRefraction=True)
+                                          epoch=epoch, includeRefraction=True,
+                                          context=context)
 
     return np.array([ra_icrs, dec_icrs])
+
+
+def _cubicWeights(positions, origin, step, nNodes):
+    """
+    Return the matrix that interpolates values tabulated at the nodes
+    origin + (k-1)*step, k = 0...nNodes-1, onto positions using cubic
+    convolution (Keys 1981, with a = -0.5).  Each row has four non-zero
+    entries.
+    """
+    s = (positions - origin)/step + 1.0
+    left = np.clip(np.floor(s).astype(int), 1, nNodes-3)
+    t = s - left
+    t2 = t*t
+    t3 = t2*t
+
+    weights = np.zeros((len(positions), nNodes))
+    rows = np.arange(len(positions))
+    weights[rows, left-1] = 0.5*(-t3 + 2.0*t2 - t)
+    weights[rows, left] = 0.5*(3.0*t3 - 5.0*t2 + 2.0)
+    weights[rows, left+1] = 0.5*(-3.0*t3 + 4.0*t2 + t)
+    weights[rows, left+2] = 0.5*(t3 - t2)
+    return weights
+
+
+def raDecFromPupilCoordsGrid(xPupil, yPupil, obs_metadata, epoch=2000.0, nCoarse=33,
+                             tolerance=0.001, nCheck=100, dtype=np.float64, out=None):
+    """
+    Calculate the RA and Dec of every point on a grid of pupil coordinates
+    (e.g. every pixel of a sensor) by interpolating the exact transformation
+    (raDecFromPupilCoords) from a coarse lattice of pupil coordinates.
+
+    The interpolation error is measured at random points of the grid.  If it
+    exceeds tolerance, the lattice is refined until it does not (once the
+    lattice would be as fine as the grid itself, every point is transformed
+    exactly).
+
+    @param [in] xPupil is a 1-D numpy array of the x pupil coordinates of the
+    columns of the grid in radians
+
+    @param [in] yPupil is a 1-D numpy array of the y pupil coordinates of the
+    rows of the grid in radians
+
+    @param [in] obs_metadata is an ObservationMetaData characterizing
+    the state of the telescope
+
+    @param [in] epoch is the julian epoch of the mean equinox used for conversion
+    to ICRS (default 2000.0)
+
+    @param [in] nCoarse is the number of lattice points along each axis
+    of the grid at which the exact transformation is first evaluated (default 33)
+
+    @param [in] tolerance is the largest interpolation error allowed at the
+    check points in arcseconds (default 0.001)
+
+    @param [in] nCheck is the number of check points (default 100)
+
+    @param [in] dtype is the data type of the output (default np.float64; use
+    np.float32 to halve the memory footprint)
+
+    @param [in] out is an optional tuple of two 2-D arrays of shape
+    (len(yPupil), len(xPupil)) in which to store RA and Dec (for example,
+    memory-mapped arrays from numpy.lib.format.open_memmap).  If given, dtype
+    is ignored.
+
+    @param [out] a tuple of 2-D numpy arrays: the ICRS RA and Dec in degrees
+    of grid point (yPupil[i], xPupil[j]) are element [i, j]
+    """
+    xPupil, yPupil = _checkGridInputs(xPupil, yPupil, obs_metadata, epoch)
+    out = _gridOutput(xPupil, yPupil, dtype, out)
+    # convert one block of rows at a time, so that no full-size temporary is made
+    for rows, ra, dec in _raDecGridBlocks(xPupil, yPupil, obs_metadata, epoch, nCoarse,
+                                          tolerance, nCheck):
+        out[0][rows] = np.degrees(ra)
+        out[1][rows] = np.degrees(dec)
+    return out
+
+
+def _raDecFromPupilCoordsGrid(xPupil, yPupil, obs_metadata, epoch=2000.0, nCoarse=33,
+                              tolerance=0.001, nCheck=100, dtype=np.float64, out=None):
+    """
+    Calculate the RA and Dec of every point on a grid of pupil coordinates
+    (e.g. every pixel of a sensor) by interpolating the exact transformation
+    (_raDecFromPupilCoords) from a coarse lattice of pupil coordinates.
+
+    The interpolation error is measured at random points of the grid.  If it
+    exceeds tolerance, the lattice is refined until it does not (once the
+    lattice would be as fine as the grid itself, every point is transformed
+    exactly).
+
+    @param [in] xPupil is a 1-D numpy array of the x pupil coordinates of the
+    columns of the grid in radians
+
+    @param [in] yPupil is a 1-D numpy array of the y pupil coordinates of the
+    rows of the grid in radians
+
+    @param [in] obs_metadata is an ObservationMetaData characterizing
+    the state of the telescope
+
+    @param [in] epoch is the julian epoch of the mean equinox used for conversion
+    to ICRS (default 2000.0)
+
+    @param [in] nCoarse is the number of lattice points along each axis
+    of the grid at which the exact transformation is first evaluated (default 33)
+
+    @param [in] tolerance is the largest interpolation error allowed at the
+    check points in arcseconds (default 0.001)
+
+    @param [in] nCheck is the number of check points (default 100)
+
+    @param [in] dtype is the data type of the output (default np.float64; use
+    np.float32 to halve the memory footprint)
+
+    @param [in] out is an optional tuple of two 2-D arrays of shape
+    (len(yPupil), len(xPupil)) in which to store RA and Dec (for example,
+    memory-mapped arrays from numpy.lib.format.open_memmap).  If given, dtype
+    is ignored.
+
+    @param [out] a tuple of 2-D numpy arrays: the ICRS RA and Dec in radians
+    of grid point (yPupil[i], xPupil[j]) are element [i, j]
+    """
+
+    xPupil, yPupil = _checkGridInputs(xPupil, yPupil, obs_metadata, epoch)
+    out = _gridOutput(xPupil, yPupil, dtype, out)
+    for rows, ra, dec in _raDecGridBlocks(xPupil, yPupil, obs_metadata, epoch, nCoarse,
+                                          tolerance, nCheck):
+        out[0][rows] = ra
+        out[1][rows] = dec
+    return out
+
+
+def _checkGridInputs(xPupil, yPupil, obs_metadata, epoch):
+    """
+    Check the arguments of raDecFromPupilCoordsGrid before any output is
+    allocated, and return xPupil and yPupil as 1-D numpy arrays of floats
+    """
+    if obs_metadata is None:
+        raise RuntimeError("Cannot call raDecFromPupilCoordsGrid without obs_metadata")
+
+    if epoch is None:
+        raise RuntimeError("Cannot call raDecFromPupilCoordsGrid; epoch is None")
+
+    if obs_metadata.rotSkyPos is None:
+        raise RuntimeError("Cannot call raDecFromPupilCoordsGrid without rotSkyPos " +
+                           "in obs_metadata")
+
+    if obs_metadata.pointingRA is None or obs_metadata.pointingDec is None:
+        raise RuntimeError("Cannot call raDecFromPupilCoordsGrid " +
+                           "without pointingRA, pointingDec in obs_metadata")
+
+    if obs_metadata.mjd is None:
+        raise RuntimeError("Cannot call raDecFromPupilCoordsGrid without mjd " +
+                           "in obs_metadata")
+
+    xPupil = np.asarray(xPupil, dtype=float)
+    yPupil = np.asarray(yPupil, dtype=float)
+    if xPupil.ndim != 1 or yPupil.ndim != 1:
+        raise RuntimeError("raDecFromPupilCoordsGrid needs 1-D arrays of xPupil and yPupil")
+
+    return xPupil, yPupil
+
+
+def _gridOutput(xPupil, yPupil, dtype, out):
+    """
+    Return the tuple of RA, Dec arrays that raDecFromPupilCoordsGrid fills
+    (see its dtype and out parameters)
+    """
+    shape = (len(yPupil), len(xPupil))
+    if out is None:
+        out = (np.empty(shape, dtype=dtype), np.empty(shape, dtype=dtype))
+    elif out[0].shape != shape or out[1].shape != shape:
+        raise RuntimeError("The out arrays passed to raDecFromPupilCoordsGrid must have shape "
+                           "%s; you gave %s and %s" % (str(shape), str(out[0].shape),
+                                                       str(out[1].shape)))
+    return out
+
+
+def _raDecGridBlocks(xPupil, yPupil, obs_metadata, epoch, nCoarse, tolerance, nCheck):
+    """
+    Generate the ICRS RA and Dec in radians of the grid of pupil coordinates
+    of _raDecFromPupilCoordsGrid (see there for the parameters) one block of
+    rows at a time, as (rows, ra, dec) tuples, where rows is the slice of
+    grid rows and ra, dec are 2-D numpy arrays.  The arguments must already
+    have been checked by _checkGridInputs.
+    """
+
+    shape = (len(yPupil), len(xPupil))
+
+    raPointing = obs_metadata._pointingRA
+    decPointing = obs_metadata._pointingDec
+
+    # a fixed seed, so that the choice of lattice is reproducible
+    rng = np.random.RandomState(4417)
+    xCheck = rng.randint(0, shape[1], nCheck)
+    yCheck = rng.randint(0, shape[0], nCheck)
+    raCheck, decCheck = _raDecFromPupilCoords(xPupil[xCheck], yPupil[yCheck],
+                                              obs_metadata=obs_metadata, epoch=epoch)
+
+    # process about a million grid points at a time
+    rowsPerBlock = max(1, 1000000//max(shape[1], 1))
+
+    while nCoarse < min(shape):
+        # the lattice extends one step beyond the grid on each side so that
+        # the cubic interpolation never needs to extrapolate
+        xStep = (xPupil.max() - xPupil.min())/(nCoarse - 1)
+        yStep = (yPupil.max() - yPupil.min())/(nCoarse - 1)
+        xLattice = xPupil.min() + xStep*np.arange(-1, nCoarse+1)
+        yLattice = yPupil.min() + yStep*np.arange(-1, nCoarse+1)
+        xMesh, yMesh = np.meshgrid(xLattice, yLattice)
+        raLattice, decLattice = _raDecFromPupilCoords(xMesh.flatten(), yMesh.flatten(),
+                                                      obs_metadata=obs_metadata, epoch=epoch)
+
+        # interpolate positions on the plane tangent to the sky at the pointing,
+        # which vary smoothly across the grid (unlike RA near 0 or 2pi)
+        xiLattice, etaLattice = _gnomonicProjection(raLattice, decLattice, raPointing, decPointing)
+        xiLattice = xiLattice.reshape(xMesh.shape)
+        etaLattice = etaLattice.reshape(xMesh.shape)
+
+        xWeights = _cubicWeights(xPupil, xPupil.min(), xStep, nCoarse+2)
+        yWeights = _cubicWeights(yPupil, yPupil.min(), yStep, nCoarse+2)
+        xiColumns = np.dot(xiLattice, xWeights.transpose())
+        etaColumns = np.dot(etaLattice, xWeights.transpose())
+
+        raTest, decTest = _inverseGnomonicProjection(
+            np.sum(np.dot(yWeights[yCheck], xiLattice)*xWeights[xCheck], axis=1),
+            np.sum(np.dot(yWeights[yCheck], etaLattice)*xWeights[xCheck], axis=1),
+            raPointing, decPointing)
+
+        if arcsecFromRadians(np.max(haversine(raTest, decTest, raCheck, decCheck))) <= tolerance:
+            for rowStart in range(0, shape[0], rowsPerBlock):
+                rows = slice(rowStart, rowStart+rowsPerBlock)
+                ra, dec = _inverseGnomonicProjection(np.dot(yWeights[rows], xiColumns),
+                                                     np.dot(yWeights[rows], etaColumns),
+                                                     raPointing, decPointing)
+                yield rows, ra, dec
+            return
+
+        nCoarse = 2*nCoarse - 1
+
+    # the grid is too small or too distorted to interpolate; transform every point
+    for rowStart in range(0, shape[0], rowsPerBlock):
+        rows = slice(rowStart, rowStart+rowsPerBlock)
+        xMesh, yMesh = np.meshgrid(xPupil, yPupil[rows])
+        ra, dec = _raDecFromPupilCoords(xMesh.flatten(), yMesh.flatten(),
+                                        obs_metadata=obs_metadata, epoch=epoch)
+        yield rows, ra.reshape(xMesh.shape), dec.reshape(xMesh.shape)
+
+
+# Conservative bounds (in radians) on how much the transformation from ICRS to
+# observed coordinates can change the angular distance between two points in
+# the field of view: aberration (twice the annual plus diurnal amplitude),
+# gravitational deflection by the sun and refraction (which is less than
+# _refractionConstant*tan(zenith distance)).
+_aberrationMargin = radiansFromArcsec(42.0)
+_deflectionMargin = radiansFromArcsec(2.0)
+_refractionConstant = radiansFromArcsec(60.0)
+
+# the zenith distance at which the refraction bound is capped
+_maxZenithDistance = np.radians(89.0)
+
+
+def fieldOfViewIndices(ra_in, dec_in, obs_metadata, radius=None, margin=None,
+                       pm_ra=None, pm_dec=None, parallax=None,
+                       epoch=2000.0, includeRefraction=True):
+    """
+    Find the points that could possibly land in the field of view of a telescope
+    pointing, without doing any astrometry.  Use this to cull the rows of a
+    catalog before passing them to pupilCoordsFromRaDec or observedFromICRS.
+
+    The test is conservative: it keeps every point whose mean (ICRS) position is
+    within radius + margin of the pointing, where margin bounds how much
+    aberration, refraction and gravitational deflection can change angular
+    distances, and the motion of each point between epoch and the date of the
+    observation is also allowed for.
+
+    @param [in] ra_in is the ICRS RA in degrees (a numpy array)
+
+    @param [in] dec_in is the ICRS Dec in degrees (a numpy array)
+
+    @param [in] obs_metadata is an ObservationMetaData characterizing the
+    telescope pointing, site and date
+
+    @param [in] radius is the radius of the field of view in degrees.  If None,
+    it is taken from obs_metadata (for box and polygon bounds, the radius of
+    the circle enclosing the bounds)
+
+    @param [in] margin is the extra distance in degrees to allow for the
+    transformation from ICRS to observed coordinates.  If None, a conservative
+    margin is calculated from the zenith distance of the field.
+
+    @param [in] pm_ra is proper motion in RA multiplied by cos(Dec) (arcsec/yr)
+
+    @param [in] pm_dec is proper motion in dec (arcsec/yr)
+
+    @param [in] parallax is parallax in arcsec
+
+    @param [in] epoch is the julian epoch (in years) of the mean positions
+
+    @param [in] includeRefraction is a boolean indicating whether refraction
+    will be applied to the points
+
+    @param [out] a numpy array of the indices of the points that could be in
+    the field of view
+    """
+    if margin is not None:
+        margin = np.radians(margin)
+
+    if radius is not None:
+        radius = np.radians(radius)
+
+    return _fieldOfViewIndices(np.radians(ra_in), np.radians(dec_in), obs_metadata,
+                               radius=radius, margin=margin,
+                               pm_ra=radiansFromArcsec(pm_ra) if pm_ra is not None else None,
+                               pm_dec=radiansFromArcsec(pm_dec) if pm_dec is not None else None,
+                               parallax=radiansFromArcsec(parallax) if parallax is not None else None,
+                               epoch=epoch, includeRefraction=includeRefraction)
+
+
+def _fieldOfViewIndices(ra_in, dec_in, obs_metadata, radius=None, margin=None,
+                        pm_ra=None, pm_dec=None, parallax=None,
+                        epoch=2000.0, includeRefraction=True):
+    """
+    Find the points that could possibly land in the field of view of a telescope
+    pointing, without doing any astrometry.  Use this to cull the rows of a
+    catalog before passing them to _pupilCoordsFromRaDec or _observedFromICRS.
+
+    The test is conservative: it keeps every point whose mean (ICRS) position is
+    within radius + margin of the pointing, where margin bounds how much
+    aberration, refraction and gravitational deflection can change angular
+    distances, and the motion of each point between epoch and the date of the
+    observation is also allowed for.
+
+    @param [in] ra_in is the ICRS RA in radians (a numpy array)
+
+    @param [in] dec_in is the ICRS Dec in radians (a numpy array)
+
+    @param [in] obs_metadata is an ObservationMetaData characterizing the
+    telescope pointing, site and date
+
+    @param [in] radius is the radius of the field of view in radians.  If None,
+    it is taken from obs_metadata (for box and polygon bounds, the radius of
+    the circle enclosing the bounds)
+
+    @param [in] margin is the extra distance in radians to allow for the
+    transformation from ICRS to observed coordinates.  If None, a conservative
+    margin is calculated from the zenith distance of the field.
+
+    @param [in] pm_ra is proper motion in RA multiplied by cos(Dec) (radians/yr)
+
+    @param [in] pm_dec is proper motion in dec (radians/yr)
+
+    @param [in] parallax is parallax in radians
+
+    @param [in] epoch is the julian epoch (in years) of the mean positions
+
+    @param [in] includeRefraction is a boolean indicating whether refraction
+    will be applied to the points
+
+    @param [out] a numpy array of the indices of the points that could be in
+    the field of view
+    """
+
+    _validate_inputs([ra_in, dec_in], ['ra_in', 'dec_in'], "fieldOfViewIndices")
+
+    if obs_metadata is None:
+        raise RuntimeError("Cannot call fieldOfViewIndices without obs_metadata")
+
+    if obs_metadata.pointingRA is None or obs_metadata.pointingDec is None:
+        raise RuntimeError("Cannot call fieldOfViewIndices without pointingRA, pointingDec "
+                           "in obs_metadata")
+
+    if radius is None:
+        if obs_metadata.boundLength is None:
+            raise RuntimeError("Cannot call fieldOfViewIndices without either radius "
+                               "or boundLength in obs_metadata")
+        if obs_metadata.boundType == 'box':
+            halfLengths = np.ones(2)*obs_metadata._boundLength
+            radius = np.sqrt(np.sum(halfLengths*halfLengths))
+        elif obs_metadata.bounds is not None and hasattr(obs_metadata.bounds, 'radius'):
+            # the circle enclosing the bounds (for polygon bounds,
+            # boundLength is only the half-width of the outline)
+            radius = obs_metadata.bounds.radius
+        else:
+            radius = obs_metadata._boundLength
+
+    if margin is None:
+        margin = _aberrationMargin + _deflectionMargin
+        if includeRefraction:
+            if obs_metadata.mjd is None:
+                raise RuntimeError("Cannot calculate the refraction margin in fieldOfViewIndices "
+                                   "without mjd in obs_metadata")
+            alt, az, pa = _altAzPaFromRaDec(obs_metadata._pointingRA, obs_metadata._pointingDec,
+                                            obs_metadata, includeRefraction=False)
+            zenithDistance = min(0.5*np.pi - alt + radius, _maxZenithDistance)
+            margin += _refractionConstant*np.tan(zenithDistance)
+
+    limit = np.zeros(len(ra_in)) + radius + margin
+
+    if pm_ra is not None or pm_dec is not None:
+        if obs_metadata.mjd is None:
+            raise RuntimeError("Cannot allow for proper motion in fieldOfViewIndices "
+                               "without mjd in obs_metadata")
+        years = np.abs(2000.0 + (obs_metadata.mjd.TDB - 51544.5)/365.25 - epoch)
+        pm_ra = np.zeros(len(ra_in)) if pm_ra is None else pm_ra
+        pm_dec = np.zeros(len(ra_in)) if pm_dec is None else pm_dec
+        limit += np.sqrt(pm_ra*pm_ra + pm_dec*pm_dec)*years
+
+    if parallax is not None:
+        limit += np.abs(parallax)
+
+    pointing = cartesianFromSpherical(obs_metadata._pointingRA, obs_metadata._pointingDec)
+    cosDistance = np.dot(cartesianFromSpherical(ra_in, dec_in), pointing)
+
+    # NaNs (in the positions or the proper motions) fail the comparison
+    return np.where(cosDistance >= np.cos(np.minimum(limit, np.pi)))[0]
+
+
+def pupilCoordsFromRaDecMultiVisit(ra_in, dec_in, visit_index, obs_metadata_list,
+                                   pm_ra=None, pm_dec=None, parallax=None,
+                                   v_rad=None, includeRefraction=True,
+                                   epoch=2000.0):
+    """
+    Convert RA and Dec from the sky into pupil coordinates for sources
+    observed in many different visits.
+
+    @param [in] ra_in is in degrees (ICRS).  A numpy array.
+
+    @param [in] dec_in is in degrees (ICRS).  A numpy array.
+
+    @param [in] visit_index is a numpy array of ints indicating which
+    element of obs_metadata_list each source was observed in
+
+    @param [in] obs_metadata_list is a list of ObservationMetaData (or an
+    ObservationMetaDataBatch) characterizing the visits
+
+    @param [in] pm_ra is proper motion in RA multiplied by cos(Dec) (arcsec/yr)
+    Can be a numpy array or None (default=None).
+
+    @param [in] pm_dec is proper motion in dec (arcsec/yr)
+    Can be a numpy array or None (default=None).
+
+    @param [in] parallax is parallax in arcsec
+    Can be a numpy array or None (default=None).
+
+    @param [in] v_rad is radial velocity (km/s)
+    Can be a numpy array or None (default=None).
+
+    @param [in] includeRefraction is a boolean controlling the application of refraction.
+
+    @param [in] epoch is the epoch of mean ra and dec in julian years (default=2000.0)
+
+    @param [out] returns a numpy array whose first row is the x coordinate on the pupil in
+    radians and whose second row is the y coordinate in radians (in the same order as
+    the inputs)
+    """
+
+    if pm_ra is not None:
+        pm_ra_in = radiansFromArcsec(pm_ra)
+    else:
+        pm_ra_in = None
+
+    if pm_dec is not None:
+        pm_dec_in = radiansFromArcsec(pm_dec)
+    else:
+        pm_dec_in = None
+
+    if parallax is not None:
+        parallax_in = radiansFromArcsec(parallax)
+    else:
+        parallax_in = None
+
+    return _pupilCoordsFromRaDecMultiVisit(np.radians(ra_in), np.radians(dec_in),
+                                           visit_index, obs_metadata_list,
+                                           pm_ra=pm_ra_in, pm_dec=pm_dec_in,
+                                           parallax=parallax_in, v_rad=v_rad,
+                                           includeRefraction=includeRefraction,
+                                           epoch=epoch)
+
+
+def _pupilCoordsFromRaDecMultiVisit(ra_in, dec_in, visit_index, obs_metadata_list,
+                                    pm_ra=None, pm_dec=None, parallax=None,
+                                    v_rad=None, includeRefraction=True,
+                                    epoch=2000.0):
+    """
+    Convert RA and Dec from the sky into pupil coordinates for sources
+    observed in many different visits.
+
+    The star-independent parameters are calculated once per distinct visit
+    in visit_index and _pupilCoordsFromRaDec is called once on all of the
+    sources belonging to that visit.
+
+    @param [in] ra_in is in radians (ICRS).  A numpy array.
+
+    @param [in] dec_in is in radians (ICRS).  A numpy array.
+
+    @param [in] visit_index is a numpy array of ints indicating which
+    element of obs_metadata_list each source was observed in
+
+    @param [in] obs_metadata_list is a list of ObservationMetaData (or an
+    ObservationMetaDataBatch) characterizing the visits
+
+    @param [in] pm_ra is proper motion in RA multiplied by cos(Dec) (radians/yr)
+    Can be a numpy array or None (default=None).
+
+    @param [in] pm_dec is proper motion in dec (radians/yr)
+    Can be a numpy array or None (default=None).
+
+    @param [in] parallax is parallax in radians
+    Can be a numpy array or None (default=None).
+
+    @param [in] v_rad is radial velocity (km/s)
+    Can be a numpy array or None (default=None).
+
+    @param [in] includeRefraction is a boolean controlling the application of refraction.
+
+    @param [in] epoch is the epoch of mean ra and dec in julian years (default=2000.0)
+
+    @param [out] returns a numpy array whose first row is the x coordinate on the pupil in
+    radians and whose second row is the y coordinate in radians (in the same order as
+    the inputs)
+    """
+
+    are_arrays = _validate_inputs([ra_in, dec_in, visit_index],
+                                  ['ra_in', 'dec_in', 'visit_index'],
+                                  "pupilCoordsFromRaDecMultiVisit")
+
+    if not are_arrays:
+        raise RuntimeError("pupilCoordsFromRaDecMultiVisit only accepts numpy arrays")
+
+    output = np.empty((2, len(ra_in)), dtype=float)
+
+    for visit, dex in _groupByVisit(visit_index, len(obs_metadata_list),
+                                    "pupilCoordsFromRaDecMultiVisit"):
+
+        context = AstrometryContext(obs_metadata_list[visit])
+
+        output[:, dex] = _pupilCoordsFromRaDec(ra_in[dex], dec_in[dex],
+                                               pm_ra=_sliceOrNone(pm_ra, dex),
+                                               pm_dec=_sliceOrNone(pm_dec, dex),
+                                               parallax=_sliceOrNone(parallax, dex),
+                                               v_rad=_sliceOrNone(v_rad, dex),
+                                               includeRefraction=includeRefraction,
+                                               epoch=epoch, context=context)
+
+    return output
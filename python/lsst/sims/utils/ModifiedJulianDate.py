@@ -1,12 +1,14 @@
 from builtins import object
 import warnings
 import numpy as np
+import numbers
 import copy
 
 from astropy.time import Time
 from astropy.utils.iers.iers import IERSRangeError
 
-__all__ = ["ModifiedJulianDate", "MJDWarning", "UTCtoUT1Warning"]
+__all__ = ["ModifiedJulianDate", "ModifiedJulianDateArray",
+           "MJDWarning", "UTCtoUT1Warning"]
 
 
 class MJDWarning(Warning):
@@ -30,6 +32,25 @@ class UTCtoUT1Warning(MJDWarning):
 
 class ModifiedJulianDate(object):
 
+    # an optional TimeScaleTables to use in place of astropy.time.Time
+    # (see set_time_scale_tables())
+    _time_scale_tables = None
+
+    @classmethod
+    def set_time_scale_tables(cls, tables):
+        """
+        Use precomputed lookup tables, rather than astropy.time.Time, to
+        convert between time scales for all ModifiedJulianDates and
+        ModifiedJulianDateArrays instantiated from now on.
+
+        @param [in] tables is an instantiation of TimeScaleTables
+        (or None, to go back to using astropy.time.Time)
+
+        Dates that are not covered by the tables (i.e. before 1972) are
+        still converted with astropy.time.Time.
+        """
+        cls._time_scale_tables = tables
+
     @classmethod
     def _get_ut1_from_utc(cls, UTC):
         """
@@ -84,30 +105,23 @@ class ModifiedJulianDate(object):
         if TAI is not None and UTC is not None:
             raise RuntimeError("You should not specify both TAI and UTC in ModifiedJulianDate.get_list()")
 
-        if TAI is not None:
-            time_list = Time(TAI, scale='tai', format='mjd')
-            tai_list = TAI
-            utc_list = time_list.utc.mjd
-        elif UTC is not None:
-            time_list = Time(UTC, scale='utc', format='mjd')
-            utc_list = UTC
-            tai_list = time_list.tai.mjd
-
-        tt_list = time_list.tt.mjd
-        tdb_list = time_list.tdb.mjd
-
-        ut1_list, dut1_list = cls._get_ut1_from_utc(utc_list)
-
-        values = np.array([tai_list, utc_list, tt_list, tdb_list,
-                           ut1_list, dut1_list]).transpose()
+        return list(ModifiedJulianDateArray(TAI=TAI, UTC=UTC))
 
-        output = []
-        for vv in values:
-            mjd = ModifiedJulianDate(TAI=40000.0)
-            mjd._force_values(vv)
-            output.append(mjd)
-
-        return output
+    @classmethod
+    def _from_values(cls, values):
+        """
+        Instantiate a ModifiedJulianDate from a list of
+        [TAI, UTC, TT, TDB, UT1, UT1-UTC] values without instantiating
+        an astropy.time.Time (one will be instantiated if it is ever needed).
+        Users should not try to use this method by hand.
+        """
+        mjd = cls.__new__(cls)
+        mjd._time = None
+        mjd._initialized_with = 'TAI'
+        mjd._ut1_out_of_bounds = False
+        mjd._dut1_out_of_bounds = False
+        mjd._force_values(values)
+        return mjd
 
     def __init__(self, TAI=None, UTC=None):
         """
@@ -124,6 +138,22 @@ class ModifiedJulianDate(object):
             raise RuntimeError("You must specify either TAI or UTC to "
                                "instantiate ModifiedJulianDate")
 
+        self._ut1_out_of_bounds = False
+        self._dut1_out_of_bounds = False
+        tables = ModifiedJulianDate._time_scale_tables
+
+        if tables is not None and tables.covers(TAI=TAI, UTC=UTC):
+            # converting all of the time scales with the tables is cheaper
+            # than instantiating an astropy.time.Time
+            values, in_range = tables.convert(TAI=TAI, UTC=UTC)
+            self._time = None
+            self._initialized_with = 'TAI' if TAI is not None else 'UTC'
+            self._force_values(values[:, 0])
+            # UT1 and dut1 each warn, once, when they are first read
+            self._ut1_out_of_bounds = not in_range[0]
+            self._dut1_out_of_bounds = not in_range[0]
+            return
+
         if TAI is not None:
             self._time = Time(TAI, scale='tai', format='mjd')
             self._tai = TAI
@@ -157,8 +187,21 @@ class ModifiedJulianDate(object):
         self._ut1 = values[4]
         self._dut1 = values[5]
 
+    def _get_time(self):
+        """
+        Return the astropy.time.Time characterizing this ModifiedJulianDate,
+        instantiating it if it does not already exist.
+        """
+        if self._time is None:
+            if self._initialized_with == 'TAI':
+                self._time = Time(self._tai, scale='tai', format='mjd')
+            else:
+                self._time = Time(self._utc, scale='utc', format='mjd')
+
+        return self._time
+
     def __eq__(self, other):
-        return self._time == other._time
+        return self._get_time() == other._get_time()
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -196,7 +239,7 @@ class ModifiedJulianDate(object):
         International Atomic Time as an MJD
         """
         if self._tai is None:
-            self._tai = self._time.tai.mjd
+            self._tai = self._get_time().tai.mjd
 
         return self._tai
 
@@ -206,7 +249,7 @@ class ModifiedJulianDate(object):
         Universal Coordinate Time as an MJD
         """
         if self._utc is None:
-            self._utc = self._time.utc.mjd
+            self._utc = self._get_time().utc.mjd
 
         return self._utc
 
@@ -215,9 +258,13 @@ class ModifiedJulianDate(object):
         """
         Universal Time as an MJD
         """
+        if self._ut1_out_of_bounds:
+            self._warn_utc_out_of_bounds('UT1')
+            self._ut1_out_of_bounds = False
+
         if self._ut1 is None:
             try:
-                self._ut1 = self._time.ut1.mjd
+                self._ut1 = self._get_time().ut1.mjd
             except IERSRangeError:
                 self._warn_utc_out_of_bounds('UT1')
                 self._ut1 = self.UTC
@@ -230,9 +277,13 @@ class ModifiedJulianDate(object):
         UT1-UTC in seconds
         """
 
+        if self._dut1_out_of_bounds:
+            self._warn_utc_out_of_bounds('dut1')
+            self._dut1_out_of_bounds = False
+
         if self._dut1 is None:
             try:
-                self._dut1 = self._time.delta_ut1_utc
+                self._dut1 = self._get_time().delta_ut1_utc
             except IERSRangeError:
                 self._warn_utc_out_of_bounds('dut1')
                 self._dut1 = 0.0
@@ -245,7 +296,7 @@ class ModifiedJulianDate(object):
         Terrestrial Time (aka Terrestrial Dynamical Time) as an MJD
         """
         if self._tt is None:
-            self._tt = self._time.tt.mjd
+            self._tt = self._get_time().tt.mjd
 
         return self._tt
 
@@ -255,7 +306,214 @@ class ModifiedJulianDate(object):
         Barycentric Dynamical Time as an MJD
         """
         if self._tdb is None:
-            self._tdb = self._time.tdb.mjd
+            self._tdb = self._get_time().tdb.mjd
 
         return self._tdb
 
+
+class ModifiedJulianDateArray(object):
+    """
+    An array-valued analog of ModifiedJulianDate.  The TAI, UTC, TT, TDB,
+    UT1 and dut1 properties are numpy arrays calculated in bulk the first
+    time they are requested.
+
+    Indexing with an int returns a ModifiedJulianDate whose properties are
+    copied from those already calculated for the whole array (any others
+    are calculated for that one date when requested).  Indexing with a
+    slice or an array of ints or bools returns a ModifiedJulianDateArray.
+    """
+
+    _scales = ('TAI', 'UTC', 'TT', 'TDB', 'UT1', 'dut1')
+
+    def __init__(self, TAI=None, UTC=None):
+        """
+        Must specify either:
+
+        @param [in] TAI = a numpy array of International Atomic Times as MJDs
+
+        or
+
+        @param [in] UTC = a numpy array of Universal Coordinate Times as MJDs
+        """
+
+        if TAI is None and UTC is None:
+            raise RuntimeError("You must specify either TAI or UTC to "
+                               "instantiate ModifiedJulianDateArray")
+
+        if TAI is not None and UTC is not None:
+            raise RuntimeError("You should not specify both TAI and UTC "
+                               "in ModifiedJulianDateArray")
+
+        self._values = dict((scale, None) for scale in self._scales)
+        self._time = None
+
+        if TAI is not None:
+            self._values['TAI'] = np.atleast_1d(np.asarray(TAI, dtype=float))
+            self._initialized_with = 'TAI'
+        else:
+            self._values['UTC'] = np.atleast_1d(np.asarray(UTC, dtype=float))
+            self._initialized_with = 'UTC'
+
+    def __len__(self):
+        return len(self._values[self._initialized_with])
+
+    def __iter__(self):
+        values = self._all_values()
+        for ix in range(len(self)):
+            yield ModifiedJulianDate._from_values(values[:, ix])
+
+    def __getitem__(self, key):
+        if isinstance(key, numbers.Integral):
+            return self._get_scalar(key)
+
+        output = ModifiedJulianDateArray.__new__(ModifiedJulianDateArray)
+        output._initialized_with = self._initialized_with
+        output._values = dict((scale, None if self._values[scale] is None
+                               else self._values[scale][key])
+                              for scale in self._scales)
+        output._time = None if self._time is None else self._time[key]
+        return output
+
+    def _get_scalar(self, key):
+        """
+        Return the ModifiedJulianDate at the int index key.  Only the time
+        scales that have already been calculated for the whole array are
+        copied; the others are calculated for the one date if they are
+        ever requested.
+        """
+        values = [None if self._values[scale] is None else self._values[scale][key]
+                  for scale in self._scales]
+
+        if any(value is None for value in values):
+            initial_value = self._values[self._initialized_with][key]
+            if ModifiedJulianDate._time_scale_tables is not None:
+                return ModifiedJulianDate(**{self._initialized_with: initial_value})
+
+            mjd = ModifiedJulianDate.__new__(ModifiedJulianDate)
+            mjd._time = None
+            mjd._initialized_with = self._initialized_with
+            mjd._ut1_out_of_bounds = False
+            mjd._dut1_out_of_bounds = False
+            mjd._force_values(values)
+            return mjd
+
+        return ModifiedJulianDate._from_values(values)
+
+    def _get_time(self):
+        """
+        Return the astropy.time.Time characterizing all of these dates,
+        instantiating it if it does not already exist.
+        """
+        if self._time is None:
+            if self._initialized_with == 'TAI':
+                self._time = Time(self._values['TAI'], scale='tai', format='mjd')
+            else:
+                self._time = Time(self._values['UTC'], scale='utc', format='mjd')
+
+        return self._time
+
+    def _set_from_tables(self, scale):
+        """
+        If ModifiedJulianDate is using TimeScaleTables and they cover these
+        dates, set all of the time scales from the tables and return True.
+        Otherwise, do nothing and return False.
+
+        @param [in] scale is the name of the time scale being requested
+        """
+        if self._values[scale] is not None:
+            return True
+
+        tables = ModifiedJulianDate._time_scale_tables
+        if tables is None:
+            return False
+
+        initial_values = self._values[self._initialized_with]
+        kwargs = {self._initialized_with: initial_values}
+        if not tables.covers(**kwargs):
+            return False
+
+        values, in_range = tables.convert(**kwargs)
+        for ix, name in enumerate(self._scales):
+            self._values[name] = values[ix]
+        self._values[self._initialized_with] = initial_values
+
+        if not in_range.all():
+            warnings.warn("ModifiedJulianDateArray was given date values that are outside "
+                          "of the range of interpolation for converting from UTC to UT1. "
+                          "We will treat UT1=UTC for those dates, lacking a better alternative.",
+                          category=UTCtoUT1Warning)
+        return True
+
+    def _all_values(self):
+        """
+        Return a 2-D numpy array whose rows are TAI, UTC, TT, TDB, UT1 and dut1
+        """
+        return np.array([getattr(self, scale) for scale in self._scales])
+
+    @property
+    def TAI(self):
+        """
+        International Atomic Time as a numpy array of MJDs
+        """
+        if not self._set_from_tables('TAI'):
+            self._values['TAI'] = self._get_time().tai.mjd
+
+        return self._values['TAI']
+
+    @property
+    def UTC(self):
+        """
+        Universal Coordinate Time as a numpy array of MJDs
+        """
+        if not self._set_from_tables('UTC'):
+            self._values['UTC'] = self._get_time().utc.mjd
+
+        return self._values['UTC']
+
+    def _set_ut1(self):
+        """
+        Calculate UT1 and dut1 for all of these dates
+        """
+        ut1, dut1 = ModifiedJulianDate._get_ut1_from_utc(self.UTC)
+        self._values['UT1'] = ut1
+        self._values['dut1'] = dut1
+
+    @property
+    def UT1(self):
+        """
+        Universal Time as a numpy array of MJDs
+        """
+        if not self._set_from_tables('UT1'):
+            self._set_ut1()
+
+        return self._values['UT1']
+
+    @property
+    def dut1(self):
+        """
+        numpy array of UT1-UTC in seconds
+        """
+        if not self._set_from_tables('dut1'):
+            self._set_ut1()
+
+        return self._values['dut1']
+
+    @property
+    def TT(self):
+        """
+        Terrestrial Time (aka Terrestrial Dynamical Time) as a numpy array of MJDs
+        """
+        if not self._set_from_tables('TT'):
+            self._values['TT'] = self._get_time().tt.mjd
+
+        return self._values['TT']
+
+    @property
+    def TDB(self):
+        """
+        Barycentric Dynamical Time as a numpy array of MJDs
+        """
+        if not self._set_from_tables('TDB'):
+            self._values['TDB'] = self._get_time().tdb.mjd
+
+        return self._values['TDB']
@@ -2,7 +2,7 @@ from builtins import zip
 from builtins import object
 import numpy as np
 import numbers
-from .SpatialBounds import SpatialBounds
+from .SpatialBounds import SpatialBounds, PolygonBounds
 from lsst.sims.utils import ModifiedJulianDate
 from lsst.sims.utils import Site
 
@@ -26,7 +26,7 @@ class ObservationMetaData(object):
           Celestial Reference System)
 
         * boundType characterizes the shape of the field of view.  Current options
-          are 'box, and 'circle'
+          are 'box', 'circle' and 'polygon'
 
         * boundLength is the characteristic length scale of the field of view in degrees.
 
@@ -37,6 +37,13 @@ class ObservationMetaData(object):
 
           If boundType is 'circle,' this will be the radius of the circle.
 
+          If boundType is 'polygon', boundLength is half the width of the square
+          (or, if a numpy array, half the x and y widths of the rectangle) outlining
+          the camera in pupil coordinates.  If rotSkyPos and mjd are known, the
+          corners of the outline are transformed into RA, Dec with raDecFromPupilCoords;
+          otherwise the polygon is a rectangle aligned with RA, Dec on the plane
+          tangent to the sky at the pointing.
+
           The bound will be centered on the point (pointingRA, pointingDec), however,
           because objects are stored at their mean RA, Dec in the LSST databases
           (i.e. they are stored at values of RA, Dec which neglect proper motion), the
@@ -103,6 +110,7 @@ class ObservationMetaData(object):
         self._skyBrightness = skyBrightness
         self._site = site
         self._OpsimMetaData = None
+        self._observedPointingCache = {}
 
         if mjd is not None:
             if isinstance(mjd, numbers.Number):
@@ -273,6 +281,10 @@ class ObservationMetaData(object):
 
         If self._boundType, self._boundLength, self._pointingRA, or
         self._pointingDec are None, nothing will happen.
+
+        If self._boundType is 'polygon' and rotSkyPos and mjd are known,
+        the polygon is the square (or rectangle) of half-width boundLength
+        in pupil coordinates, transformed into RA, Dec.
         """
 
         if self._boundType is None:
@@ -284,9 +296,43 @@ class ObservationMetaData(object):
         if self._pointingRA is None or self._pointingDec is None:
             return
 
+        if self._boundType == 'polygon' and self._rotSkyPos is not None and self._mjd is not None:
+            # the outline of the camera, transformed from pupil coordinates to RA, Dec
+            xLength, yLength = np.ones(2)*self._boundLength
+            xPupil = np.tan(np.array([xLength, -xLength, -xLength, xLength]))
+            yPupil = np.tan(np.array([yLength, yLength, -yLength, -yLength]))
+            self._bounds = PolygonBounds.fromPupilCoords(xPupil, yPupil, self)
+            return
+
         self._bounds = SpatialBounds.getSpatialBounds(self._boundType, self._pointingRA, self._pointingDec,
                                                       self._boundLength)
 
+    def _observedPointing(self, epoch=2000.0, includeRefraction=True, context=None):
+        """
+        Return the observed RA and Dec (in radians) of the telescope pointing,
+        i.e. the result of calling _observedFromICRS on (pointingRA, pointingDec).
+
+        The result is memoized by epoch and includeRefraction, and discarded
+        whenever pointingRA, pointingDec, mjd or site is set.
+
+        @param [in] epoch is the julian epoch (in years) of the mean equinox
+
+        @param [in] includeRefraction is a boolean indicating whether or not
+        to include the effects of refraction
+
+        @param [in] context is an optional AstrometryContext for this
+        ObservationMetaData, used if the pointing has to be calculated
+        """
+        key = (epoch, bool(includeRefraction))
+        if key not in self._observedPointingCache:
+            # imported here so that importing this module does not import palpy
+            from lsst.sims.utils import _observedFromICRS
+            self._observedPointingCache[key] = _observedFromICRS(self._pointingRA, self._pointingDec,
+                                                                 obs_metadata=self, epoch=epoch,
+                                                                 includeRefraction=includeRefraction,
+                                                                 context=context)
+        return self._observedPointingCache[key]
+
     @property
     def pointingRA(self):
         """
@@ -301,6 +347,7 @@ class ObservationMetaData(object):
     @pointingRA.setter
     def pointingRA(self, value):
         self._pointingRA = np.radians(value)
+        self._observedPointingCache = {}
         self._buildBounds()
 
     @property
@@ -317,6 +364,7 @@ class ObservationMetaData(object):
     @pointingDec.setter
     def pointingDec(self, value):
         self._pointingDec = np.radians(value)
+        self._observedPointingCache = {}
         self._buildBounds()
 
     @property
@@ -378,6 +426,8 @@ class ObservationMetaData(object):
     @rotSkyPos.setter
     def rotSkyPos(self, value):
         self._rotSkyPos = np.radians(value)
+        if self._boundType == 'polygon':
+            self._buildBounds()
 
     @property
     def m5(self):
@@ -415,6 +465,9 @@ class ObservationMetaData(object):
     @site.setter
     def site(self, value):
         self._site = value
+        self._observedPointingCache = {}
+        if self._boundType == 'polygon':
+            self._buildBounds()
 
     @property
     def mjd(self):
@@ -436,6 +489,10 @@ class ObservationMetaData(object):
         else:
             raise RuntimeError("You can only set mjd to either a float or a ModifiedJulianDate")
 
+        self._observedPointingCache = {}
+        if self._boundType == 'polygon':
+            self._buildBounds()
+
     @property
     def bandpass(self):
         """
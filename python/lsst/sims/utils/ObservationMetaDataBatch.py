@@ -0,0 +1,245 @@
+from builtins import object
+import numpy as np
+import numbers
+from lsst.sims.utils import Site
+from lsst.sims.utils import ObservationMetaData
+
+__all__ = ["ObservationMetaDataBatch"]
+
+
+class ObservationMetaDataBatch(object):
+    """
+    This class stores the metadata for many telescope pointings as numpy
+    columns, rather than as one ObservationMetaData per pointing.  It is
+    meant for handling entire OpSim runs, for which instantiating millions
+    of ObservationMetaData (each with its own ModifiedJulianDate and
+    SpatialBounds) is prohibitively slow and memory-intensive.
+
+    Indexing with an int returns an ObservationMetaData characterizing that
+    pointing (instantiated on demand).  Indexing with a slice returns an
+    ObservationMetaDataBatch whose columns are views into the columns of
+    this one.  Indexing with an array of ints or bools returns an
+    ObservationMetaDataBatch of the selected pointings.
+
+    ObservationMetaDataBatch can be passed as the obs_metadata_list
+    of the *MultiVisit coordinate transformations.
+
+    **Parameters**
+
+        * pointingRA, pointingDec are numpy arrays of the coordinates of
+          the pointings (in degrees; in the International Celestial Reference System)
+
+        * mjd is a numpy array of the dates of the pointings (in International
+          Atomic Time)
+
+        * rotSkyPos is a numpy array of the orientations of the telescope in degrees
+          (see the ObservationMetaData docstring for conventions)
+
+        * bandpassName is a numpy array of the names of the bandpasses
+          (one per pointing)
+
+        * m5 is a numpy array of the 5-sigma limiting magnitudes in bandpassName
+
+        * seeing is a numpy array of the seeing in arcseconds in bandpassName
+
+        * skyBrightness is a numpy array of the magnitude of the sky in bandpassName
+
+        * boundType and boundLength characterize the field of view of every
+          pointing (see the ObservationMetaData docstring)
+
+        * site: an instantiation of the lsst.sims.utils.Site class characterizing
+          the site of the observatory (shared by all pointings)
+
+    All of the numpy arrays must be the same length.  All parameters
+    except pointingRA, pointingDec and mjd are optional.
+    """
+
+    _column_names = ('pointingRA', 'pointingDec', 'mjd', 'rotSkyPos',
+                     'bandpassName', 'm5', 'seeing', 'skyBrightness')
+
+    def __init__(self, pointingRA, pointingDec, mjd, rotSkyPos=None,
+                 bandpassName=None, m5=None, seeing=None, skyBrightness=None,
+                 boundType=None, boundLength=None, site=Site(name='LSST')):
+
+        self._columns = {}
+        self._boundType = boundType
+        self._boundLength = boundLength
+        self._site = site
+
+        n_pointings = None
+        for name, value in zip(self._column_names,
+                               (pointingRA, pointingDec, mjd, rotSkyPos,
+                                bandpassName, m5, seeing, skyBrightness)):
+
+            if value is None:
+                if name in ('pointingRA', 'pointingDec', 'mjd'):
+                    raise RuntimeError("You must specify %s when " % name +
+                                       "instantiating ObservationMetaDataBatch")
+                self._columns[name] = None
+                continue
+
+            if not isinstance(value, np.ndarray) or value.ndim != 1:
+                raise RuntimeError("The column %s passed to " % name +
+                                   "ObservationMetaDataBatch must be a 1-D numpy array")
+
+            if n_pointings is None:
+                n_pointings = len(value)
+            elif len(value) != n_pointings:
+                raise RuntimeError("The columns passed to ObservationMetaDataBatch "
+                                   "must all have the same length")
+
+            self._columns[name] = value
+
+        if (m5 is not None or seeing is not None) and bandpassName is None:
+            raise RuntimeError("You cannot set m5 or seeing if you have not set "
+                               "bandpassName in ObservationMetaDataBatch")
+
+        self._n_pointings = n_pointings
+
+    @classmethod
+    def _fromColumns(cls, columns, boundType, boundLength, site):
+        """
+        Instantiate an ObservationMetaDataBatch from an already-validated
+        dict of columns without checking them again.
+        """
+        batch = cls.__new__(cls)
+        batch._columns = columns
+        batch._boundType = boundType
+        batch._boundLength = boundLength
+        batch._site = site
+        batch._n_pointings = len(columns['mjd'])
+        return batch
+
+    def __len__(self):
+        return self._n_pointings
+
+    def __iter__(self):
+        for ix in range(self._n_pointings):
+            yield self._getObservationMetaData(ix)
+
+    def __getitem__(self, key):
+        if isinstance(key, numbers.Integral):
+            if key < 0:
+                key += self._n_pointings
+            if key < 0 or key >= self._n_pointings:
+                raise IndexError("index %d is out of range for an " % key +
+                                 "ObservationMetaDataBatch of length %d" % self._n_pointings)
+            return self._getObservationMetaData(key)
+
+        columns = {}
+        for name in self._column_names:
+            if self._columns[name] is None:
+                columns[name] = None
+            else:
+                columns[name] = self._columns[name][key]
+
+        return ObservationMetaDataBatch._fromColumns(columns, self._boundType,
+                                                     self._boundLength, self._site)
+
+    def _getObservationMetaData(self, ix):
+        """
+        Return an ObservationMetaData characterizing the ix-th pointing
+        """
+        values = {}
+        for name in self._column_names:
+            if self._columns[name] is None:
+                values[name] = None
+            elif name == 'bandpassName':
+                values[name] = str(self._columns[name][ix])
+            else:
+                values[name] = float(self._columns[name][ix])
+
+        return ObservationMetaData(pointingRA=values['pointingRA'],
+                                   pointingDec=values['pointingDec'],
+                                   mjd=values['mjd'],
+                                   rotSkyPos=values['rotSkyPos'],
+                                   bandpassName=values['bandpassName'],
+                                   m5=values['m5'], seeing=values['seeing'],
+                                   skyBrightness=values['skyBrightness'],
+                                   boundType=self._boundType,
+                                   boundLength=self._boundLength,
+                                   site=self._site)
+
+    @property
+    def pointingRA(self):
+        """
+        numpy array of the RA of the pointings in degrees
+        (in the International Celestial Reference System).
+        """
+        return self._columns['pointingRA']
+
+    @property
+    def pointingDec(self):
+        """
+        numpy array of the Dec of the pointings in degrees
+        (in the International Celestial Reference System).
+        """
+        return self._columns['pointingDec']
+
+    @property
+    def mjd(self):
+        """
+        numpy array of the dates of the pointings in International Atomic Time
+        """
+        return self._columns['mjd']
+
+    @property
+    def rotSkyPos(self):
+        """
+        numpy array of the rotation of the telescope with respect
+        to the sky in degrees.
+        """
+        return self._columns['rotSkyPos']
+
+    @property
+    def bandpass(self):
+        """
+        numpy array of the bandpass names of the pointings
+        """
+        return self._columns['bandpassName']
+
+    @property
+    def m5(self):
+        """
+        numpy array of the 5-sigma limiting magnitudes of the pointings
+        """
+        return self._columns['m5']
+
+    @property
+    def seeing(self):
+        """
+        numpy array of the seeing in arcseconds of the pointings
+        """
+        return self._columns['seeing']
+
+    @property
+    def skyBrightness(self):
+        """
+        numpy array of the sky brightness in mags per square arcsecond
+        of the pointings
+        """
+        return self._columns['skyBrightness']
+
+    @property
+    def boundType(self):
+        """
+        Tag indicating what sub-class of SpatialBounds characterizes
+        the field of view of every pointing.
+        """
+        return self._boundType
+
+    @property
+    def boundLength(self):
+        """
+        The characteristic length scale of the field of view of every
+        pointing in degrees.
+        """
+        return self._boundLength
+
+    @property
+    def site(self):
+        """
+        An instantiation of the Site class containing information about
+        the telescope site.
+        """
+        return self._site
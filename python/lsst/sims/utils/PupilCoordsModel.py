@@ -0,0 +1,261 @@
+from builtins import object
+import numpy as np
+from numpy.polynomial import polynomial
+from lsst.sims.utils.CodeUtilities import _validate_inputs
+from lsst.sims.utils import _pupilCoordsFromRaDec, _raDecFromPupilCoords
+from lsst.sims.utils import arcsecFromRadians, haversine
+from lsst.sims.utils.FocalPlaneUtils import _gnomonicProjection, _inverseGnomonicProjection
+
+__all__ = ["PupilCoordsModel"]
+
+
+class PupilCoordsModel(object):
+    """
+    This class approximates the transformation between ICRS RA, Dec and
+    pupil coordinates (i.e. _pupilCoordsFromRaDec and _raDecFromPupilCoords)
+    for one ObservationMetaData with a fitted model, in the spirit of a TAN-SIP
+    WCS: RA, Dec are projected onto the plane tangent to the sky at the
+    (ICRS) telescope pointing, and a 2-D polynomial maps that plane onto
+    pupil coordinates.  A second polynomial maps pupil coordinates back.
+
+    Across a field of view, precession, nutation, aberration and refraction
+    vary smoothly, so a low order polynomial reproduces them very well and
+    costs only a few multiply-adds per source.
+
+    The polynomials are fit to the exact transformation evaluated on a grid
+    of points and then checked against the exact transformation at random
+    points within the field of view.  If the largest residual exceeds the
+    accuracy budget (the kwarg tolerance), the model is not used: all of its
+    methods call the exact transformation instead (see the attribute useFit).
+    Points outside of the fitted field of view are always transformed
+    exactly.
+
+    Note: as with calling _pupilCoordsFromRaDec without them, the model
+    neglects proper motion, parallax and radial velocity.
+    """
+
+    def __init__(self, obs_metadata, radius=1.75, order=4, tolerance=0.001,
+                 epoch=2000.0, nGrid=25, nCheck=1000):
+        """
+        @param [in] obs_metadata is an ObservationMetaData characterizing the
+        telescope location, pointing and rotation
+
+        @param [in] radius is the radius of the field of view (in degrees)
+        over which the model is fit (default 1.75)
+
+        @param [in] order is the order of the polynomials (default 4)
+
+        @param [in] tolerance is the accuracy budget in arcseconds (default 0.001).
+        If the model cannot reproduce the exact transformation to within
+        tolerance, the exact transformation is used instead.
+
+        @param [in] epoch is the epoch of the mean RA and Dec in julian years
+        (default 2000.0)
+
+        @param [in] nGrid is the number of grid points along each side of
+        the tangent plane used in the fit (default 25)
+
+        @param [in] nCheck is the number of random points at which the fit
+        is compared with the exact transformation (default 1000)
+        """
+
+        if obs_metadata is None:
+            raise RuntimeError("Cannot instantiate PupilCoordsModel; obs_metadata is None")
+
+        if obs_metadata.pointingRA is None or obs_metadata.pointingDec is None:
+            raise RuntimeError("Cannot instantiate PupilCoordsModel without pointingRA, "
+                               "pointingDec in obs_metadata")
+
+        if nGrid <= order:
+            raise RuntimeError("PupilCoordsModel needs nGrid > order; you gave nGrid=%d, "
+                               "order=%d" % (nGrid, order))
+
+        self._obs_metadata = obs_metadata
+        self._epoch = epoch
+        self._order = order
+        self._tolerance = tolerance
+        self._radius = np.radians(radius)
+        self._scale = np.tan(self._radius)
+        self._raPointing = obs_metadata._pointingRA
+        self._decPointing = obs_metadata._pointingDec
+
+        # the terms u^i v^j with i+j <= order
+        dex = np.arange(order+1)
+        self._terms = np.add.outer(dex, dex) <= order
+
+        grid = np.linspace(-self._scale, self._scale, nGrid)
+        uGrid, vGrid = [coord.flatten() for coord in np.meshgrid(grid, grid)]
+        raGrid, decGrid = _inverseGnomonicProjection(uGrid, vGrid, self._raPointing, self._decPointing)
+        xGrid, yGrid = _pupilCoordsFromRaDec(raGrid, decGrid, obs_metadata=obs_metadata, epoch=epoch)
+
+        self._xCoeffs = self._fit(uGrid, vGrid, xGrid)
+        self._yCoeffs = self._fit(uGrid, vGrid, yGrid)
+        self._uCoeffs = self._fit(xGrid, yGrid, uGrid)
+        self._vCoeffs = self._fit(xGrid, yGrid, vGrid)
+
+        # compare with the exact transformation at random points within the field of view
+        # (with a fixed seed, so that the measured residuals are reproducible)
+        rng = np.random.RandomState(7321)
+        rr = self._scale*np.sqrt(rng.random_sample(nCheck))
+        theta = rng.random_sample(nCheck)*2.0*np.pi
+        raCheck, decCheck = _inverseGnomonicProjection(rr*np.cos(theta), rr*np.sin(theta),
+                                                       self._raPointing, self._decPointing)
+        xCheck, yCheck = _pupilCoordsFromRaDec(raCheck, decCheck, obs_metadata=obs_metadata, epoch=epoch)
+
+        xFit, yFit, _ = self._fitPupilCoords(raCheck, decCheck)
+        self._maxResidual = arcsecFromRadians(np.max(np.hypot(xFit-xCheck, yFit-yCheck)))
+
+        raFit, decFit = self._fitRaDec(xCheck, yCheck)
+        self._maxInverseResidual = arcsecFromRadians(np.max(haversine(raFit, decFit,
+                                                                      raCheck, decCheck)))
+
+        # NaN residuals (e.g. a field below the horizon) also disable the fit
+        self._useFit = bool(self._maxResidual <= tolerance and self._maxInverseResidual <= tolerance)
+
+    @property
+    def obs_metadata(self):
+        """
+        The ObservationMetaData characterized by this model
+        """
+        return self._obs_metadata
+
+    @property
+    def maxResidual(self):
+        """
+        The largest difference (in arcseconds) between the pupil coordinates
+        given by the model and by _pupilCoordsFromRaDec at the check points
+        """
+        return self._maxResidual
+
+    @property
+    def maxInverseResidual(self):
+        """
+        The largest angular distance (in arcseconds) between the RA, Dec
+        given by the model and by _raDecFromPupilCoords at the check points
+        """
+        return self._maxInverseResidual
+
+    @property
+    def useFit(self):
+        """
+        True if the model met its accuracy budget and is being used;
+        False if all transformations are being done exactly
+        """
+        return self._useFit
+
+    def _fit(self, u, v, values):
+        """
+        Fit values as a polynomial of u, v; return the 2-D array of coefficients
+        """
+        vander = polynomial.polyvander2d(u/self._scale, v/self._scale, [self._order, self._order])
+        coeffs = np.zeros(self._terms.shape)
+        coeffs[self._terms] = np.linalg.lstsq(vander[:, self._terms.flatten()], values, rcond=None)[0]
+        return coeffs
+
+    def _fitPupilCoords(self, ra, dec):
+        """
+        Evaluate the model of pupil coordinates at RA, Dec (in radians).
+        Also return the normalized distance of each point from the
+        pointing on the tangent plane (> 1 outside of the fitted field).
+        """
+        u, v = _gnomonicProjection(ra, dec, self._raPointing, self._decPointing)
+        u /= self._scale
+        v /= self._scale
+        return (polynomial.polyval2d(u, v, self._xCoeffs), polynomial.polyval2d(u, v, self._yCoeffs),
+                np.hypot(u, v))
+
+    def _fitRaDec(self, xPupil, yPupil):
+        """
+        Evaluate the model of RA, Dec (in radians) at pupil coordinates
+        """
+        x = xPupil/self._scale
+        y = yPupil/self._scale
+        return _inverseGnomonicProjection(polynomial.polyval2d(x, y, self._uCoeffs),
+                                          polynomial.polyval2d(x, y, self._vCoeffs),
+                                          self._raPointing, self._decPointing)
+
+    def pupilCoordsFromRaDec(self, ra_in, dec_in):
+        """
+        @param [in] ra_in is the ICRS RA in degrees (a number or a numpy array)
+
+        @param [in] dec_in is the ICRS Dec in degrees (a number or a numpy array)
+
+        @param [out] a numpy array whose first row is the x coordinate on the pupil in
+        radians and whose second row is the y coordinate in radians
+        (see _pupilCoordsFromRaDec)
+        """
+        return self._pupilCoordsFromRaDec(np.radians(ra_in), np.radians(dec_in))
+
+    def _pupilCoordsFromRaDec(self, ra_in, dec_in):
+        """
+        @param [in] ra_in is the ICRS RA in radians (a number or a numpy array)
+
+        @param [in] dec_in is the ICRS Dec in radians (a number or a numpy array)
+
+        @param [out] a numpy array whose first row is the x coordinate on the pupil in
+        radians and whose second row is the y coordinate in radians
+        (see _pupilCoordsFromRaDec)
+        """
+        are_arrays = _validate_inputs([ra_in, dec_in], ['ra_in', 'dec_in'],
+                                      "PupilCoordsModel.pupilCoordsFromRaDec")
+
+        if not self._useFit:
+            return _pupilCoordsFromRaDec(ra_in, dec_in, obs_metadata=self._obs_metadata,
+                                         epoch=self._epoch)
+
+        ra = np.atleast_1d(ra_in)
+        dec = np.atleast_1d(dec_in)
+        x, y, distance = self._fitPupilCoords(ra, dec)
+
+        outside = np.where(~(distance <= 1.0))[0]
+        if len(outside) > 0:
+            x[outside], y[outside] = _pupilCoordsFromRaDec(ra[outside], dec[outside],
+                                                           obs_metadata=self._obs_metadata,
+                                                           epoch=self._epoch)
+
+        if not are_arrays:
+            return np.array([x[0], y[0]])
+
+        return np.array([x, y])
+
+    def raDecFromPupilCoords(self, xPupil, yPupil):
+        """
+        @param [in] xPupil is the x pupil coordinate in radians (a number or a numpy array)
+
+        @param [in] yPupil is the y pupil coordinate in radians (a number or a numpy array)
+
+        @param [out] a numpy array whose first row is the ICRS RA and whose second
+        row is the ICRS Dec, both in degrees (see _raDecFromPupilCoords)
+        """
+        return np.degrees(self._raDecFromPupilCoords(xPupil, yPupil))
+
+    def _raDecFromPupilCoords(self, xPupil, yPupil):
+        """
+        @param [in] xPupil is the x pupil coordinate in radians (a number or a numpy array)
+
+        @param [in] yPupil is the y pupil coordinate in radians (a number or a numpy array)
+
+        @param [out] a numpy array whose first row is the ICRS RA and whose second
+        row is the ICRS Dec, both in radians (see _raDecFromPupilCoords)
+        """
+        are_arrays = _validate_inputs([xPupil, yPupil], ['xPupil', 'yPupil'],
+                                      "PupilCoordsModel.raDecFromPupilCoords")
+
+        if not self._useFit:
+            return _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=self._obs_metadata,
+                                         epoch=self._epoch)
+
+        x = np.atleast_1d(xPupil)
+        y = np.atleast_1d(yPupil)
+        ra, dec = self._fitRaDec(x, y)
+
+        outside = np.where(~(np.hypot(x, y) <= self._scale))[0]
+        if len(outside) > 0:
+            ra[outside], dec[outside] = _raDecFromPupilCoords(x[outside], y[outside],
+                                                              obs_metadata=self._obs_metadata,
+                                                              epoch=self._epoch)
+
+        if not are_arrays:
+            return np.array([ra[0], dec[0]])
+
+        return np.array([ra, dec])
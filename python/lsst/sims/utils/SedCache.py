@@ -0,0 +1,208 @@
+"""
+A local cache of spectra (SEDs) stored as binary .npy files.
+
+The SED library stores each spectrum as a gzipped text file.  SedCache parses
+each file once and saves its wavelength and flux as a single (2, n_wavelengths)
+array in a .npy file, which later reads memory-map.  All of the processes on a
+node that use the same cache directory therefore share the pages of each
+spectrum rather than each holding a private parsed copy.
+"""
+from builtins import object
+import os
+import tempfile
+import numpy as np
+from lsst.sims.utils import defaultSpecMap
+
+__all__ = ["SedCache"]
+
+
+class SedCache(object):
+
+    def __init__(self, cacheDir, sedDir, specMap=None, maxBytes=None):
+        """
+        @param [in] cacheDir is the directory in which the .npy files are kept
+        (it is created if it does not exist).  Several processes may share it.
+
+        @param [in] sedDir is the root directory of the SED library; the paths
+        returned by specMap are relative to it
+
+        @param [in] specMap is the SpecMap used to find the source file of each
+        spectrum name (defaults to defaultSpecMap)
+
+        @param [in] maxBytes is the total size of the .npy files above which the
+        least recently used entries are evicted (None means no limit)
+        """
+        self.cacheDir = cacheDir
+        self.sedDir = sedDir
+        self.specMap = specMap if specMap is not None else defaultSpecMap
+        self.maxBytes = maxBytes
+
+        if not os.path.isdir(self.cacheDir):
+            try:
+                os.makedirs(self.cacheDir)
+            except OSError:
+                # another process may have created it in the meantime
+                if not os.path.isdir(self.cacheDir):
+                    raise
+
+    def sourcePath(self, name):
+        """
+        Return the path of the source file of the spectrum called 'name'
+        """
+        return os.path.join(self.sedDir, self.specMap[name])
+
+    def _entryPrefix(self, relativePath):
+        """
+        Return the path, without the version suffix, of the cache entry of the
+        source file at relativePath (relative to sedDir)
+        """
+        if relativePath.endswith('.gz'):
+            relativePath = relativePath[:-3]
+        return os.path.join(self.cacheDir, relativePath)
+
+    def entryPath(self, name):
+        """
+        Return the path of the cache entry of the spectrum called 'name' that
+        corresponds to the current version of its source file.
+
+        The size and modification time of the source file are part of the
+        file name, so an entry made from an older version of the source file
+        is never mistaken for a valid one.
+        """
+        relativePath = self.specMap[name]
+        stat = os.stat(os.path.join(self.sedDir, relativePath))
+        mtime = getattr(stat, 'st_mtime_ns', None)
+        if mtime is None:
+            mtime = int(stat.st_mtime*1.0e6)*1000
+        return '%s.%d_%d.npy' % (self._entryPrefix(relativePath), stat.st_size, mtime)
+
+    def load(self, name):
+        """
+        Return the wavelength and flux of the spectrum called 'name', adding
+        it to the cache if necessary.
+
+        @param [in] name is the name of the spectrum (e.g. the sedFilename of
+        a catalog object)
+
+        @param [out] wavelen is a read-only, memory-mapped array of the
+        wavelengths (in nm)
+
+        @param [out] flux is a read-only, memory-mapped array of the flux
+        densities (in ergs/cm^2/s/nm)
+        """
+        entry = self.entryPath(name)
+        try:
+            data = np.load(entry, mmap_mode='r')
+            # mark the entry as recently used
+            os.utime(entry, None)
+        except (IOError, OSError):
+            self._populate(name, entry)
+            data = np.load(entry, mmap_mode='r')
+
+        return data[0], data[1]
+
+    def _populate(self, name, entry):
+        """
+        Parse the source file of the spectrum called 'name' and save it as the
+        cache entry 'entry'.
+
+        The array is written to a temporary file in the same directory, which
+        is then renamed to 'entry'.  Renaming is atomic, so processes
+        populating the same entry at the same time do not interfere, and no
+        process ever reads a partially written entry.
+        """
+        data = np.loadtxt(self.sourcePath(name), usecols=(0, 1), ndmin=2)
+
+        entryDir = os.path.dirname(entry)
+        if not os.path.isdir(entryDir):
+            try:
+                os.makedirs(entryDir)
+            except OSError:
+                if not os.path.isdir(entryDir):
+                    raise
+
+        fileHandle, tempName = tempfile.mkstemp(dir=entryDir, suffix='.tmp')
+        try:
+            with os.fdopen(fileHandle, 'wb') as outputFile:
+                np.save(outputFile, np.ascontiguousarray(data.transpose()))
+            os.rename(tempName, entry)
+        finally:
+            # only left behind if writing or renaming failed
+            if os.path.exists(tempName):
+                os.remove(tempName)
+
+        self._removeStale(entry)
+
+        if self.maxBytes is not None:
+            self.evict(self.maxBytes, keep=entry)
+
+    def _removeStale(self, entry):
+        """
+        Delete the entries made from other versions of the source file of
+        the entry 'entry'
+        """
+        entryDir, entryName = os.path.split(entry)
+        prefix = entryName[:entryName.rindex('.', 0, -4) + 1]
+        for fileName in os.listdir(entryDir):
+            if fileName != entryName and fileName.startswith(prefix) and fileName.endswith('.npy'):
+                version = fileName[len(prefix):-4]
+                if version.replace('_', '').isdigit():
+                    self._remove(os.path.join(entryDir, fileName))
+
+    def _remove(self, path):
+        """
+        Delete a file that another process may already have deleted.
+        Processes that have the file memory-mapped keep their pages.
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def entries(self):
+        """
+        Return a list of (path, size in bytes, time of last use) tuples, one for
+        each entry in the cache
+        """
+        entryList = []
+        for dirName, subDirs, fileNames in os.walk(self.cacheDir):
+            for fileName in fileNames:
+                if fileName.endswith('.npy'):
+                    path = os.path.join(dirName, fileName)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entryList.append((path, stat.st_size, stat.st_mtime))
+        return entryList
+
+    def evict(self, maxBytes=None, keep=None):
+        """
+        Delete the least recently used entries until the total size of the
+        cache is no larger than maxBytes.
+
+        @param [in] maxBytes is the size limit in bytes (defaults to the
+        maxBytes of this SedCache; 0 empties the cache)
+
+        @param [in] keep is the path of an entry that is not to be deleted
+        (e.g. the one that was just added)
+
+        @param [out] the number of bytes that were freed
+        """
+        if maxBytes is None:
+            maxBytes = self.maxBytes
+        if maxBytes is None:
+            raise RuntimeError("SedCache.evict: no maxBytes was given")
+
+        entryList = self.entries()
+        totalBytes = sum(entry[1] for entry in entryList)
+        freedBytes = 0
+        for path, size, lastUsed in sorted(entryList, key=lambda entry: entry[2]):
+            if totalBytes - freedBytes <= maxBytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            freedBytes += size
+
+        return freedBytes
@@ -12,7 +12,49 @@ from builtins import object
 import numpy as np
 from future.utils import with_metaclass
 
-__all__ = ["SpatialBounds", "CircleBounds", "BoxBounds"]
+__all__ = ["SpatialBounds", "CircleBounds", "BoxBounds", "PolygonBounds"]
+
+
+# How each SQL dialect accepted by to_SQL spells the square of an expression.
+# None is the default, which all of the others also understand.
+_sqlSquare = {None: 'POWER(%s, 2)',
+              'sqlite': 'POWER(%s, 2)',
+              'mysql': 'POWER(%s, 2)',
+              'postgresql': 'POWER(%s, 2)',
+              'mssql': 'SQUARE(%s)'}
+
+
+def _validateDialect(dialect):
+    """
+    Raise a RuntimeError if dialect is not one of the SQL dialects
+    that to_SQL knows about
+    """
+    if dialect not in _sqlSquare:
+        raise RuntimeError("to_SQL does not know the SQL dialect %s; try one of %s"
+                           % (dialect, str(sorted(d for d in _sqlSquare if d is not None))))
+
+
+def _raRangesSQL(RAname, RAmin, RAmax):
+    """
+    Return an SQL condition selecting RAmin <= RA <= RAmax (in degrees),
+    where the range may straddle RA = 0 (i.e. RAmin < 0, RAmax > 360 or
+    RAmin > RAmax).  Ranges that straddle RA = 0 are split into two
+    'between' clauses joined by 'or', so that an index on RA can be used
+    for either one.  Returns None if every RA is selected.
+    """
+    if RAmax - RAmin >= 360.0:
+        return None
+
+    if RAmin < 0.0:
+        RAmin += 360.0
+    elif RAmax > 360.0:
+        RAmax -= 360.0
+
+    if RAmin > RAmax:
+        return ("(%s between %f and 360.0 or %s between 0.0 and %f)"
+                % (RAname, RAmin, RAname, RAmax))
+
+    return "%s between %f and %f" % (RAname, RAmin, RAmax)
 
 
 class SpatialBoundsMetaClass(type):
@@ -76,15 +118,154 @@ class SpatialBounds(with_metaclass(SpatialBoundsMetaClass, object)):
         Uses the stored RA, Dec, and length for this object to return an SQL
         query that only selects the region of RA and Dec desired
 
+        The query starts with ranges in Dec and RA ('between' clauses, with
+        ranges straddling RA = 0 split into two clauses joined by 'or') so that
+        the database can use indexes on the RA and Dec columns.  Any exact
+        test of the shape of the bound follows as a residual filter.
+
         @param[in] RAname a string; the name of the RA column in the database
 
         @param[in] DECname a string; the name of the Dec column in the database
 
+        @param[in] dialect is an optional string naming the SQL dialect of the
+        database ('sqlite', 'mysql', 'postgresql' or 'mssql')
+
         @returns a string; an SQL query that only selects the desired region in RA, Dec
         """
 
         raise NotImplementedError()
 
+    def contains(self, ra, dec):
+        """
+        Accepts RA and Dec of points in degrees (the units of the database
+        columns passed to to_SQL) and returns a boolean mask that is True for
+        the points that the query returned by to_SQL would select.
+
+        @param[in] ra is a numpy array of RA in degrees
+
+        @param[in] dec is a numpy array of Dec in degrees
+
+        @returns a numpy array of booleans
+        """
+
+        return self._contains(np.radians(ra), np.radians(dec))
+
+    def _contains(self, ra, dec):
+        """
+        Accepts RA and Dec of points in radians and returns a boolean mask
+        that is True for the points that the query returned by to_SQL
+        would select.
+
+        @param[in] ra is a numpy array of RA in radians
+
+        @param[in] dec is a numpy array of Dec in radians
+
+        @returns a numpy array of booleans
+        """
+
+        raise NotImplementedError()
+
+    def _healpixPixels(self, nside):
+        """
+        Return the nested HEALPix pixels at nside that (at least partially)
+        overlap the bounds.  The set of pixels may include some pixels that
+        are just outside of the bounds, but must not miss any that overlap.
+
+        @param[in] nside is the HEALPix nside (a power of 2)
+
+        @returns a numpy array of nested pixel ids
+        """
+
+        raise NotImplementedError()
+
+    def healpixRanges(self, nside, coarseNside=None):
+        """
+        Return the nested HEALPix pixels at nside that cover the bounds as
+        ranges of contiguous pixel ids.
+
+        @param[in] nside is the HEALPix nside (a power of 2) of the pixel ids
+
+        @param[in] coarseNside is an optional (power of 2) nside <= nside.
+        If given, the bounds are covered with pixels at coarseNside, each of
+        which is a contiguous range of nested pixel ids at nside.  This gives
+        fewer (but looser) ranges.
+
+        @returns a numpy array of shape (n, 2); each row is the first and last
+        pixel id (inclusive) of a range.  The ranges are sorted and disjoint.
+        """
+
+        if coarseNside is None:
+            coarseNside = nside
+
+        for name, value in (('nside', nside), ('coarseNside', coarseNside)):
+            if value < 1 or (int(value) & (int(value) - 1)) != 0:
+                raise RuntimeError("In healpixRanges, %s must be a power of 2; you gave %s"
+                                   % (name, str(value)))
+
+        if coarseNside > nside:
+            raise RuntimeError("In healpixRanges, coarseNside (%d) cannot be larger than nside (%d)"
+                               % (coarseNside, nside))
+
+        pixels = np.unique(self._healpixPixels(int(coarseNside))).astype(np.int64)
+        if len(pixels) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+
+        # the first and last pixel of each run of consecutive pixel ids
+        breaks = np.where(np.diff(pixels) != 1)[0]
+        first = pixels[np.concatenate(([0], breaks + 1))]
+        last = pixels[np.concatenate((breaks, [len(pixels) - 1]))]
+
+        # each coarse pixel contains factor consecutive nested pixels at nside
+        factor = (int(nside)//int(coarseNside))**2
+        return np.array([first*factor, (last + 1)*factor - 1]).transpose()
+
+    def to_healpixSQL(self, hpidName, nside, coarseNside=None):
+        """
+        Accepts the name of a column containing nested HEALPix pixel ids at
+        nside and returns an SQL 'WHERE' condition selecting the pixels that
+        cover the bounds (see healpixRanges).  The condition only uses ranges
+        of integers, so the database can satisfy it with range scans of an
+        index on the column.
+
+        @param[in] hpidName is a string; the name of the pixel id column in the database
+
+        @param[in] nside is the HEALPix nside of the pixel ids
+
+        @param[in] coarseNside is an optional nside <= nside (see healpixRanges)
+
+        @returns a string
+        """
+
+        ranges = self.healpixRanges(nside, coarseNside=coarseNside)
+        if len(ranges) == 0:
+            return "%s between 1 and 0" % hpidName
+
+        return "(" + " or ".join("%s between %d and %d" % (hpidName, first, last)
+                                 for first, last in ranges) + ")"
+
+    def healpixMask(self, hpids, nside, coarseNside=None):
+        """
+        Accepts nested HEALPix pixel ids at nside and returns a boolean mask
+        that is True for the ids that the query returned by to_healpixSQL
+        would select.
+
+        @param[in] hpids is a numpy array of nested pixel ids at nside
+
+        @param[in] nside is the HEALPix nside of the pixel ids
+
+        @param[in] coarseNside is an optional nside <= nside (see healpixRanges)
+
+        @returns a numpy array of booleans
+        """
+
+        hpids = np.atleast_1d(hpids)
+        ranges = self.healpixRanges(nside, coarseNside=coarseNside)
+        if len(ranges) == 0:
+            return np.zeros(len(hpids), dtype=bool)
+
+        dex = np.searchsorted(ranges[:, 0], hpids, side='right') - 1
+        return (dex >= 0) & (hpids <= ranges[np.maximum(dex, 0), 1])
+
     def __eq__(self, other):
         for param in self.__dict__:
             if param not in other.__dict__:
@@ -161,50 +342,107 @@ class CircleBounds(SpatialBounds):
                (self.DECdeg == other.DECdeg) and \
                (self.radiusdeg == other.radiusdeg)
 
-    def to_SQL(self, RAname, DECname):
+    def _boundingBox(self):
+        """
+        Return the limits (RAmin, RAmax, DECmin, DECmax) in degrees of the
+        box in RA, Dec used to preselect points before the exact test of
+        angular distance.  RAmin may be negative and RAmax may exceed 360.
+        """
 
+        # A circle of angular radius r centered at Dec spans RA +/- arcsin(sin(r)/cos(Dec)),
+        # unless it contains a pole, in which case it spans all RA.
         cosDec = np.cos(self.DEC)
 
-        if np.abs(cosDec) > 1.0e-20:
-            RAmax = self.RAdeg + \
-                360.0 * np.arcsin(np.sin(0.5 * self.radius) /
-                                  cosDec) / np.pi
-            RAmin = self.RAdeg - \
-                360.0 * np.arcsin(np.sin(0.5 * self.radius) /
-                                  cosDec) / np.pi
+        if self.radius < 0.5*np.pi and np.sin(self.radius) < np.abs(cosDec):
+            raHalfWidth = np.degrees(np.arcsin(np.sin(self.radius)/np.abs(cosDec)))
+            RAmax = self.RAdeg + raHalfWidth
+            RAmin = self.RAdeg - raHalfWidth
         else:
-            # just in case, for some reason, we are looking at the poles
-            RAmax = 360.0
-            RAmin = 0.0
-
-        if np.isnan(RAmax) or np.isnan(RAmin):
             RAmax = 360.0
             RAmin = 0.0
 
         DECmax = self.DECdeg + self.radiusdeg
         DECmin = self.DECdeg - self.radiusdeg
 
+        return RAmin, RAmax, DECmin, DECmax
+
+    def to_SQL(self, RAname, DECname, dialect=None):
+
+        _validateDialect(dialect)
+        square = _sqlSquare[dialect]
+
+        RAmin, RAmax, DECmin, DECmax = self._boundingBox()
+
         # initially demand that all objects are within a box containing the circle
-        # set from the DEC1=DEC2 and RA1=RA2 limits of the haversine function
-        bound = ("%s between %f and %f and %s between %f and %f "
-                 % (RAname, RAmin, RAmax, DECname, DECmin, DECmax))
+        bound = "%s between %f and %f " % (DECname, DECmin, DECmax)
+        raRanges = _raRangesSQL(RAname, RAmin, RAmax)
+        if raRanges is not None:
+            bound = bound + "and %s " % raRanges
 
         # then use the Haversine function to constrain the angular distance form boresite to be within
         # the desired radius.  See
         # http://en.wikipedia.org/wiki/Haversine_formula
         bound = bound + \
-            ("and 2 * ASIN(SQRT( POWER(SIN(0.5*(%s - %s) * PI() / 180.0),2)" %
-             (DECname, self.DECdeg))
+            ("and 2 * ASIN(SQRT( %s" %
+             (square % ("SIN(0.5*(%s - %s) * PI() / 180.0)" % (DECname, self.DECdeg))))
         bound = bound + \
             ("+ COS(%s * PI() / 180.0) * COS(%s * PI() / 180.0) " %
              (DECname, self.DECdeg))
         bound = bound + \
-            ("* POWER(SIN(0.5 * (%s - %s) * PI() / 180.0),2)))" %
-             (RAname, self.RAdeg))
+            ("* %s))" %
+             (square % ("SIN(0.5 * (%s - %s) * PI() / 180.0)" % (RAname, self.RAdeg))))
         bound = bound + (" < %s " % self.radius)
 
         return bound
 
+    def _healpixPixels(self, nside):
+        """
+        Return the nested HEALPix pixels at nside that overlap the circle
+        """
+
+        import healpy as hp
+
+        center = hp.ang2vec(0.5*np.pi - self.DEC, self.RA)
+        return hp.query_disc(nside, center, self.radius, inclusive=True, nest=True)
+
+    def _contains(self, ra, dec):
+        """
+        Accepts RA and Dec of points in radians and returns a boolean mask
+        that is True for the points within the circle.
+
+        The points are preselected with the same box in RA, Dec as the query
+        returned by to_SQL; only the points in the box are subjected to the
+        exact test of angular distance.
+
+        @param[in] ra is a numpy array of RA in radians
+
+        @param[in] dec is a numpy array of Dec in radians
+
+        @returns a numpy array of booleans
+        """
+
+        ra = np.atleast_1d(ra)
+        dec = np.atleast_1d(dec)
+        RAmin, RAmax, DECmin, DECmax = np.radians(self._boundingBox())
+
+        candidate = (dec >= DECmin) & (dec <= DECmax)
+
+        if RAmax - RAmin < 2.0*np.pi:
+            # the offset in RA from the center of the box, in [-pi, pi)
+            dRA = (ra - self.RA + np.pi) % (2.0*np.pi) - np.pi
+            candidate &= (dRA >= RAmin - self.RA) & (dRA <= RAmax - self.RA)
+
+        # the Haversine function, as in to_SQL
+        dex = np.where(candidate)[0]
+        sinHalfDDec = np.sin(0.5*(dec[dex] - self.DEC))
+        sinHalfDRA = np.sin(0.5*(ra[dex] - self.RA))
+        distance = 2.0*np.arcsin(np.sqrt(sinHalfDDec*sinHalfDDec +
+                                         np.cos(dec[dex])*np.cos(self.DEC)*sinHalfDRA*sinHalfDRA))
+
+        inside = np.zeros(len(ra), dtype=bool)
+        inside[dex] = distance < self.radius
+        return inside
+
 
 class BoxBounds(SpatialBounds):
 
@@ -280,24 +518,285 @@ class BoxBounds(SpatialBounds):
                (self.DECminDeg == other.DECminDeg) and \
                (self.DECmaxDeg == other.DECmaxDeg)
 
-    def to_SQL(self, RAname, DECname):
+    def to_SQL(self, RAname, DECname, dialect=None):
         # KSK:  I don't know exactly what we do here.  This is in code, but operating
         # on a database is it less confusing to work in degrees or radians?
         # (RAmin, RAmax, DECmin, DECmax) = map(math.radians,
         #                                     (RAmin, RAmax, DECmin, DECmax))
 
+        _validateDialect(dialect)
+
+        bound = "%s between %f and %f" % (DECname, self.DECminDeg, self.DECmaxDeg)
+
         # Special case where the whole region is selected
         if self.RAminDeg < 0 and self.RAmaxDeg > 360.:
-            bound = "%s between %f and %f" % (
-                DECname, self.DECminDeg, self.DECmaxDeg)
             return bound
 
+        return bound + " and " + _raRangesSQL(RAname, self.RAminDeg, self.RAmaxDeg)
+
+    def _healpixPixels(self, nside):
+        """
+        Return the nested HEALPix pixels at nside that overlap the box.
+
+        The pixels overlapping the range in Dec are found with query_strip.
+        Each pixel lies within a disc of radius max_pixrad around its center;
+        pixels whose disc does not reach the range in RA are discarded.
+        """
+
+        import healpy as hp
+
+        thetaMin = 0.5*np.pi - np.radians(min(self.DECmaxDeg, 90.0))
+        thetaMax = 0.5*np.pi - np.radians(max(self.DECminDeg, -90.0))
+        pixels = hp.query_strip(nside, thetaMin, thetaMax, inclusive=True, nest=True)
+
+        if (self.RAminDeg < 0 and self.RAmaxDeg > 360.) or len(pixels) == 0:
+            return pixels
+
+        raHalfWidth = 0.5*np.radians((self.RAmaxDeg - self.RAminDeg) % 360.0)
+        raCenter = np.radians(self.RAminDeg) + raHalfWidth
+
+        theta, phi = hp.pix2ang(nside, pixels, nest=True)
+        pixRadius = hp.max_pixrad(nside)
+
+        # the half width in RA of the disc around each pixel
+        # (the whole circle if the disc contains a pole)
+        sinRatio = np.sin(pixRadius)/np.maximum(np.sin(theta), 1.0e-20)
+        discHalfWidth = np.where(sinRatio < 1.0, np.arcsin(np.minimum(sinRatio, 1.0)), np.pi)
+
+        dRA = np.abs((phi - raCenter + np.pi) % (2.0*np.pi) - np.pi)
+        return pixels[dRA <= raHalfWidth + discHalfWidth]
+
+    def _contains(self, ra, dec):
+        """
+        Accepts RA and Dec of points in radians and returns a boolean mask
+        that is True for the points within the box (as selected by the query
+        returned by to_SQL).
+
+        @param[in] ra is a numpy array of RA in radians
+
+        @param[in] dec is a numpy array of Dec in radians
+
+        @returns a numpy array of booleans
+        """
+
+        raDeg = np.degrees(np.atleast_1d(ra)) % 360.0
+        decDeg = np.degrees(np.atleast_1d(dec))
+
+        inside = (decDeg >= self.DECminDeg) & (decDeg <= self.DECmaxDeg)
+
+        if self.RAminDeg < 0 and self.RAmaxDeg > 360.:
+            return inside
+
         if self.RAminDeg > self.RAmaxDeg:
-            bound = ("%s not between %f and %f and %s between %f and %f"
-                     % (RAname, self.RAmaxDeg, self.RAminDeg,
-                        DECname, self.DECminDeg, self.DECmaxDeg))
+            inside &= (raDeg <= self.RAmaxDeg) | (raDeg >= self.RAminDeg)
         else:
-            bound = ("%s between %f and %f and %s between %f and %f"
-                     % (RAname, self.RAminDeg, self.RAmaxDeg, DECname, self.DECminDeg, self.DECmaxDeg))
+            inside &= (raDeg >= self.RAminDeg) & (raDeg <= self.RAmaxDeg)
 
-        return bound
+        return inside
+
+
+class PolygonBounds(SpatialBounds):
+    """
+    A field of view that is a spherical polygon, i.e. a region of the sky
+    bounded by great circle arcs joining a list of vertices (for instance,
+    the outline of a camera, rotated by rotSkyPos).  The polygon need not be
+    convex, but it must be simple (its edges may not cross) and it must lie
+    within 90 degrees of its center.
+
+    Containment is tested on the plane tangent to the sky at the center of
+    the polygon: the gnomonic projection maps great circles onto straight
+    lines, so the spherical polygon becomes a planar polygon with the same
+    interior.
+
+    SQL cannot express the polygon itself, so to_SQL returns the query for
+    the circle (the 'bounding cap') centered on the center of the polygon
+    that just encloses its vertices.  The rows returned by that query
+    should be filtered with contains().
+    """
+
+    boundType = 'polygon'
+
+    def __init__(self, ra, dec, vertices):
+        """
+        Accepts a center point and either the vertices of the polygon or a
+        characteristic length
+
+        @param[in] ra is the center RA in radians
+
+        @param[in] dec is the center Dec in radians
+
+        @param[in] vertices is either a numpy array of shape (n, 2) of the
+        RA, Dec in radians of the n >= 3 vertices of the polygon, in order
+        around its edge, or a characteristic length (in radians) or list of
+        two lengths.  If lengths, the polygon will be a rectangle on the
+        plane tangent to the sky at (ra, dec), with sides 2 x length[0]
+        along the direction of RA and 2 x length[1] along the direction of Dec.
+        """
+
+        try:
+            ra = float(ra)
+        except (TypeError, ValueError):
+            raise RuntimeError('In PolygonBounds, ra must be a float; you have %s' % type(ra))
+
+        try:
+            dec = float(dec)
+        except (TypeError, ValueError):
+            raise RuntimeError('In PolygonBounds, dec must be a float; you have %s' % type(dec))
+
+        self.RA = ra
+        self.DEC = dec
+        self.RAdeg = np.degrees(ra)
+        self.DECdeg = np.degrees(dec)
+
+        try:
+            vertices = np.array(vertices, dtype=float)
+        except (TypeError, ValueError):
+            raise RuntimeError("PolygonBounds is unsure how to handle vertices %s type: %s" % (
+                str(vertices), type(vertices)))
+
+        if vertices.ndim == 2:
+            if vertices.shape[1] != 2 or vertices.shape[0] < 3:
+                raise RuntimeError("PolygonBounds needs an array of shape (n, 2) with n >= 3 "
+                                   "vertices; you gave shape %s" % str(vertices.shape))
+            self.vertexRA = vertices[:, 0] % (2.0*np.pi)
+            self.vertexDEC = vertices[:, 1]
+        elif vertices.ndim <= 1 and vertices.size in (1, 2):
+            xLength, yLength = np.ones(2)*vertices.flatten()
+            xVertex = np.array([xLength, -xLength, -xLength, xLength])
+            yVertex = np.array([yLength, yLength, -yLength, -yLength])
+            self.vertexRA, self.vertexDEC = self._fromTangentPlane(np.tan(xVertex), np.tan(yVertex))
+        else:
+            raise RuntimeError("PolygonBounds is unsure how to handle vertices %s" % str(vertices))
+
+        if np.isnan(self.vertexRA).any() or np.isnan(self.vertexDEC).any():
+            raise RuntimeError("PolygonBounds cannot have NaN vertices")
+
+        self._xVertex, self._yVertex = self._toTangentPlane(self.vertexRA, self.vertexDEC)
+        if np.isnan(self._xVertex).any():
+            raise RuntimeError("All of the vertices of a PolygonBounds must be within "
+                               "90 degrees of its center")
+
+        # The angular distance from the center is largest at a vertex (the
+        # cosine of the distance is concave along each edge where it is positive)
+        self.radius = float(np.max(self._angularDistance(self.vertexRA, self.vertexDEC)))
+        self.radiusdeg = np.degrees(self.radius)
+        self._cap = CircleBounds(self.RA, self.DEC, self.radius)
+
+    @classmethod
+    def fromPupilCoords(cls, xPupil, yPupil, obs_metadata):
+        """
+        Build the polygon whose vertices are at the given pupil coordinates
+        (e.g. the corners of a camera), as seen by a telescope characterized
+        by an ObservationMetaData (pointing, rotSkyPos, mjd and site).
+        The vertices are transformed into ICRS RA, Dec with _raDecFromPupilCoords.
+
+        @param[in] xPupil is a numpy array of the x pupil coordinates of the vertices in radians
+
+        @param[in] yPupil is a numpy array of the y pupil coordinates of the vertices in radians
+
+        @param[in] obs_metadata is an ObservationMetaData
+
+        @returns a PolygonBounds centered on the pointing of obs_metadata
+        """
+
+        # imported here so that importing SpatialBounds does not import palpy
+        from lsst.sims.utils import _raDecFromPupilCoords
+
+        ra, dec = _raDecFromPupilCoords(np.array(xPupil, dtype=float), np.array(yPupil, dtype=float),
+                                        obs_metadata=obs_metadata)
+
+        return cls(obs_metadata._pointingRA, obs_metadata._pointingDec, np.array([ra, dec]).transpose())
+
+    def _toTangentPlane(self, ra, dec):
+        """
+        Project RA, Dec (in radians) onto the plane tangent to the sky at the
+        center of the polygon.  Points more than 90 degrees from the center
+        are returned as NaN.
+        """
+        sinDec = np.sin(dec)
+        cosDec = np.cos(dec)
+        sinDecCenter = np.sin(self.DEC)
+        cosDecCenter = np.cos(self.DEC)
+        dRA = ra - self.RA
+        cosDRA = np.cos(dRA)
+        denom = sinDec*sinDecCenter + cosDec*cosDecCenter*cosDRA
+        denom = np.where(denom > 0.0, denom, np.NaN)
+        return (cosDec*np.sin(dRA)/denom,
+                (sinDec*cosDecCenter - cosDec*sinDecCenter*cosDRA)/denom)
+
+    def _fromTangentPlane(self, x, y):
+        """
+        The inverse of _toTangentPlane
+        """
+        sinDecCenter = np.sin(self.DEC)
+        cosDecCenter = np.cos(self.DEC)
+        denom = cosDecCenter - y*sinDecCenter
+        ra = (self.RA + np.arctan2(x, denom)) % (2.0*np.pi)
+        dec = np.arctan2(sinDecCenter + y*cosDecCenter, np.sqrt(x*x + denom*denom))
+        return ra, dec
+
+    def _angularDistance(self, ra, dec):
+        """
+        The angular distance (in radians) of RA, Dec (in radians) from the center
+        """
+        sinHalfDDec = np.sin(0.5*(dec - self.DEC))
+        sinHalfDRA = np.sin(0.5*(ra - self.RA))
+        return 2.0*np.arcsin(np.sqrt(np.minimum(sinHalfDDec*sinHalfDDec +
+                                                np.cos(dec)*np.cos(self.DEC)*sinHalfDRA*sinHalfDRA, 1.0)))
+
+    def __eq__(self, other):
+        return (type(self) == type(other)) and \
+               (self.RA == other.RA) and \
+               (self.DEC == other.DEC) and \
+               (len(self.vertexRA) == len(other.vertexRA)) and \
+               (self.vertexRA == other.vertexRA).all() and \
+               (self.vertexDEC == other.vertexDEC).all()
+
+    def to_SQL(self, RAname, DECname, dialect=None):
+        return self._cap.to_SQL(RAname, DECname, dialect=dialect)
+
+    def _healpixPixels(self, nside):
+        """
+        Return the nested HEALPix pixels at nside that overlap the bounding cap
+        """
+        return self._cap._healpixPixels(nside)
+
+    def _contains(self, ra, dec):
+        """
+        Accepts RA and Dec of points in radians and returns a boolean mask
+        that is True for the points within the polygon.
+
+        Points outside of the bounding cap (as selected by to_SQL) are
+        rejected first; the rest are projected onto the tangent plane and
+        tested by counting how many edges of the polygon a ray from each
+        point in the +x direction crosses.
+
+        @param[in] ra is a numpy array of RA in radians
+
+        @param[in] dec is a numpy array of Dec in radians
+
+        @returns a numpy array of booleans
+        """
+
+        ra = np.atleast_1d(ra)
+        dec = np.atleast_1d(dec)
+        inside = self._cap._contains(ra, dec)
+
+        dex = np.where(inside)[0]
+        x, y = self._toTangentPlane(ra[dex], dec[dex])
+
+        crossings = np.zeros(len(dex), dtype=bool)
+        x1 = self._xVertex
+        y1 = self._yVertex
+        x2 = np.roll(x1, -1)
+        y2 = np.roll(y1, -1)
+        for i_edge in range(len(x1)):
+            straddles = (y1[i_edge] > y) != (y2[i_edge] > y)
+            if not straddles.any():
+                continue
+            with np.errstate(divide='ignore', invalid='ignore'):
+                xCross = x1[i_edge] + (y - y1[i_edge])*(x2[i_edge] - x1[i_edge])/(y2[i_edge] - y1[i_edge])
+            crossings ^= straddles & (x < xCross)
+
+        inside[dex] = crossings
+        return inside
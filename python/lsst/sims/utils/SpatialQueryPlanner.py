@@ -0,0 +1,279 @@
+from builtins import object
+import numpy as np
+import healpy as hp
+from lsst.sims.utils import SpatialBounds, CircleBounds
+from lsst.sims.utils import ObservationMetaData, ObservationMetaDataBatch
+
+__all__ = ["SpatialQueryPlanner", "SpatialQueryRegion"]
+
+
+class SpatialQueryRegion(object):
+    """
+    One database query planned by SpatialQueryPlanner: a set of nested
+    HEALPix pixels that covers the bounds of one or more visits.
+    """
+
+    def __init__(self, visits, pixels, nside):
+        """
+        @param [in] visits is a numpy array of the indices (in the list of bounds
+        passed to SpatialQueryPlanner) of the visits covered by this region
+
+        @param [in] pixels is a sorted numpy array of the nested HEALPix pixels
+        at nside covered by this region
+
+        @param [in] nside is the HEALPix nside of pixels
+        """
+        self._visits = visits
+        self._pixels = pixels
+        self._nside = nside
+
+        breaks = np.where(np.diff(pixels) != 1)[0]
+        self._ranges = np.array([pixels[np.concatenate(([0], breaks + 1))],
+                                 pixels[np.concatenate((breaks, [len(pixels) - 1]))]]).transpose()
+
+        # the circle enclosing every pixel of the region
+        theta, phi = hp.pix2ang(nside, pixels, nest=True)
+        center = np.sum(hp.ang2vec(theta, phi), axis=0)
+        centerTheta, centerPhi = hp.vec2ang(center/np.sqrt(np.sum(center*center)))
+        sinHalfDTheta = np.sin(0.5*(theta - centerTheta[0]))
+        sinHalfDPhi = np.sin(0.5*(phi - centerPhi[0]))
+        distance = 2.0*np.arcsin(np.sqrt(np.minimum(sinHalfDTheta*sinHalfDTheta +
+                                                    np.sin(theta)*np.sin(centerTheta[0]) *
+                                                    sinHalfDPhi*sinHalfDPhi, 1.0)))
+        radius = min(np.max(distance) + hp.max_pixrad(nside), np.pi)
+        self._cap = CircleBounds(centerPhi[0], 0.5*np.pi - centerTheta[0], radius)
+
+    @property
+    def visits(self):
+        """
+        numpy array of the indices of the visits covered by this region
+        """
+        return self._visits
+
+    @property
+    def pixels(self):
+        """
+        numpy array of the nested HEALPix pixels covered by this region
+        """
+        return self._pixels
+
+    @property
+    def nside(self):
+        """
+        The HEALPix nside of pixels
+        """
+        return self._nside
+
+    @property
+    def ranges(self):
+        """
+        numpy array of shape (n, 2) of the first and last (inclusive)
+        pixel ids of the runs of contiguous pixels in this region
+        """
+        return self._ranges
+
+    @property
+    def bounds(self):
+        """
+        A CircleBounds enclosing this region
+        """
+        return self._cap
+
+    def to_healpixSQL(self, hpidName):
+        """
+        Return an SQL 'WHERE' condition selecting the rows of this region
+        from a table with a column of nested HEALPix pixel ids at nside.
+
+        @param [in] hpidName is the name of the pixel id column
+
+        @param [out] a string
+        """
+        return "(" + " or ".join("%s between %d and %d" % (hpidName, first, last)
+                                 for first, last in self._ranges) + ")"
+
+    def to_SQL(self, RAname, DECname, dialect=None):
+        """
+        Return an SQL 'WHERE' condition selecting the rows of this region
+        (and of the rest of the circle enclosing it) from a table with
+        columns of RA and Dec in degrees.
+
+        @param [in] RAname is the name of the RA column
+
+        @param [in] DECname is the name of the Dec column
+
+        @param [in] dialect is the optional SQL dialect (see SpatialBounds.to_SQL)
+
+        @param [out] a string
+        """
+        return self._cap.to_SQL(RAname, DECname, dialect=dialect)
+
+
+class SpatialQueryPlanner(object):
+    """
+    This class plans the database queries for many visits at once.  Rather
+    than querying the database once per visit (i.e. once per SpatialBounds),
+    it covers the bounds of every visit with nested HEALPix pixels and
+    merges visits whose covers overlap into regions.  Each region is
+    queried once, and visitRows() hands back the rows that each visit of
+    the region selects, so that rows seen by many visits (e.g. in a deep
+    drilling field) are only transferred once.
+
+    If the table has a column of nested HEALPix pixel ids, query each
+    region with region.to_healpixSQL(); otherwise query it with
+    region.to_SQL(), which selects the circle enclosing the region.
+
+    Usage:
+
+        planner = SpatialQueryPlanner(obs_metadata_list, nside=64)
+        for region in planner.regions:
+            rows = execute('SELECT ... WHERE %s' % region.to_healpixSQL('hpid'))
+            for visit, dex in planner.visitRows(region, rows['ra'], rows['dec']):
+                # rows[dex] are the rows within the bounds of visit
+    """
+
+    def __init__(self, boundsList, nside=64, tileNside=None):
+        """
+        @param [in] boundsList is a list of SpatialBounds, a list of
+        ObservationMetaData (with bounds) or an ObservationMetaDataBatch
+        (with boundType and boundLength)
+
+        @param [in] nside is the HEALPix nside (a power of 2) of the pixels
+        covering the bounds; if the table is queried by pixel id, this must
+        be the nside of its pixel id column
+
+        @param [in] tileNside is an optional (power of 2) nside <= nside.
+        If given, regions are split along the boundaries of HEALPix pixels
+        at tileNside so that no one query covers too much of the sky
+        (e.g. when many overlapping visits tile a survey).
+        """
+
+        if isinstance(boundsList, ObservationMetaDataBatch) or \
+           (len(boundsList) > 0 and isinstance(boundsList[0], ObservationMetaData)):
+            boundsList = [obs.bounds for obs in boundsList]
+
+        for bounds in boundsList:
+            if not isinstance(bounds, SpatialBounds):
+                raise RuntimeError("SpatialQueryPlanner needs SpatialBounds for every visit; "
+                                   "you gave %s" % str(bounds))
+
+        if tileNside is not None and tileNside > nside:
+            raise RuntimeError("In SpatialQueryPlanner, tileNside (%d) cannot be larger than nside (%d)"
+                               % (tileNside, nside))
+
+        self._boundsList = list(boundsList)
+        self._nside = nside
+        self._tileNside = tileNside
+
+        # the (pixel, visit) pairs of the cover of every visit
+        pixelList = []
+        visitList = []
+        for i_visit, bounds in enumerate(self._boundsList):
+            ranges = bounds.healpixRanges(nside)
+            pixels = np.concatenate([np.arange(first, last + 1) for first, last in ranges]
+                                    + [np.zeros(0, dtype=np.int64)])
+            pixelList.append(pixels)
+            visitList.append(np.ones(len(pixels), dtype=np.int64)*i_visit)
+
+        if len(pixelList) == 0:
+            self._regions = []
+            return
+
+        pixels = np.concatenate(pixelList).astype(np.int64)
+        visits = np.concatenate(visitList)
+
+        # split visits along tile boundaries by treating each (visit, tile)
+        # as a separate node of the graph
+        if tileNside is not None:
+            tiles = pixels//((nside//tileNside)**2)
+            nodeIndex = np.unique(np.array([visits, tiles]).transpose(), axis=0,
+                                  return_inverse=True)[1].flatten()
+        else:
+            nodeIndex = visits
+
+        labels = self._connectedComponents(nodeIndex, pixels)
+
+        # a region for each component
+        order = np.argsort(labels[nodeIndex], kind='stable')
+        sortedLabels = labels[nodeIndex][order]
+        starts = np.concatenate(([0], np.where(np.diff(sortedLabels) != 0)[0] + 1, [len(order)]))
+
+        self._regions = []
+        for i_start, i_end in zip(starts[:-1], starts[1:]):
+            dex = order[i_start:i_end]
+            self._regions.append(SpatialQueryRegion(np.unique(visits[dex]), np.unique(pixels[dex]), nside))
+
+    @staticmethod
+    def _connectedComponents(nodeIndex, pixels):
+        """
+        Label the nodes (visits, or visits split into tiles) so that nodes
+        sharing a pixel (directly or through other nodes) have the same label.
+
+        @param [in] nodeIndex is a numpy array of the node of each (node, pixel) pair
+
+        @param [in] pixels is a numpy array of the pixel of each (node, pixel) pair
+
+        @param [out] a numpy array of the label of each node
+        """
+        uniquePixels, pixelIndex = np.unique(pixels, return_inverse=True)
+        pixelIndex = pixelIndex.flatten()
+        labels = np.arange(np.max(nodeIndex) + 1)
+
+        # propagate the smallest label through the shared pixels until nothing changes
+        while True:
+            pixelLabels = np.full(len(uniquePixels), len(labels))
+            np.minimum.at(pixelLabels, pixelIndex, labels[nodeIndex])
+            newLabels = labels.copy()
+            np.minimum.at(newLabels, nodeIndex, pixelLabels[pixelIndex])
+            # follow chains of labels
+            newLabels = newLabels[newLabels]
+            if (newLabels == labels).all():
+                return labels
+            labels = newLabels
+
+    @property
+    def regions(self):
+        """
+        The list of SpatialQueryRegions to query
+        """
+        return self._regions
+
+    @property
+    def boundsList(self):
+        """
+        The list of SpatialBounds of the visits
+        """
+        return self._boundsList
+
+    def visitRows(self, region, ra, dec):
+        """
+        Assign the rows returned by the query of a region to the visits of
+        the region.
+
+        @param [in] region is one of the SpatialQueryRegions in regions
+
+        @param [in] ra is a numpy array of the RA (in degrees) of the rows returned
+        by the query of region
+
+        @param [in] dec is a numpy array of the Dec (in degrees) of the rows returned
+        by the query of region
+
+        @param [out] a list of (visit, rowIndices) tuples; rowIndices is a numpy
+        array of the indices of the rows that are within the bounds of the
+        visit (i.e. that the visit's own to_SQL would select).  A row may
+        belong to many visits.  If the region was split into tiles, a visit
+        may appear in the results of more than one region; each row of the
+        visit is then assigned in the one region whose pixels contain it
+        (region.to_SQL returns overlapping circles, so the same row can be
+        returned by the queries of several regions).
+        """
+        raRad = np.radians(ra)
+        decRad = np.radians(dec)
+
+        if self._tileNside is None:
+            candidates = np.ones(len(raRad), dtype=bool)
+        else:
+            rowPixels = hp.ang2pix(self._nside, 0.5*np.pi - decRad, raRad, nest=True)
+            candidates = np.isin(rowPixels, region.pixels)
+
+        return [(visit, np.where(candidates & self._boundsList[visit]._contains(raRad, decRad))[0])
+                for visit in region.visits]
@@ -0,0 +1,226 @@
+from builtins import object
+import os
+import numpy as np
+
+from astropy.time import Time
+
+__all__ = ["TimeScaleTables"]
+
+
+class TimeScaleTables(object):
+    """
+    This class converts between the time scales supported by ModifiedJulianDate
+    (TAI, UTC, TT, TDB, UT1) using precomputed lookup tables rather than
+    astropy.time.Time.  It is much faster than astropy when converting many
+    individual dates and never needs network access.
+
+    The tables are:
+
+    - a table of TAI-UTC as a function of UTC (the leap seconds), derived from
+      astropy.time.Time.  Dates before 1972 January 1 (when TAI-UTC was not an
+      integer number of seconds) are not covered; see covers().
+
+    - a table of UT1-TAI as a function of UTC, derived from the IERS B table
+      bundled with astropy.  UT1-TAI is linearly interpolated (it is continuous
+      across leap seconds, whereas UT1-UTC is not).  Outside of that table,
+      UT1 = UTC, as in ModifiedJulianDate.
+
+    TDB-TT is calculated from the largest terms of the Fairhead & Bretagnon
+    (1990) series, which agrees with astropy (i.e. erfa.dtdb at the geocenter)
+    to a few microseconds.
+
+    The tables can be saved to and loaded from a compact .npz file so that
+    they only need to be calculated once.
+    """
+
+    # MJD (UTC) of 1972 January 1, the start of integer leap seconds
+    _leap_second_start = 41317.0
+
+    # amplitude (seconds), frequency (radians per Julian millennium)
+    # and phase (radians) of the largest terms in the Fairhead & Bretagnon
+    # series for TDB-TT
+    _tdb_terms = np.array([[1656.674564e-6, 6283.075849991, 6.240054195],
+                           [22.417471e-6, 5753.384884897, 4.296977442],
+                           [13.839792e-6, 12566.151699983, 6.196904410],
+                           [4.770086e-6, 529.690965095, 0.444401603],
+                           [4.676740e-6, 6069.776754553, 4.021195093],
+                           [2.256707e-6, 213.299095438, 5.543113262],
+                           [1.694205e-6, -3.523118349, 5.025132748],
+                           [1.554905e-6, 77713.771467920, 5.198467090]])
+
+    # terms of the same series that are multiplied by T (in Julian millennia)
+    _tdb_t_terms = np.array([[102.156724e-6, 6283.075849991, 4.249032005],
+                             [1.706807e-6, 12566.151699983, 4.205904248]])
+
+    def __init__(self, filename=None, max_mjd=80000.0):
+        """
+        @param [in] filename is the name of a .npz file in which the tables
+        are stored.  If it exists, the tables are read from it.  If it does
+        not, the tables are calculated and written to it.  If None (default),
+        the tables are calculated and kept in memory.
+
+        @param [in] max_mjd is the last UTC date (as an MJD) for which
+        leap seconds are looked up when calculating the tables (default 80000).
+        Leap seconds after the last one known to astropy are not predicted.
+        """
+
+        if filename is not None and os.path.exists(filename):
+            with np.load(filename) as data:
+                self._leap_utc = data['leap_utc']
+                self._leap_tai_utc = data['leap_tai_utc']
+                self._ut1_utc = data['ut1_utc']
+                self._ut1_tai = data['ut1_tai']
+        else:
+            self._calculate_tables(max_mjd)
+            if filename is not None:
+                self.write(filename)
+
+        # the dates at which TAI-UTC changes, expressed in TAI
+        self._leap_tai = self._leap_utc + self._leap_tai_utc/86400.0
+
+    def _calculate_tables(self, max_mjd):
+        """
+        Calculate the leap second and UT1 tables from astropy
+        """
+        from astropy.utils.iers import IERS_B
+
+        # leap seconds only ever take effect at 0h UTC, so sampling
+        # TAI-UTC once per day catches every one of them
+        utc_grid = np.arange(self._leap_second_start, max_mjd+1.0, 1.0)
+        tai_utc = np.round((Time(utc_grid, scale='utc', format='mjd').tai.mjd - utc_grid)*86400.0)
+        changes = np.append([0], np.where(np.diff(tai_utc) != 0.0)[0]+1)
+        self._leap_utc = utc_grid[changes]
+        self._leap_tai_utc = tai_utc[changes]
+
+        iers_table = IERS_B.open()
+        ut1_utc_grid = np.array(iers_table['MJD'], dtype=float)
+        dut1_grid = np.array(iers_table['UT1_UTC'], dtype=float)
+        valid = np.where(ut1_utc_grid >= self._leap_second_start)
+        self._ut1_utc = ut1_utc_grid[valid]
+        self._ut1_tai = dut1_grid[valid] - self._tai_minus_utc(self._ut1_utc)
+
+    def write(self, filename):
+        """
+        Write the tables to the .npz file specified by filename
+        """
+        np.savez(filename, leap_utc=self._leap_utc, leap_tai_utc=self._leap_tai_utc,
+                 ut1_utc=self._ut1_utc, ut1_tai=self._ut1_tai)
+
+    def covers(self, TAI=None, UTC=None):
+        """
+        Return True if all of the dates specified (either as TAI or UTC MJDs;
+        numbers or numpy arrays) are within the range of these tables;
+        False otherwise.
+        """
+        if TAI is not None:
+            return bool(np.all(np.asarray(TAI) >= self._leap_tai[0]))
+        return bool(np.all(np.asarray(UTC) >= self._leap_utc[0]))
+
+    def _tai_minus_utc(self, utc):
+        """
+        Return TAI-UTC in seconds for a numpy array of UTC MJDs
+        (evaluated at 0h UTC on the date in question)
+        """
+        dex = np.searchsorted(self._leap_utc, utc, side='right') - 1
+        return self._leap_tai_utc[np.clip(dex, 0, None)]
+
+    def _next_leap(self, dex):
+        """
+        Return the date (UTC MJD) of, and the change in TAI-UTC (seconds)
+        at, the leap second following the dex-th entry of the leap second
+        table.  Where there is no following leap second, the date is
+        infinite and the change is zero.
+        """
+        next_utc = np.append(self._leap_utc[1:], np.inf)
+        next_change = np.append(np.diff(self._leap_tai_utc), 0.0)
+        return next_utc[dex], next_change[dex]
+
+    def _utc_from_tai(self, tai):
+        """
+        Return UTC MJDs for a numpy array of TAI MJDs.
+
+        As in astropy (and ERFA), a UTC day containing a leap second is 86401
+        seconds long, and its MJD fraction is the elapsed time divided by that
+        length.
+        """
+        dex = np.clip(np.searchsorted(self._leap_tai, tai, side='right') - 1, 0, None)
+        tai_utc = self._leap_tai_utc[dex]
+        utc = tai - tai_utc/86400.0
+        next_utc, next_change = self._next_leap(dex)
+        day_start = next_utc - 1.0
+        leap_day = utc >= day_start
+        if np.any(leap_day):
+            elapsed = (tai[leap_day] - day_start[leap_day] - tai_utc[leap_day]/86400.0)*86400.0
+            utc[leap_day] = day_start[leap_day] + elapsed/(86400.0 + next_change[leap_day])
+        return utc
+
+    def _tai_from_utc(self, utc):
+        """
+        Return TAI MJDs for a numpy array of UTC MJDs (see _utc_from_tai)
+        """
+        dex = np.clip(np.searchsorted(self._leap_utc, utc, side='right') - 1, 0, None)
+        tai_utc = self._leap_tai_utc[dex]
+        tai = utc + tai_utc/86400.0
+        next_utc, next_change = self._next_leap(dex)
+        day_start = next_utc - 1.0
+        leap_day = utc >= day_start
+        if np.any(leap_day):
+            elapsed = (utc[leap_day] - day_start[leap_day])*(86400.0 + next_change[leap_day])
+            tai[leap_day] = day_start[leap_day] + (tai_utc[leap_day] + elapsed)/86400.0
+        return tai
+
+    def _tdb_minus_tt(self, tt):
+        """
+        Return TDB-TT in seconds for a numpy array of TT MJDs
+        """
+        # Julian millennia since J2000 (TDB may be used in place
+        # of TT in the argument without loss of accuracy)
+        t = (tt - 51544.5)/365250.0
+        t_col = t[:, None]
+        dt = np.sum(self._tdb_terms[:, 0] *
+                    np.sin(self._tdb_terms[:, 1]*t_col + self._tdb_terms[:, 2]), axis=1)
+        dt += t*np.sum(self._tdb_t_terms[:, 0] *
+                       np.sin(self._tdb_t_terms[:, 1]*t_col + self._tdb_t_terms[:, 2]), axis=1)
+        return dt
+
+    def convert(self, TAI=None, UTC=None):
+        """
+        Convert dates into all of the time scales supported by ModifiedJulianDate.
+
+        Must specify either:
+
+        @param [in] TAI = a numpy array of International Atomic Times as MJDs
+
+        or
+
+        @param [in] UTC = a numpy array of Universal Coordinate Times as MJDs
+
+        @param [out] a 2-D numpy array whose rows are TAI, UTC, TT, TDB, UT1
+        (as MJDs) and UT1-UTC (in seconds)
+
+        @param [out] a numpy array of booleans indicating which dates were
+        within the UT1 table (dates outside of it have UT1 = UTC)
+        """
+
+        if TAI is None and UTC is None:
+            raise RuntimeError("You must specify either TAI or UTC in TimeScaleTables.convert()")
+
+        if TAI is not None and UTC is not None:
+            raise RuntimeError("You should not specify both TAI and UTC in TimeScaleTables.convert()")
+
+        if TAI is not None:
+            tai = np.atleast_1d(np.asarray(TAI, dtype=float))
+            utc = self._utc_from_tai(tai)
+        else:
+            utc = np.atleast_1d(np.asarray(UTC, dtype=float))
+            tai = self._tai_from_utc(utc)
+
+        tt = tai + 32.184/86400.0
+        tdb = tt + self._tdb_minus_tt(tt)/86400.0
+
+        in_range = np.logical_and(utc >= self._ut1_utc[0], utc <= self._ut1_utc[-1])
+        ut1_tai = np.interp(utc, self._ut1_utc, self._ut1_tai)
+        dut1 = np.where(in_range, ut1_tai + self._tai_minus_utc(utc), 0.0)
+        ut1 = np.where(in_range, tai + ut1_tai/86400.0, utc)
+
+        return np.array([tai, utc, tt, tdb, ut1, dut1]), in_range
@@ -1,15 +1,76 @@
 from __future__ import division
-from builtins import zip
 import numpy as np
-import numbers
 from lsst.sims.utils import _observedFromICRS, _icrsFromObserved
+from lsst.sims.utils.AstrometryUtils import _resolveObsMetaData
 
 __all__ = ["_nativeLonLatFromPointing", "_lonLatFromNativeLonLat",
            "_nativeLonLatFromRaDec", "_raDecFromNativeLonLat",
            "nativeLonLatFromRaDec", "raDecFromNativeLonLat"]
 
 
-def _nativeLonLatFromPointing(lon, lat, lonPointing, latPointing):
+def _lonFromRotatedVector(v2, lat, fixRoundOff, lonOut=None):
+    """
+    Recover the longitude, in the range [0, 2pi), of Cartesian vector(s) v2
+    whose latitude is lat.  Points whose longitude is undefined are assigned
+    a longitude of zero.
+
+    @param [in] v2 is a numpy array whose rows are the x, y, z components
+    of the vector(s)
+
+    @param [in] lat is the latitude of the vector(s) in radians
+
+    @param [in] fixRoundOff is a boolean.  If True, points for which
+    y/cos(lat) falls just outside of [-1, 1] because of floating point error
+    are assigned a longitude of 0 or pi (rather than being treated as undefined)
+
+    @param [in] lonOut is an optional numpy array in which to store the result
+
+    @param [out] the longitude of the vector(s) in radians
+    """
+    with np.errstate(invalid='ignore'):
+        _y = v2[1] / np.cos(lat)
+        _lon = np.arccos(_y)
+
+    if fixRoundOff:
+        # control for _y=1.0, -1.0 but actually being stored as just outside
+        # the bounds of -1.0<=_y<=1.0 because of floating point error
+        _lon = np.where(np.isnan(_lon), 0.5 * np.pi * (1.0 - np.sign(_y)), _lon)
+
+    _x = -np.sin(_lon)
+
+    # arccos only covers [0, pi]; use the signs of the components
+    # of v2 to decide which points are in the other half of the circle
+    flip = np.logical_or(np.logical_and(np.abs(_x) > 1.0e-9, np.sign(_x) != np.sign(v2[0])),
+                         np.logical_and(np.abs(_y) > 1.0e-9, np.sign(_y) != np.sign(v2[1])))
+
+    if lonOut is None:
+        lonOut = np.empty(np.shape(_lon))
+    np.copyto(lonOut, _lon)
+    np.subtract(2.0 * np.pi, _lon, out=lonOut, where=flip)
+    lonOut[np.isnan(lonOut)] = 0.0
+    return lonOut
+
+
+def _lonLatFromRotatedVector(v2, fixRoundOff, out):
+    """
+    Return the longitude (see _lonFromRotatedVector) and latitude of
+    Cartesian vector(s) v2, either as numpy arrays or, if v2 is a
+    single vector, as numbers.  out is an optional tuple of two numpy
+    arrays in which to store them.
+    """
+    lonOut, latOut = (None, None) if out is None else out
+
+    cc = np.sqrt(v2[0] * v2[0] + v2[1] * v2[1])
+    latOut = np.arctan2(v2[2], cc, out=latOut)
+    lonOut = _lonFromRotatedVector(v2, latOut, fixRoundOff, lonOut=lonOut)
+
+    if v2.ndim == 1:
+        return lonOut[()], latOut
+
+    return lonOut, latOut
+
+
+def _nativeLonLatFromPointing(lon, lat, lonPointing, latPointing, out=None):
     """
     Convert the longitude and latitude of a point into `native'
     longitude and latitude defined by a telescope pointing.
@@ -35,6 +96,9 @@ def _nativeLonLatFromPointing(lon, lat, lonPointing, latPointing):
 
     @param [in] a latitude-like coordinate of the telescope pointing in radians
 
+    @param [in] out is an optional tuple of two numpy arrays (the same shape as
+    the input coordinates) in which to store the native longitude and latitude
+
     @param [out] the native longitude of the transformed point(s) in radians
 
     @param [out] the native latitude of the transformed point(s) in radians
@@ -55,52 +119,10 @@ def _nativeLonLatFromPointing(lon, lat, lonPointing, latPointing):
     v2 = np.dot(np.array([[1.0, 0.0, 0.0], [0.0, ca, sa], [0.0, -1.0 * sa, ca]]),
                 np.dot(np.array([[cb, sb, 0.0], [-sb, cb, 0.0], [0.0, 0.0, 1.0]]), np.array([x, y, z])))
 
-    cc = np.sqrt(v2[0] * v2[0] + v2[1] * v2[1])
-    latOut = np.arctan2(v2[2], cc)
-
-    _y = v2[1] / np.cos(latOut)
-    _ra_raw = np.arccos(_y)
-
-    # control for _y=1.0, -1.0 but actually being stored as just outside
-    # the bounds of -1.0<=_y<=1.0 because of floating point error
-    if hasattr(_ra_raw, '__len__'):
-        _ra = np.array([rr
-                        if not np.isnan(rr)
-                        else 0.5 * np.pi * (1.0 - np.sign(yy))
-                        for rr, yy in zip(_ra_raw, _y)])
-    else:
-        if np.isnan(_ra_raw):
-            if np.sign(_y) < 0.0:
-                _ra = np.pi
-            else:
-                _ra = 0.0
-        else:
-            _ra = _ra_raw
-
-    _x = -np.sin(_ra)
-
-    if isinstance(_ra, numbers.Number):
-        if np.isnan(_ra):
-            lonOut = 0.0
-        elif (np.abs(_x) > 1.0e-9 and np.sign(_x) != np.sign(v2[0])) or \
-             (np.abs(_y) > 1.0e-9 and np.sign(_y) != np.sign(v2[1])):
-
-            lonOut = 2.0 * np.pi - _ra
-        else:
-            lonOut = _ra
-    else:
-        _lonOut = [2.0 * np.pi - rr
-                   if (np.abs(xx) > 1.0e-9 and np.sign(xx) != np.sign(v2_0)) or
-                   (np.abs(yy) > 1.0e-9 and np.sign(yy) != np.sign(v2_1))
-                   else rr
-                   for rr, xx, yy, v2_0, v2_1 in zip(_ra, _x, _y, v2[0], v2[1])]
-
-        lonOut = np.array([0.0 if np.isnan(ll) else ll for ll in _lonOut])
-
-    return lonOut, latOut
+    return _lonLatFromRotatedVector(v2, True, out)
 
 
-def _lonLatFromNativeLonLat(nativeLon, nativeLat, lonPointing, latPointing):
+def _lonLatFromNativeLonLat(nativeLon, nativeLat, lonPointing, latPointing, out=None):
     """
     Transform a position in native longitude and latitude into
     longitude and latitude in a coordinate system where the telescope pointing
@@ -117,6 +139,9 @@ def _lonLatFromNativeLonLat(nativeLon, nativeLat, lonPointing, latPointing):
     @param [in] latPointing is the latitude-like coordinate of the telescope
     pointing in radians
 
+    @param [in] out is an optional tuple of two numpy arrays (the same shape as
+    the input coordinates) in which to store the longitude and latitude
+
     @param [out] latOut is the latitude of the transformed point(s)
     in the same coordinate system as the telescope pointing in radians
 
@@ -138,35 +163,10 @@ def _lonLatFromNativeLonLat(nativeLon, nativeLat, lonPointing, latPointing):
     v2 = np.dot(np.array([[cb, -1.0 * sb, 0.0], [sb, cb, 0.0], [0.0, 0.0, 1.0]]),
                 np.dot(np.array([[1.0, 0.0, 0.0], [0.0, ca, sa], [0.0, -1.0 * sa, ca]]), np.array([x, y, z])))
 
-    cc = np.sqrt(v2[0] * v2[0] + v2[1] * v2[1])
-    latOut = np.arctan2(v2[2], cc)
-
-    _y = v2[1] / np.cos(latOut)
-    _lonOut = np.arccos(_y)
-    _x = -np.sin(_lonOut)
-
-    if isinstance(_lonOut, numbers.Number):
-        if np.isnan(_lonOut):
-            lonOut = 0.0
-        elif (np.abs(_x) > 1.0e-9 and np.sign(_x) != np.sign(v2[0])) or \
-             (np.abs(_y) > 1.0e-9 and np.sign(_y) != np.sign(v2[1])):
-
-            lonOut = 2.0 * np.pi - _lonOut
-        else:
-            lonOut = _lonOut
-    else:
-        _lonOut = [2.0 * np.pi - rr
-                   if (np.abs(xx) > 1.0e-9 and np.sign(xx) != np.sign(v2_0)) or
-                   (np.abs(yy) > 1.0e-9 and np.sign(yy) != np.sign(v2_1))
-                   else rr
-                   for rr, xx, yy, v2_0, v2_1 in zip(_lonOut, _x, _y, v2[0], v2[1])]
-
-        lonOut = np.array([0.0 if np.isnan(rr) else rr for rr in _lonOut])
-
-    return lonOut, latOut
+    return _lonLatFromRotatedVector(v2, False, out)
 
 
-def _nativeLonLatFromRaDec(ra_in, dec_in, obs_metadata):
+def _nativeLonLatFromRaDec(ra_in, dec_in, obs_metadata, context=None):
     """
     Convert the RA and Dec of a star into `native' longitude and latitude.
 
@@ -193,26 +193,29 @@ def _nativeLonLatFromRaDec(ra_in, dec_in, obs_metadata):
     (in the International Celestial Reference System)
 
     @param [in] obs_metadata is an ObservationMetaData characterizing the pointing of
-    the telescope.
+    the telescope.  Can be None if context is specified.
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
 
     @param [out] lonOut is the native longitude in radians
 
     @param [out] latOut is the native latitude in radians
     """
 
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "nativeLonLatFromRaDec")
+
     ra, dec = _observedFromICRS(ra_in, dec_in,
                                 obs_metadata=obs_metadata, epoch=2000.0,
-                                includeRefraction=True)
+                                includeRefraction=True, context=context)
 
-    raPointing, decPointing = _observedFromICRS(obs_metadata._pointingRA,
-                                                obs_metadata._pointingDec,
-                                                obs_metadata=obs_metadata, epoch=2000.0,
-                                                includeRefraction=True)
+    raPointing, decPointing = obs_metadata._observedPointing(epoch=2000.0, includeRefraction=True,
+                                                             context=context)
 
     return _nativeLonLatFromPointing(ra, dec, raPointing, decPointing)
 
 
-def nativeLonLatFromRaDec(ra, dec, obs_metadata):
+def nativeLonLatFromRaDec(ra, dec, obs_metadata, context=None):
     """
     Convert the RA and Dec of a star into `native' longitude and latitude.
 
@@ -241,7 +244,10 @@ def nativeLonLatFromRaDec(ra, dec, obs_metadata):
     (in the International Celestial Reference System)
 
     @param [in] obs_metadata is an ObservationMetaData characterizing the pointing of
-    the telescope.
+    the telescope.  Can be None if context is specified.
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
 
     @param [out] lonOut is the native longitude in degrees
 
@@ -249,12 +255,12 @@ def nativeLonLatFromRaDec(ra, dec, obs_metadata):
     """
 
     lon, lat = _nativeLonLatFromRaDec(np.radians(ra), np.radians(dec),
-                                      obs_metadata)
+                                      obs_metadata, context=context)
 
     return np.degrees(lon), np.degrees(lat)
 
 
-def _raDecFromNativeLonLat(lon, lat, obs_metadata):
+def _raDecFromNativeLonLat(lon, lat, obs_metadata, context=None):
     """
     Transform a star's position in native longitude and latitude into
     RA and Dec.  See the doc string for _nativeLonLatFromRaDec for definitions
@@ -265,7 +271,10 @@ def _raDecFromNativeLonLat(lon, lat, obs_metadata):
     @param [in] lat is the native latitude in radians
 
     @param [in] obs_metadata is an ObservationMetaData characterizing the pointing
-    of the telescope
+    of the telescope (can be None if context is specified)
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
 
     @param [out] raOut is the RA of the star in radians
     (in the International Celestial Reference System)
@@ -278,10 +287,10 @@ def _raDecFromNativeLonLat(lon, lat, obs_metadata):
     than 45 degrees and zenith distances of less than 75 degrees.
     """
 
-    raPointing, decPointing = _observedFromICRS(obs_metadata._pointingRA,
-                                                obs_metadata._pointingDec,
-                                                obs_metadata=obs_metadata, epoch=2000.0,
-                                                includeRefraction=True)
+    obs_metadata = _resolveObsMetaData(obs_metadata, context, "raDecFromNativeLonLat")
+
+    raPointing, decPointing = obs_metadata._observedPointing(epoch=2000.0, includeRefraction=True,
+                                                             context=context)
 
     raObs, decObs = _lonLatFromNativeLonLat(lon, lat, raPointing, decPointing)
 
@@ -289,12 +298,13 @@ def _raDecFromNativeLonLat(lon, lat, obs_metadata):
     # coordinates
 
     raOut, decOut = _icrsFromObserved(raObs, decObs, obs_metadata=obs_metadata,
-                                      epoch=2000.0, includeRefraction=True)
+                                      epoch=2000.0, includeRefraction=True,
+                                      context=context)
 
     return raOut, decOut
 
 
-def raDecFromNativeLonLat(lon, lat, obs_metadata):
+def raDecFromNativeLonLat(lon, lat, obs_metadata, context=None):
     """
     Transform a star's position in native longitude and latitude into
     RA and Dec.  See the doc string for nativeLonLatFromRaDec for definitions
@@ -305,7 +315,10 @@ def raDecFromNativeLonLat(lon, lat, obs_metadata):
     @param [in] lat is the native latitude in degrees
 
     @param [in] obs_metadata is an ObservationMetaData characterizing the
-    pointing of the telescope
+    pointing of the telescope (can be None if context is specified)
+
+    @param [in] context is an optional AstrometryContext caching the
+    star-independent parameters for obs_metadata
 
     @param [out] raOut is the RA of the star in degrees
     (in the International Celestial Reference System)
@@ -320,6 +333,6 @@ def raDecFromNativeLonLat(lon, lat, obs_metadata):
 
     ra, dec = _raDecFromNativeLonLat(np.radians(lon),
                                      np.radians(lat),
-                                     obs_metadata)
+                                     obs_metadata, context=context)
 
     return np.degrees(ra), np.degrees(dec)
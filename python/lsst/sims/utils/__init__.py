@@ -1,14 +1,93 @@
-from .ModifiedJulianDate import *
-from .SpatialBounds import *
-from .Site import *
-from .ObservationMetaData import *
-from .CoordinateTransformations import *
-from .AstrometryUtils import *
-from .CompoundCoordinateTransformations import *
-from .FocalPlaneUtils import *
-from .WcsUtils import *
-from .fileMaps import *
-from .samplingFunctions import *
-from .healpyUtils import *
-from .stellarMags import *
-from .m5_flat_sed import *
+"""
+The public names of lsst.sims.utils are loaded lazily: a submodule is only
+imported the first time one of the names it exports is requested, so that,
+e.g., a process that only needs m5_flat_sed does not pay to import astropy,
+healpy and palpy.
+
+_submodules lists the submodules whose names make up the package namespace.
+The names each one exports are read from the '__all__ = [...]' statement in
+its source, without importing it, so that statement must be a literal list
+of strings (testLazyImport.py checks that it agrees with the __all__ of the
+imported submodule).  To add a submodule to the package, add it to
+_submodules.
+"""
+import os
+import re
+import ast
+import sys
+import types
+import importlib
+from collections import OrderedDict
+
+_submodules = ['ModifiedJulianDate', 'TimeScaleTables', 'SpatialBounds', 'Site',
+               'ObservationMetaData', 'ObservationMetaDataBatch', 'SpatialQueryPlanner',
+               'CoordinateTransformations', 'AstrometryUtils',
+               'CompoundCoordinateTransformations', 'FocalPlaneUtils', 'PupilCoordsModel',
+               'WcsUtils', 'fileMaps', 'SedCache', 'samplingFunctions', 'healpyUtils',
+               'stellarMags', 'm5_flat_sed']
+
+_all_statement = re.compile(r'^__all__\s*=\s*(\[[^\]]*\])', re.MULTILINE)
+
+
+def _read_all(module_name):
+    """
+    Return the list of names in the __all__ of the submodule module_name,
+    read from its source file
+    """
+    file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), module_name + '.py')
+    with open(file_name) as input_file:
+        match = _all_statement.search(input_file.read())
+    if match is None:
+        raise RuntimeError("%s does not define __all__ as a list of names" % file_name)
+    return ast.literal_eval(match.group(1))
+
+
+_lazy_names = OrderedDict((module_name, _read_all(module_name)) for module_name in _submodules)
+
+_module_from_name = dict((name, module_name)
+                         for module_name in _lazy_names
+                         for name in _lazy_names[module_name])
+
+__all__ = [name for module_name in _lazy_names for name in _lazy_names[module_name]]
+
+
+class _LazyPackage(types.ModuleType):
+    """
+    The class of the lsst.sims.utils module object.  It imports submodules
+    on demand when one of their names is requested.
+    """
+
+    def __getattr__(self, name):
+        # only called if name is not already in the module's namespace
+        if name not in _module_from_name:
+            raise AttributeError("module '%s' has no attribute '%s'" % (self.__name__, name))
+
+        importlib.import_module('.' + _module_from_name[name], self.__name__)
+        return self.__dict__[name]
+
+    def __setattr__(self, name, value):
+        # The import system binds each submodule to the package once it
+        # has been imported.  Bind the names it exports instead, as
+        # 'from .submodule import *' would, so that a submodule never
+        # shadows a function or class of the same name (e.g. m5_flat_sed).
+        if isinstance(value, types.ModuleType) and value.__name__ == self.__name__ + '.' + name:
+            exported = getattr(value, '__all__', ())
+            for exported_name in exported:
+                self.__dict__[exported_name] = getattr(value, exported_name)
+            if name in exported:
+                return
+
+        types.ModuleType.__setattr__(self, name, value)
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(__all__))
+
+
+# Replace this module in sys.modules with a _LazyPackage that has the same
+# namespace (assigning to the __class__ of a module does not work on Python
+# 2).  The copied namespace includes _module, a reference to the original
+# module, whose namespace the methods of _LazyPackage use as their globals.
+_module = sys.modules[__name__]
+_package = _LazyPackage(__name__, __doc__)
+_package.__dict__.update(_module.__dict__)
+sys.modules[__name__] = _package
@@ -1,6 +1,9 @@
 from builtins import object
+from collections import OrderedDict
 import os
 import re
+import numpy as np
+from future.utils import string_types
 
 __all__ = ["SpecMap", "defaultSpecMap"]
 
@@ -13,7 +16,7 @@ class SpecMap(object):
                   '(^lte)': 'starSED/mlt',
                   '^(Exp|Inst|Burst|Const)': 'galaxySED'}
 
-    def __init__(self, fileDict=None, dirDict=None):
+    def __init__(self, fileDict=None, dirDict=None, memoSize=10000):
         """
         @param [in] fileDict is a dict mapping the names of files to their
         relative paths, one-to-one, e.g.
@@ -33,7 +36,11 @@ class SpecMap(object):
         directory starSED/wDs
 
         These dicts will take precedence over the subdir_map that is defined
-        as a class member variable of the SpecMap class.
+        as a class member variable of the SpecMap class.  (Replace dirDict,
+        rather than modifying it in place; see the dirDict property.)
+
+        @param [in] memoSize is the number of names whose regular expression
+        look-ups are remembered (least recently used names are forgotten first)
         """
         if fileDict:
             self.fileDict = fileDict
@@ -45,6 +52,63 @@ class SpecMap(object):
         else:
             self.dirDict = {}
 
+        self.memoSize = memoSize
+        self._memo = OrderedDict()
+
+    @property
+    def dirDict(self):
+        """
+        The dict of regular expressions mapping names to sub directories.
+
+        The compiled patterns and the memo of look-ups are rebuilt when
+        dirDict is assigned, but not when it is modified in place, so assign
+        a new dict (e.g. specMap.dirDict = dict(specMap.dirDict, **newEntries))
+        to change it.
+        """
+        return self._dirDict
+
+    @dirDict.setter
+    def dirDict(self, value):
+        self._dirDict = value
+        self._patterns = None
+        self._memo = OrderedDict()
+
+    def _compilePatterns(self):
+        """
+        Compile the patterns of dirDict and subdir_map (in the order in which
+        they are tried) into a list of (compiled pattern, sub directory) tuples
+        """
+        self._patterns = [(re.compile(key), val) for key, val in
+                          sorted(self.dirDict.items()) + sorted(self.subdir_map.items())]
+
+    def _matchPatterns(self, item):
+        """
+        Return the path of the (stripped) name 'item' according to the
+        dirDict and subdir_map patterns, or None if no pattern matches it.
+        Results are memoized.
+        """
+        if item in self._memo:
+            path = self._memo.pop(item)
+            self._memo[item] = path
+            return path
+
+        if self._patterns is None:
+            self._compilePatterns()
+
+        path = None
+        for pattern, val in self._patterns:
+            if pattern.match(item):
+                full_name = item if item.endswith('.gz') else item + '.gz'
+                path = os.path.join(val, full_name)
+                break
+
+        if self.memoSize > 0:
+            if len(self._memo) >= self.memoSize:
+                self._memo.popitem(last=False)
+            self._memo[item] = path
+
+        return path
+
     def __setitem__(self, key, val):
         self.fileDict[key] = val
 
@@ -55,17 +119,11 @@ class SpecMap(object):
         if item in self.fileDict:
             return self.fileDict[item]
 
-        for key, val in sorted(self.dirDict.items()):
-            if re.match(key, item):
-                full_name = item if item.endswith('.gz') else item + '.gz'
-                return os.path.join(val, full_name)
+        path = self._matchPatterns(item)
+        if path is None:
+            raise KeyError("No path found for spectrum name: %s" % (item))
 
-        for key, val in sorted(self.subdir_map.items()):
-            if re.match(key, item):
-                full_name = item if item.endswith('.gz') else item + '.gz'
-                return os.path.join(val, full_name)
-
-        raise KeyError("No path found for spectrum name: %s" % (item))
+        return path
 
     def __contains__(self, item):
         """
@@ -75,11 +133,39 @@ class SpecMap(object):
         can identify columns which have no sedFilePath and then remove
         them when writing the catalog.
         """
-        try:
-            self.__getitem__(item)
-            return True
-        except:
+        # str and unicode on Python 2; only str (not bytes) on Python 3
+        if not isinstance(item, string_types):
             return False
+        item = item.strip()
+        return item in self.fileDict or self._matchPatterns(item) is not None
+
+    def resolve_many(self, names):
+        """
+        Find the paths of many spectrum names at once.
+
+        Each distinct name is only resolved once, so this is much faster than
+        calling __getitem__ on every name of a catalog in which the same
+        spectra are used by many objects.
+
+        @param [in] names is an array (or list) of spectrum names
+
+        @param [out] a numpy array of the paths corresponding to names
+
+        Raises a KeyError if any of the names cannot be mapped to a path.
+        """
+        names = np.asarray(names)
+        if names.dtype.kind == 'S':
+            names = names.astype(str)
+
+        if names.size == 0:
+            return np.array([], dtype=str).reshape(names.shape)
+
+        # Number the distinct names with a dict; np.unique would have to sort
+        # the strings, which is several times slower for large catalogs.
+        indices = {}
+        inverse = np.array([indices.setdefault(name, len(indices)) for name in names.ravel().tolist()])
+        paths = np.array([self[name] for name in sorted(indices, key=indices.get)])
+        return paths[inverse].reshape(names.shape)
 
 defaultSpecMap = SpecMap(
     fileDict={'A.dat': 'ssmSED/A.dat.gz',
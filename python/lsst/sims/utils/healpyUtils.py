@@ -1,8 +1,111 @@
 from __future__ import division
+from builtins import object
 import numpy as np
 import healpy as hp
 
-__all__ = ['hpid2RaDec', 'raDec2Hpid', 'healbin', '_hpid2RaDec', '_raDec2Hpid', '_healbin']
+__all__ = ['hpid2RaDec', 'raDec2Hpid', 'healbin', '_hpid2RaDec', '_raDec2Hpid', '_healbin',
+           'HealbinAccumulator', 'PartialMap']
+
+
+class PartialMap(object):
+    """
+    A healpix map that only stores the healpixels that have values, as
+    (pixel ID, value) pairs.  At high nside, a map of a small part of the sky
+    is much smaller stored this way than as a dense healpix map, in which
+    every healpixel of the sphere is allocated.
+
+    Parameters
+    ----------
+    nside : int
+        Healpixel nside resolution. Must be a value of 2^N.
+    pixels : np.array
+        IDs of the healpixels that have values.
+    values : np.array
+        The value in each of those healpixels.
+    """
+
+    def __init__(self, nside, pixels, values):
+        pixels = np.atleast_1d(np.asarray(pixels, dtype=np.int64))
+        values = np.atleast_1d(np.asarray(values))
+        if pixels.shape != values.shape:
+            raise ValueError("PartialMap needs the same number of pixels and values; "
+                             "you gave %d and %d" % (len(pixels), len(values)))
+
+        if len(pixels) > 1 and np.any(np.diff(pixels) <= 0):
+            pixels, first = np.unique(pixels, return_index=True)
+            if len(first) != len(values):
+                raise ValueError("PartialMap cannot have duplicate pixels")
+            values = values[first]
+
+        self.nside = nside
+        self.pixels = pixels
+        self.values = values
+
+    def __len__(self):
+        return len(self.pixels)
+
+    @classmethod
+    def fromDense(cls, mapVals, badval=hp.UNSEEN):
+        """
+        Make a PartialMap from the healpixels of a dense healpix map
+        that do not have the value badval (or NaN).
+
+        Parameters
+        ----------
+        mapVals : np.array
+            A valid healpix map.
+        badval : float (hp.UNSEEN)
+            The value of healpixels that have no value.
+
+        Returns
+        -------
+        PartialMap
+        """
+        mapVals = np.asarray(mapVals)
+        pixels = np.where(np.logical_and(mapVals != badval, ~np.isnan(mapVals)))[0]
+        return cls(hp.npix2nside(len(mapVals)), pixels, mapVals[pixels])
+
+    def toDense(self, dtype=None):
+        """
+        Return the map as a dense healpix map, in which the healpixels
+        without values are hp.UNSEEN.
+
+        Parameters
+        ----------
+        dtype : dtype (None)
+            Data type of the resulting map. Defaults to that of the values.
+
+        Returns
+        -------
+        mapVals : np.array
+            A numpy array that is a valid Healpixel map.
+        """
+        if dtype is None:
+            dtype = self.values.dtype
+        mapVals = np.zeros(hp.nside2npix(self.nside), dtype=dtype)+hp.UNSEEN
+        mapVals[self.pixels] = self.values
+        return mapVals
+
+    def get(self, hpids):
+        """
+        Look up the values of a map in healpixels.
+
+        Parameters
+        ----------
+        hpids : np.array
+            Array (or single value) of healpixel IDs.
+
+        Returns
+        -------
+        values : np.array
+            The values in those healpixels (hp.UNSEEN for the healpixels
+            without values).
+        """
+        hpids = np.asarray(hpids)
+        if len(self.pixels) == 0:
+            return np.zeros(hpids.shape)+hp.UNSEEN
+        dex = np.clip(np.searchsorted(self.pixels, hpids), 0, len(self.pixels)-1)
+        return np.where(self.pixels[dex] == hpids, self.values[dex], hp.UNSEEN)
 
 
 def _hpid2RaDec(nside, hpids):
@@ -14,7 +117,8 @@ def _hpid2RaDec(nside, hpids):
     nside : int
         Must be a value of 2^N.
     hpids : np.array
-        Array (or single value) of healpixel IDs.
+        Array (or single value) of healpixel IDs, or a PartialMap (with the
+        same nside), in which case the positions of its healpixels are returned.
 
     Returns
     -------
@@ -24,6 +128,12 @@ def _hpid2RaDec(nside, hpids):
         Dec positions of the input healpixel IDs. In radians.
     """
 
+    if isinstance(hpids, PartialMap):
+        if nside != hpids.nside:
+            raise ValueError("hpid2RaDec was given nside %d but a PartialMap with nside %d"
+                             % (nside, hpids.nside))
+        hpids = hpids.pixels
+
     lat, lon = hp.pix2ang(nside, hpids)
     decRet = np.pi / 2.0 - lat
     raRet = lon
@@ -40,7 +150,8 @@ def hpid2RaDec(nside, hpids):
     nside : int
         Must be a value of 2^N.
     hpids : np.array
-        Array (or single value) of healpixel IDs.
+        Array (or single value) of healpixel IDs, or a PartialMap (with the
+        same nside), in which case the positions of its healpixels are returned.
 
     Returns
     -------
@@ -53,7 +164,7 @@ def hpid2RaDec(nside, hpids):
     return np.degrees(ra), np.degrees(dec)
 
 
-def _raDec2Hpid(nside, ra, dec):
+def _raDec2Hpid(nside, ra, dec, sparse=False):
     """
     Assign ra,dec points to the correct healpixel.
 
@@ -65,6 +176,9 @@ def _raDec2Hpid(nside, ra, dec):
         RA values to assign to healpixels. Radians.
     dec : np.array
         Dec values to assign to healpixels. Radians.
+    sparse : bool (False)
+        If True, return a PartialMap of the number of points in each
+        occupied healpixel instead of the healpixel ID of each point.
 
     Returns
     -------
@@ -73,10 +187,13 @@ def _raDec2Hpid(nside, ra, dec):
     """
     lat = np.pi / 2.0 - dec
     hpids = hp.ang2pix(nside, lat, ra)
+    if sparse:
+        pixels, counts = np.unique(hpids, return_counts=True)
+        return PartialMap(nside, pixels, counts)
     return hpids
 
 
-def raDec2Hpid(nside, ra, dec):
+def raDec2Hpid(nside, ra, dec, sparse=False):
     """
     Assign ra,dec points to the correct healpixel.
 
@@ -88,16 +205,106 @@ def raDec2Hpid(nside, ra, dec):
         RA values to assign to healpixels. Degrees.
     dec : np.array
         Dec values to assign to healpixels. Degrees.
+    sparse : bool (False)
+        If True, return a PartialMap of the number of points in each
+        occupied healpixel instead of the healpixel ID of each point.
 
     Returns
     -------
     hpids : np.array
         Healpixel IDs for the input positions.
     """
-    return _raDec2Hpid(nside, np.radians(ra), np.radians(dec))
+    return _raDec2Hpid(nside, np.radians(ra), np.radians(dec), sparse=sparse)
+
+
+def _segmentReduce(reducer, hpids, values):
+    """
+    Apply one of the built-in healbin reducers to values grouped by healpixel.
+
+    Parameters
+    ----------
+    reducer : str
+        One of 'mean', 'sum', 'count', 'min', 'max', 'std' or 'median'.
+    hpids : np.array
+        Healpixel IDs of the data points, sorted.
+    values : np.array
+        The values at each data point, sorted by healpixel ID.
+
+    Returns
+    -------
+    pixids : np.array
+        The occupied healpixel IDs.
+    result : np.array
+        The reduced value in each occupied healpixel.
+    """
+    pixids, left, counts = np.unique(hpids, return_index=True, return_counts=True)
+
+    if len(pixids) == 0:
+        return pixids, np.zeros(0, dtype=float)
+
+    if reducer == 'count':
+        return pixids, counts.astype(float)
+
+    if reducer == 'sum':
+        return pixids, np.add.reduceat(values, left)
+
+    if reducer == 'min':
+        return pixids, np.minimum.reduceat(values, left)
+
+    if reducer == 'max':
+        return pixids, np.maximum.reduceat(values, left)
+
+    mean = np.add.reduceat(values, left)/counts
+
+    if reducer == 'mean':
+        return pixids, mean
+
+    segment = np.repeat(np.arange(len(pixids)), counts)
+
+    if reducer == 'std':
+        resid = values - mean[segment]
+        return pixids, np.sqrt(np.add.reduceat(resid*resid, left)/counts)
+
+    if reducer == 'median':
+        # sort the values within each segment; NaNs sort to the end, so
+        # flag the segments that contain them separately
+        order = np.lexsort((values, segment))
+        sorted_values = values[order]
+        lower = sorted_values[left + (counts-1)//2]
+        upper = sorted_values[left + counts//2]
+        result = 0.5*(lower + upper)
+        has_nan = np.add.reduceat(np.isnan(values).astype(int), left) > 0
+        result[has_nan] = np.nan
+        return pixids, result
+
+    raise ValueError("Unknown healbin reducer %s" % reducer)
+
+
+def _mapFromPixels(nside, pixids, result, dtype, sparse):
+    """
+    Turn the values of the occupied healpixels into a dense healpix map
+    (in which NaNs are masked), or a PartialMap (from which NaNs are dropped).
+    """
+    if sparse:
+        valid = ~np.isnan(result)
+        return PartialMap(nside, pixids[valid], np.asarray(result[valid], dtype=dtype))
+
+    mapVals = np.zeros(hp.nside2npix(nside), dtype=dtype)+hp.UNSEEN
+    mapVals[pixids] = result
+
+    # Change any NaNs to healpy mask value
+    mapVals[np.isnan(mapVals)] = hp.UNSEEN
+
+    return mapVals
+
+
+# the callables that are replaced with their built-in, vectorized equivalents
+_builtinReducers = {np.mean: 'mean', np.sum: 'sum', len: 'count',
+                    np.min: 'min', np.amin: 'min', np.max: 'max', np.amax: 'max',
+                    np.std: 'std', np.median: 'median'}
 
 
-def _healbin(ra, dec, values, nside=128, reduceFunc=np.mean, dtype=float):
+def _healbin(ra, dec, values, nside=128, reduceFunc=np.mean, dtype=float, sparse=False):
     """
     Take arrays of ra's, dec's, and value and bin into healpixels. Like numpy.hexbin but for
     bins on a sphere.
@@ -114,38 +321,53 @@ def _healbin(ra, dec, values, nside=128, reduceFunc=np.mean, dtype=float):
         Healpixel nside resolution. Must be a value of 2^N.
     reduceFunc : function (numpy.mean)
         A function that will return a single value given a subset of `values`.
+        The strings 'mean', 'sum', 'count', 'min', 'max', 'std' and 'median'
+        (or the equivalent numpy functions and len) select fast, vectorized
+        reducers; any other function is called once per occupied healpixel.
     dtype : dtype ('float')
         Data type of the resulting mask
+    sparse : bool (False)
+        If True, return a PartialMap of the occupied healpixels instead of
+        a dense map of the whole sphere.
 
     Returns
     -------
     mapVals : np.array
-        A numpy array that is a valid Healpixel map.
+        A numpy array that is a valid Healpixel map (or a PartialMap).
     """
 
     hpids = _raDec2Hpid(nside, ra, dec)
 
-    order = np.argsort(hpids)
+    order = np.argsort(hpids, kind='mergesort')
     hpids = hpids[order]
     values = values[order]
-    pixids = np.unique(hpids)
 
-    left = np.searchsorted(hpids, pixids)
-    right = np.searchsorted(hpids, pixids, side='right')
+    if isinstance(reduceFunc, str):
+        reducer = reduceFunc
+    else:
+        try:
+            reducer = _builtinReducers.get(reduceFunc)
+        except TypeError:
+            # unhashable callable
+            reducer = None
 
-    mapVals = np.zeros(hp.nside2npix(nside), dtype=dtype)+hp.UNSEEN
+    if reducer is not None:
+        pixids, result = _segmentReduce(reducer, hpids, values)
+    else:
+        pixids = np.unique(hpids)
 
-    # Wow, I thought histogram would be faster than the loop, but this has been faster!
-    for i, idx in enumerate(pixids):
-        mapVals[idx] = reduceFunc(values[left[i]:right[i]])
+        left = np.searchsorted(hpids, pixids)
+        right = np.searchsorted(hpids, pixids, side='right')
 
-    # Change any NaNs to healpy mask value
-    mapVals[np.isnan(mapVals)] = hp.UNSEEN
+        # Wow, I thought histogram would be faster than the loop, but this has been faster!
+        result = np.zeros(len(pixids), dtype=dtype)
+        for i in range(len(pixids)):
+            result[i] = reduceFunc(values[left[i]:right[i]])
 
-    return mapVals
+    return _mapFromPixels(nside, pixids, result, dtype, sparse)
 
 
-def healbin(ra, dec, values, nside=128, reduceFunc=np.mean, dtype=float):
+def healbin(ra, dec, values, nside=128, reduceFunc=np.mean, dtype=float, sparse=False):
     """
     Take arrays of ra's, dec's, and value and bin into healpixels. Like numpy.hexbin but for
     bins on a sphere.
@@ -162,13 +384,254 @@ def healbin(ra, dec, values, nside=128, reduceFunc=np.mean, dtype=float):
         Healpixel nside resolution. Must be a value of 2^N.
     reduceFunc : function (numpy.mean)
         A function that will return a single value given a subset of `values`.
+        The strings 'mean', 'sum', 'count', 'min', 'max', 'std' and 'median'
+        (or the equivalent numpy functions and len) select fast, vectorized
+        reducers; any other function is called once per occupied healpixel.
     dtype : dtype ('float')
         Data type of the resulting mask
+    sparse : bool (False)
+        If True, return a PartialMap of the occupied healpixels instead of
+        a dense map of the whole sphere.
 
     Returns
     -------
     mapVals : np.array
-        A numpy array that is a valid Healpixel map.
+        A numpy array that is a valid Healpixel map (or a PartialMap).
     """
     return _healbin(np.radians(ra), np.radians(dec), values, nside=nside,
-                    reduceFunc=reduceFunc, dtype=dtype)
+                    reduceFunc=reduceFunc, dtype=dtype, sparse=sparse)
+
+
+class HealbinAccumulator(object):
+    """
+    Bin ra, dec, value data points into healpixels incrementally, so that
+    maps can be made from more data points than fit in memory at once.
+    This is the out-of-core analog of healbin.
+
+    For each healpixel, the accumulator keeps the number of data points,
+    their sum, the sum of their squared deviations from the mean (which is
+    more numerically stable than the sum of their squares), their minimum
+    and their maximum.  Optionally, it also keeps a histogram of the values
+    in each healpixel on a fixed set of bins, from which approximate
+    quantiles (e.g. the median) can be calculated.  Memory usage therefore
+    scales with the number of healpixels, not the number of data points.
+
+    Accumulators filled by separate processes can be combined with merge().
+
+    Parameters
+    ----------
+    nside : int
+        Healpixel nside resolution. Must be a value of 2^N.
+    histogramBins : np.array (None)
+        Edges of the bins on which to histogram values in each healpixel.
+        Values outside of the edges are counted in the first or last bin.
+        If None, no histograms are kept and quantiles cannot be calculated.
+    """
+
+    def __init__(self, nside=128, histogramBins=None):
+        self.nside = nside
+        npix = hp.nside2npix(nside)
+        self._count = np.zeros(npix, dtype=np.int64)
+        self._sum = np.zeros(npix, dtype=float)
+        self._m2 = np.zeros(npix, dtype=float)
+        self._min = np.zeros(npix, dtype=float) + np.inf
+        self._max = np.zeros(npix, dtype=float) - np.inf
+
+        if histogramBins is not None:
+            self._bins = np.asarray(histogramBins, dtype=float)
+            if self._bins.ndim != 1 or len(self._bins) < 2 or np.any(np.diff(self._bins) <= 0.0):
+                raise ValueError("histogramBins must be a monotonically increasing "
+                                 "array of at least two bin edges")
+            self._histogram = np.zeros((npix, len(self._bins)-1), dtype=np.int64)
+        else:
+            self._bins = None
+            self._histogram = None
+
+    def _combine(self, pixids, count, total, m2, vmin, vmax):
+        """
+        Combine the statistics of a group of data points with the running
+        statistics of the healpixels pixids (which must be unique).
+        """
+        n_a = self._count[pixids]
+        n_ab = n_a + count
+        mean_a = np.where(n_a > 0, self._sum[pixids]/np.maximum(n_a, 1), 0.0)
+        delta = total/count - mean_a
+
+        self._m2[pixids] += m2 + delta*delta*n_a*count/n_ab
+        self._sum[pixids] += total
+        self._count[pixids] = n_ab
+        self._min[pixids] = np.minimum(self._min[pixids], vmin)
+        self._max[pixids] = np.maximum(self._max[pixids], vmax)
+
+    def _add(self, ra, dec, values):
+        """
+        Add a chunk of data points to the accumulator.
+
+        Parameters
+        ----------
+        ra : np.array
+            RA positions of the data points. Radians.
+        dec : np.array
+            Dec positions of the data points. Radians
+        values : np.array
+            The values at each ra,dec position.
+        """
+        if len(values) == 0:
+            return
+
+        hpids = _raDec2Hpid(self.nside, ra, dec)
+        order = np.argsort(hpids, kind='mergesort')
+        hpids = hpids[order]
+        values = np.asarray(values, dtype=float)[order]
+
+        pixids, left, counts = np.unique(hpids, return_index=True, return_counts=True)
+        total = np.add.reduceat(values, left)
+        resid = values - np.repeat(total/counts, counts)
+        m2 = np.add.reduceat(resid*resid, left)
+        self._combine(pixids, counts, total, m2,
+                      np.minimum.reduceat(values, left),
+                      np.maximum.reduceat(values, left))
+
+        if self._histogram is not None:
+            n_bins = len(self._bins) - 1
+            valid = ~np.isnan(values)
+            bin_dex = np.clip(np.searchsorted(self._bins, values[valid], side='right')-1,
+                              0, n_bins-1)
+            keys, key_counts = np.unique(hpids[valid]*n_bins + bin_dex, return_counts=True)
+            self._histogram.ravel()[keys] += key_counts
+
+    def add(self, ra, dec, values):
+        """
+        Add a chunk of data points to the accumulator.
+
+        Parameters
+        ----------
+        ra : np.array
+            RA positions of the data points. Degrees.
+        dec : np.array
+            Dec positions of the data points. Degrees.
+        values : np.array
+            The values at each ra,dec position.
+        """
+        self._add(np.radians(ra), np.radians(dec), values)
+
+    def merge(self, other):
+        """
+        Add the data points accumulated by another HealbinAccumulator
+        (with the same nside and histogramBins) to this one.
+
+        Parameters
+        ----------
+        other : HealbinAccumulator
+
+        Returns
+        -------
+        self
+        """
+        if other.nside != self.nside:
+            raise ValueError("Cannot merge HealbinAccumulators with different nside")
+
+        if (self._bins is None) != (other._bins is None) or \
+           (self._bins is not None and not np.array_equal(self._bins, other._bins)):
+            raise ValueError("Cannot merge HealbinAccumulators with different histogramBins")
+
+        pixids = np.where(other._count > 0)[0]
+        self._combine(pixids, other._count[pixids], other._sum[pixids], other._m2[pixids],
+                      other._min[pixids], other._max[pixids])
+
+        if self._histogram is not None:
+            self._histogram += other._histogram
+
+        return self
+
+    def _orderStatistic(self, hist, cumulative, rank):
+        """
+        Approximate the rank-th smallest (counting from zero) value in each
+        row of hist, assuming that the values in each histogram bin are
+        spread evenly across it.
+        """
+        bin_dex = np.argmax(cumulative > rank[:, None], axis=1)
+        rows = np.arange(len(rank))
+        previous = cumulative[rows, bin_dex] - hist[rows, bin_dex]
+        frac = (rank - previous + 0.5)/np.maximum(hist[rows, bin_dex], 1)
+        return self._bins[bin_dex] + frac*(self._bins[bin_dex+1]-self._bins[bin_dex])
+
+    def _quantile(self, pixids, q):
+        """
+        Approximate the q-th quantile of the values in the healpixels pixids,
+        interpolating between order statistics as np.percentile does.
+        """
+        hist = self._histogram[pixids]
+        cumulative = np.cumsum(hist, axis=1)
+        n_valid = cumulative[:, -1]
+        rank = q*np.maximum(n_valid-1, 0)
+        lower = np.floor(rank)
+        result = self._orderStatistic(hist, cumulative, lower)
+        upper = np.minimum(lower+1, np.maximum(n_valid-1, 0))
+        result += (rank-lower)*(self._orderStatistic(hist, cumulative, upper)-result)
+        result[n_valid == 0] = np.nan
+        return result
+
+    def finalize(self, reduceFunc='mean', dtype=float, q=None, sparse=False):
+        """
+        Return the healpix map of the accumulated data points.
+
+        Parameters
+        ----------
+        reduceFunc : str or function ('mean')
+            One of 'mean', 'sum', 'count', 'min', 'max', 'std', 'median' or
+            'quantile' (or the numpy function equivalent to one of the first
+            seven).  'median' and 'quantile' are approximated from the
+            histograms and require histogramBins.
+        dtype : dtype ('float')
+            Data type of the resulting mask
+        q : float (None)
+            The quantile (between 0 and 1) to calculate if reduceFunc is 'quantile'
+        sparse : bool (False)
+            If True, return a PartialMap of the occupied healpixels instead of
+            a dense map of the whole sphere.
+
+        Returns
+        -------
+        mapVals : np.array
+            A numpy array that is a valid Healpixel map (or a PartialMap); it is the same map
+            healbin would produce from all of the accumulated data points
+            (to within round-off error, or the histogram resolution for
+            'median' and 'quantile').
+        """
+
+        reducer = reduceFunc if isinstance(reduceFunc, str) else _builtinReducers.get(reduceFunc)
+        if reducer is None:
+            raise ValueError("HealbinAccumulator cannot finalize with reduceFunc %s" % reduceFunc)
+
+        if reducer == 'median':
+            reducer = 'quantile'
+            q = 0.5
+
+        pixids = np.where(self._count > 0)[0]
+        count = self._count[pixids]
+
+        if reducer == 'count':
+            result = count
+        elif reducer == 'sum':
+            result = self._sum[pixids]
+        elif reducer == 'mean':
+            result = self._sum[pixids]/count
+        elif reducer == 'std':
+            result = np.sqrt(self._m2[pixids]/count)
+        elif reducer == 'min':
+            result = self._min[pixids]
+        elif reducer == 'max':
+            result = self._max[pixids]
+        elif reducer == 'quantile':
+            if self._histogram is None:
+                raise ValueError("HealbinAccumulator needs histogramBins to calculate quantiles")
+            if q is None or q < 0.0 or q > 1.0:
+                raise ValueError("You must specify a quantile q between 0 and 1")
+            result = self._quantile(pixids, q)
+            # as in healbin, pixels containing NaNs have no median
+            result[np.isnan(self._sum[pixids])] = np.nan
+        else:
+            raise ValueError("Unknown HealbinAccumulator reducer %s" % reducer)
+
+        return _mapFromPixels(self.nside, pixids, result, dtype, sparse)
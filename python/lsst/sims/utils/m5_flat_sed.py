@@ -1,6 +1,47 @@
 import numpy as np
 
-__all__ = ['m5_flat_sed']
+__all__ = ['m5_flat_sed', 'm5_flat_sed_array', 'm5CoefficientTable', 'defaultM5Coefficients',
+           'expTime_from_m5', 'FWHMeff_from_m5']
+
+
+def m5CoefficientTable(filters, Cm, dCm_infinity, kAtm, msky):
+    """Build a table of the per-filter coefficients used by m5_flat_sed_array.
+
+    Parameters
+    ----------
+    filters : list of str
+        The names of the filters (e.g. ['u', 'g', 'r', 'i', 'z', 'y'])
+    Cm : list of float
+        The m5 normalization of each filter
+    dCm_infinity : list of float
+        The correction to Cm for infinite exposure time (i.e. negligible readnoise)
+    kAtm : list of float
+        The atmospheric extinction coefficient of each filter
+    msky : list of float
+        The fiducial sky brightness (mag/sq arcsec) of each filter
+
+    Returns
+    -------
+    numpy.ndarray
+        A structured array with one row per filter and the fields
+        'filter', 'Cm', 'dCm_infinity', 'kAtm' and 'msky'.
+    """
+    filters = [str(name) for name in filters]
+    dtype = [('filter', 'U%d' % max(len(name) for name in filters)),
+             ('Cm', float), ('dCm_infinity', float), ('kAtm', float), ('msky', float)]
+    return np.array(list(zip(filters, Cm, dCm_infinity, kAtm, msky)), dtype=dtype)
+
+
+# Expected extinction (kAtm) and m5 normalization values (Cm) for each filter.
+# The Cm values must be changed when telescope and site parameters are updated.
+#
+# These values are calculated using $SYSENG_THROUGHPUTS/python/calcM5.py.
+# This set of values are calculated using v1.2 of the SYSENG_THROUGHPUTS repo.
+defaultM5Coefficients = m5CoefficientTable(filters=['u', 'g', 'r', 'i', 'z', 'y'],
+                                           Cm=[22.74, 24.38, 24.43, 24.30, 24.15, 23.70],
+                                           dCm_infinity=[0.75, 0.19, 0.10, 0.07, 0.05, 0.04],
+                                           kAtm=[0.50, 0.21, 0.13, 0.10, 0.07, 0.18],
+                                           msky=[22.95, 22.24, 21.20, 20.47, 19.60, 18.63])
 
 
 def m5_flat_sed(visitFilter, musky, FWHMeff, expTime, airmass, tauCloud=0):
@@ -27,38 +68,12 @@ def m5_flat_sed(visitFilter, musky, FWHMeff, expTime, airmass, tauCloud=0):
         The five-sigma limiting depth of a point source observed in the given conditions.
     """
 
-    # Set up expected extinction (kAtm) and m5 normalization values (Cm) for each filter.
-    # The Cm values must be changed when telescope and site parameters are updated.
-    #
-    # These values are calculated using $SYSENG_THROUGHPUTS/python/calcM5.py.
-    # This set of values are calculated using v1.2 of the SYSENG_THROUGHPUTS repo.
-
     # Only define the dicts once on initial call
+    # (see defaultM5Coefficients for the provenance of the values)
     if not hasattr(m5_flat_sed, 'Cm'):
-        m5_flat_sed.Cm = {'u': 22.74,
-                          'g': 24.38,
-                          'r': 24.43,
-                          'i': 24.30,
-                          'z': 24.15,
-                          'y': 23.70}
-        m5_flat_sed.dCm_infinity = {'u': 0.75,
-                                    'g': 0.19,
-                                    'r': 0.10,
-                                    'i': 0.07,
-                                    'z': 0.05,
-                                    'y': 0.04}
-        m5_flat_sed.kAtm = {'u': 0.50,
-                            'g': 0.21,
-                            'r': 0.13,
-                            'i': 0.10,
-                            'z': 0.07,
-                            'y': 0.18}
-        m5_flat_sed.msky = {'u': 22.95,
-                            'g': 22.24,
-                            'r': 21.20,
-                            'i': 20.47,
-                            'z': 19.60,
-                            'y': 18.63}
+        for key in ('Cm', 'dCm_infinity', 'kAtm', 'msky'):
+            setattr(m5_flat_sed, key, dict(zip(defaultM5Coefficients['filter'].tolist(),
+                                               defaultM5Coefficients[key].tolist())))
     # Calculate adjustment if readnoise is significant for exposure time
     # (see overview paper, equation 7)
     Tscale = expTime / 30.0 * np.power(10.0, -0.4*(musky - m5_flat_sed.msky[visitFilter]))
@@ -70,3 +85,172 @@ def m5_flat_sed(visitFilter, musky, FWHMeff, expTime, airmass, tauCloud=0):
           1.25*np.log10(expTime/30.0) - m5_flat_sed.kAtm[visitFilter]*(airmass-1.0) - 1.1*tauCloud)
 
     return m5
+
+
+def _filterIndices(visitFilter, filters):
+    """Return the index in filters of each element of visitFilter
+    (an array of filter names or of integer indices).
+    """
+    visitFilter = np.asarray(visitFilter)
+    if visitFilter.dtype.kind == 'O':
+        # e.g. the filter column of a pandas DataFrame
+        visitFilter = visitFilter.astype(str)
+
+    if visitFilter.dtype.kind in 'iu':
+        if visitFilter.size > 0 and (visitFilter.min() < 0 or visitFilter.max() >= len(filters)):
+            raise RuntimeError("m5_flat_sed_array: filter indices must be between 0 and %d"
+                               % (len(filters) - 1))
+        return visitFilter
+
+    if visitFilter.dtype.kind not in 'SU':
+        raise RuntimeError("m5_flat_sed_array: visitFilter must contain filter names or integer "
+                           "indices; you gave an array of %s" % str(visitFilter.dtype))
+
+    indices = np.full(visitFilter.shape, -1, dtype=int)
+    for i_filter, name in enumerate(filters):
+        if visitFilter.dtype.kind == 'S':
+            name = name.encode()
+        indices[visitFilter == name] = i_filter
+
+    if (indices < 0).any():
+        raise RuntimeError("m5_flat_sed_array: unknown filters %s; the coefficient table "
+                           "has %s" % (str(np.unique(visitFilter[indices < 0])), str(list(filters))))
+    return indices
+
+
+def _gatherCoefficients(visitFilter, coefficients):
+    """Return the arrays Cm, dCm_infinity, kAtm and msky for the filter of
+    each visit (see m5_flat_sed_array for the arguments).
+    """
+    if coefficients is None:
+        coefficients = defaultM5Coefficients
+
+    indices = _filterIndices(visitFilter, coefficients['filter'].tolist())
+    return (coefficients['Cm'][indices], coefficients['dCm_infinity'][indices],
+            coefficients['kAtm'][indices], coefficients['msky'][indices])
+
+
+def m5_flat_sed_array(visitFilter, musky, FWHMeff, expTime, airmass, tauCloud=0, coefficients=None):
+    """Calculate the m5 values of many visits at once, using photometric scaling
+    (see m5_flat_sed).  Note, does not include shape of the object SED.
+
+    The per-filter coefficients are gathered from a coefficient table with one
+    integer index per visit, so that visits in all filters are evaluated in one
+    broadcasted pass.
+
+    Parameters
+    ----------
+    visitFilter : numpy.ndarray
+        The filter of each visit: either names (e.g. 'r') or integer indices
+        into the rows of the coefficient table
+    musky : float or numpy.ndarray
+        Surface brightness of the sky in mag/sq arcsec
+    FWHMeff : float or numpy.ndarray
+        The seeing effective FWHM (arcsec)
+    expTime : float or numpy.ndarray
+        Exposure time for the entire visit in seconds
+    airmass : float or numpy.ndarray
+        Airmass of the observation (unitless)
+    tauCloud : float or numpy.ndarray (0.)
+        Any extinction from clouds in magnitudes (positive values = more extinction)
+    coefficients : numpy.ndarray (None)
+        A table of per-filter coefficients made by m5CoefficientTable
+        (e.g. for another version of the throughputs).
+        Defaults to defaultM5Coefficients.
+
+    Output
+    ------
+    m5 : numpy.ndarray
+        The five-sigma limiting depth of a point source observed in the given conditions.
+    """
+    Cm, dCm_infinity, kAtm, msky = _gatherCoefficients(visitFilter, coefficients)
+
+    # Calculate adjustment if readnoise is significant for exposure time
+    # (see overview paper, equation 7)
+    Tscale = expTime / 30.0 * np.power(10.0, -0.4*(musky - msky))
+    dCm = dCm_infinity - 1.25*np.log10(1 + (np.power(10.0, 0.8*dCm_infinity) - 1)/Tscale)
+    # Calculate fiducial m5
+    m5 = (Cm + dCm + 0.50*(musky-21.0) + 2.5*np.log10(0.7/FWHMeff) +
+          1.25*np.log10(expTime/30.0) - kAtm*(airmass-1.0) - 1.1*tauCloud)
+
+    return m5
+
+
+def expTime_from_m5(m5, visitFilter, musky, FWHMeff, airmass, tauCloud=0, coefficients=None):
+    """Calculate the exposure time needed to reach a given m5 (the inverse of
+    m5_flat_sed_array with respect to expTime).
+
+    With u = expTime/30 and s = 10^(-0.4*(musky - msky)), the terms of m5 that depend
+    on the exposure time are 1.25*log10(u^2 s/(u s + B)), where
+    B = 10^(0.8*dCm_infinity) - 1, so u is the positive root of a quadratic.
+
+    Parameters
+    ----------
+    m5 : float or numpy.ndarray
+        The target five-sigma limiting depth
+    visitFilter : str or numpy.ndarray
+        The filter of each visit: either names (e.g. 'r') or integer indices
+        into the rows of the coefficient table
+    musky : float or numpy.ndarray
+        Surface brightness of the sky in mag/sq arcsec
+    FWHMeff : float or numpy.ndarray
+        The seeing effective FWHM (arcsec)
+    airmass : float or numpy.ndarray
+        Airmass of the observation (unitless)
+    tauCloud : float or numpy.ndarray (0.)
+        Any extinction from clouds in magnitudes (positive values = more extinction)
+    coefficients : numpy.ndarray (None)
+        A table of per-filter coefficients made by m5CoefficientTable.
+        Defaults to defaultM5Coefficients.
+
+    Output
+    ------
+    expTime : numpy.ndarray
+        The exposure time for the entire visit in seconds
+    """
+    Cm, dCm_infinity, kAtm, msky = _gatherCoefficients(visitFilter, coefficients)
+
+    # the terms of m5 that do not depend on the exposure time
+    m5Fixed = (Cm + dCm_infinity + 0.50*(musky-21.0) + 2.5*np.log10(0.7/FWHMeff) -
+               kAtm*(airmass-1.0) - 1.1*tauCloud)
+
+    Q = np.power(10.0, 0.8*(m5 - m5Fixed))
+    B = np.power(10.0, 0.8*dCm_infinity) - 1.0
+    sky = np.power(10.0, -0.4*(musky - msky))
+    u = 0.5*(Q + np.sqrt(Q*Q + 4.0*Q*B/sky))
+
+    return 30.0*u
+
+
+def FWHMeff_from_m5(m5, visitFilter, musky, expTime, airmass, tauCloud=0, coefficients=None):
+    """Calculate the seeing effective FWHM at which a visit reaches a given m5
+    (the inverse of m5_flat_sed_array with respect to FWHMeff).
+
+    Parameters
+    ----------
+    m5 : float or numpy.ndarray
+        The target five-sigma limiting depth
+    visitFilter : str or numpy.ndarray
+        The filter of each visit: either names (e.g. 'r') or integer indices
+        into the rows of the coefficient table
+    musky : float or numpy.ndarray
+        Surface brightness of the sky in mag/sq arcsec
+    expTime : float or numpy.ndarray
+        Exposure time for the entire visit in seconds
+    airmass : float or numpy.ndarray
+        Airmass of the observation (unitless)
+    tauCloud : float or numpy.ndarray (0.)
+        Any extinction from clouds in magnitudes (positive values = more extinction)
+    coefficients : numpy.ndarray (None)
+        A table of per-filter coefficients made by m5CoefficientTable.
+        Defaults to defaultM5Coefficients.
+
+    Output
+    ------
+    FWHMeff : numpy.ndarray
+        The seeing effective FWHM (arcsec); m5 is brighter for any larger FWHMeff
+    """
+    # m5 depends on FWHMeff only through 2.5*log10(0.7/FWHMeff)
+    m5Fiducial = m5_flat_sed_array(visitFilter, musky, 0.7, expTime, airmass, tauCloud=tauCloud,
+                                   coefficients=coefficients)
+    return 0.7*np.power(10.0, 0.4*(m5Fiducial - m5))
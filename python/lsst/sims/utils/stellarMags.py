@@ -3,7 +3,7 @@ from builtins import zip
 from builtins import range
 import numpy as np
 
-__all__ = ['stellarMags']
+__all__ = ['stellarMags', 'stellarMagsArray']
 
 
 def calcWDColors():
@@ -49,31 +49,16 @@ def calcWDColors():
         print("['%s', '%s', %f, %f, %f, %f, %f]" % format)
 
 
-def stellarMags(stellarType, rmag=19.):
+def _stellarColorData():
     """
-    Calculates the expected magnitudes in LSST filters for a
-    typical star of the given spectral type.
+    Return the table of colors of typical stars (a numpy record array with
+    the columns 'stellarType', 'Model Name', 'u-g', 'g-r', 'r-i', 'i-z' and 'z-y').
 
     Based on mapping of Kuruz models to spectral types here:
     http://www.stsci.edu/hst/observatory/crds/k93models.html
-
-
-    Parameters
-    ----------
-    stellarType : str
-        Spectral type of a star (O,B,A,F,G,K,M), or for white dwarf colors,
-        one of 'HeWD_25200_80, 'WD_11000_85', 'WD_3000_85'
-    rmag : float
-        The expected r-band magnitude of the star.
-
-    Returns
-    -------
-    dict of floats
-        The expected magnitudes in LSST filters.
     """
-
     # If this is the first time running the function, set up the data array
-    if not hasattr(stellarMags, 'data'):
+    if not hasattr(_stellarColorData, 'data'):
         names = ['stellarType', 'Model Name',
                  'u-g', 'g-r', 'r-i', 'i-z', 'z-y']
         types = [('U', 20), ('U', 35), float, float, float, float, float]
@@ -99,6 +84,37 @@ def stellarMags(stellarType, rmag=19.):
             ['WD_3000_85', 'bergeron_2750_85.dat_3000.gz',
              3.170620, 1.400062, 0.167195, 0.127024, -0.378069]],
             dtype=list(zip(names, types)))
+        _stellarColorData.data = data
+
+    return _stellarColorData.data
+
+
+def stellarMags(stellarType, rmag=19.):
+    """
+    Calculates the expected magnitudes in LSST filters for a
+    typical star of the given spectral type.
+
+    Based on mapping of Kuruz models to spectral types here:
+    http://www.stsci.edu/hst/observatory/crds/k93models.html
+
+
+    Parameters
+    ----------
+    stellarType : str
+        Spectral type of a star (O,B,A,F,G,K,M), or for white dwarf colors,
+        one of 'HeWD_25200_80, 'WD_11000_85', 'WD_3000_85'
+    rmag : float
+        The expected r-band magnitude of the star.
+
+    Returns
+    -------
+    dict of floats
+        The expected magnitudes in LSST filters.
+    """
+
+    # If this is the first time running the function, set up the data dict
+    if not hasattr(stellarMags, 'data'):
+        data = _stellarColorData()
         # Switch to a dict for faster look-up
         stellarMags.data = {}
         for row in data:
@@ -118,3 +134,85 @@ def stellarMags(stellarType, rmag=19.):
     results['g'] = stellarMags.data[stellarType]['g-r'] + results['r']
     results['u'] = stellarMags.data[stellarType]['u-g'] + results['g']
     return results
+
+
+def _stellarOffsets():
+    """
+    Return the names of the stellar types and a (n_types, 6) array of the
+    u, g, r, i, z, y magnitudes of each type relative to its r magnitude.
+    """
+    if not hasattr(_stellarOffsets, 'offsets'):
+        data = _stellarColorData()
+        offsets = np.zeros((len(data), 6), dtype=float)
+        offsets[:, 3] = -data['r-i']
+        offsets[:, 4] = offsets[:, 3] - data['i-z']
+        offsets[:, 5] = offsets[:, 4] - data['z-y']
+        offsets[:, 1] = data['g-r']
+        offsets[:, 0] = offsets[:, 1] + data['u-g']
+        _stellarOffsets.names = np.array(data['stellarType'])
+        _stellarOffsets.offsets = offsets
+
+    return _stellarOffsets.names, _stellarOffsets.offsets
+
+
+def _stellarTypeIndices(stellarType, names):
+    """
+    Return the index in names of each element of stellarType (an array of
+    stellar type names or of integer indices), raising a ValueError listing
+    every unknown type at once.
+    """
+    stellarType = np.asarray(stellarType)
+
+    if stellarType.dtype.kind in 'iu':
+        if stellarType.size > 0 and (stellarType.min() < 0 or stellarType.max() >= len(names)):
+            raise ValueError('Stellar type indices must be between 0 and %d' % (len(names) - 1))
+        return stellarType
+
+    if stellarType.dtype.kind == 'S':
+        stellarType = stellarType.astype(str)
+    elif stellarType.dtype.kind != 'U':
+        raise ValueError('stellarType must contain type names or integer indices; '
+                         'you gave an array of %s' % str(stellarType.dtype))
+
+    # one binary search of the sorted type names per star
+    sorter = np.argsort(names)
+    indices = np.searchsorted(names, stellarType, sorter=sorter)
+    indices = sorter[np.clip(indices, 0, len(names) - 1)]
+    unknown = names[indices] != stellarType
+    if unknown.any():
+        message = 'Received stellarType %s' % ', '.join(np.unique(stellarType[unknown]))
+        message += ' but expected one of %s' % ', '.join(names)
+        raise ValueError(message)
+    return indices
+
+
+def stellarMagsArray(stellarType, rmag=19.):
+    """
+    Calculates the expected magnitudes in LSST filters for many stars at once
+    (see stellarMags).
+
+    The magnitudes of each type relative to r are precomputed, so each filter
+    costs one gather and one addition over the whole array of stars.
+
+    Parameters
+    ----------
+    stellarType : str, int or numpy.ndarray
+        The spectral type of each star: either names (e.g. 'G', 'WD_11000_85')
+        or integer indices into the order O, B, A, F, G, K, M, 'HeWD_25200_80',
+        'WD_11000_85', 'WD_3000_85'
+    rmag : float or numpy.ndarray
+        The expected r-band magnitude of each star.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+        The expected magnitudes in LSST filters, keyed on u, g, r, i, z, y.
+    """
+    names, offsets = _stellarOffsets()
+    indices = _stellarTypeIndices(stellarType, names)
+    indices, rmag = np.broadcast_arrays(indices, np.asarray(rmag, dtype=float))
+
+    results = {}
+    for i_filter, filterName in enumerate('ugrizy'):
+        results[filterName] = rmag + offsets[:, i_filter][indices]
+    return results
@@ -37,6 +37,8 @@ from lsst.sims.utils import _observedFromICRS, _icrsFromObserved
 from lsst.sims.utils import _appGeoFromObserved, _icrsFromAppGeo
 from lsst.sims.utils import refractionCoefficients, applyRefraction
 from lsst.sims.utils import observedFromICRS, applyProperMotion, sphericalFromCartesian
+from lsst.sims.utils import AstrometryContext
+from lsst.sims.utils import _observedFromICRSMultiVisit
 
 
 def setup_module(module):
@@ -1262,6 +1264,125 @@ class astrometryUnitTest(unittest.TestCase):
 
             self.assertGreater(dd_bad.min(), 10.0)
 
+    def test_astrometryContext(self):
+        """
+        Test that passing an AstrometryContext to the coordinate
+        transformations gives the same results as not passing one
+        """
+        rng = np.random.RandomState(8812)
+        n_obj = 50
+        ra = np.radians(self.obs_metadata.pointingRA) + rng.random_sample(n_obj) * 0.01
+        dec = np.radians(self.obs_metadata.pointingDec) + rng.random_sample(n_obj) * 0.01
+        pm_ra = radiansFromArcsec(rng.random_sample(n_obj) * 0.1)
+        pm_dec = radiansFromArcsec(rng.random_sample(n_obj) * 0.1)
+        px = radiansFromArcsec(rng.random_sample(n_obj) * 0.01)
+        v_rad = rng.random_sample(n_obj) * 100.0
+
+        context = AstrometryContext(self.obs_metadata)
+
+        for epoch in (2000.0, 1995.0):
+            control = _appGeoFromICRS(ra, dec, pm_ra=pm_ra, pm_dec=pm_dec,
+                                      parallax=px, v_rad=v_rad, epoch=epoch,
+                                      mjd=self.obs_metadata.mjd)
+            test = _appGeoFromICRS(ra, dec, pm_ra=pm_ra, pm_dec=pm_dec,
+                                   parallax=px, v_rad=v_rad, epoch=epoch,
+                                   context=context)
+            np.testing.assert_array_equal(control, test)
+
+            control = _icrsFromAppGeo(ra, dec, epoch=epoch, mjd=self.obs_metadata.mjd)
+            test = _icrsFromAppGeo(ra, dec, epoch=epoch, context=context)
+            np.testing.assert_array_equal(control, test)
+
+            control = _solarRaDec(self.obs_metadata.mjd, epoch=epoch)
+            test = _solarRaDec(None, epoch=epoch, context=context)
+            np.testing.assert_array_equal(control, test)
+
+            for includeRefraction in (True, False):
+                control = _observedFromICRS(ra, dec, obs_metadata=self.obs_metadata,
+                                            epoch=epoch, includeRefraction=includeRefraction)
+                test = _observedFromICRS(ra, dec, epoch=epoch, context=context,
+                                         includeRefraction=includeRefraction)
+                np.testing.assert_array_equal(control, test)
+
+                control = _icrsFromObserved(ra, dec, obs_metadata=self.obs_metadata,
+                                            epoch=epoch, includeRefraction=includeRefraction)
+                test = _icrsFromObserved(ra, dec, obs_metadata=self.obs_metadata,
+                                         epoch=epoch, includeRefraction=includeRefraction,
+                                         context=context)
+                np.testing.assert_array_equal(control, test)
+
+        self.assertEqual(len(context._mappa_cache), 2)
+        self.assertEqual(len(context._aoppa_cache), 2)
+
+        # test that the cache is discarded when the mjd changes
+        obs = ObservationMetaData(pointingRA=25.0, pointingDec=-12.0,
+                                  mjd=ModifiedJulianDate(TAI=52000.0))
+        context = AstrometryContext(obs)
+        _observedFromICRS(ra, dec, epoch=2000.0, context=context)
+        obs.mjd = ModifiedJulianDate(TAI=53000.0)
+        control = _observedFromICRS(ra, dec, obs_metadata=obs, epoch=2000.0)
+        test = _observedFromICRS(ra, dec, epoch=2000.0, context=context)
+        np.testing.assert_array_equal(control, test)
+
+        # test that mismatched obs_metadata and context raise an exception
+        with self.assertRaises(RuntimeError):
+            _observedFromICRS(ra, dec, obs_metadata=self.obs_metadata,
+                              epoch=2000.0, context=context)
+
+        with self.assertRaises(RuntimeError):
+            _appGeoFromICRS(ra, dec, epoch=2000.0, mjd=self.obs_metadata.mjd,
+                            context=context)
+
+    def test_observedFromICRSMultiVisit(self):
+        """
+        Test that _observedFromICRSMultiVisit gives the same results as
+        calling _observedFromICRS one visit at a time
+        """
+        rng = np.random.RandomState(5512)
+        n_visits = 7
+        obs_list = [ObservationMetaData(pointingRA=rng.random_sample()*360.0,
+                                        pointingDec=rng.random_sample()*60.0-80.0,
+                                        mjd=59580.0+rng.random_sample()*3650.0)
+                    for ii in range(n_visits)]
+
+        n_obj = 200
+        ra = rng.random_sample(n_obj)*2.0*np.pi
+        dec = rng.random_sample(n_obj)*np.pi-0.5*np.pi
+        pm_ra = radiansFromArcsec(rng.random_sample(n_obj)*0.1)
+        px = radiansFromArcsec(rng.random_sample(n_obj)*0.01)
+        # leave out one visit to make sure that it is skipped correctly
+        visit_index = rng.randint(0, n_visits-1, n_obj)
+
+        for includeRefraction in (True, False):
+            test = _observedFromICRSMultiVisit(ra, dec, visit_index, obs_list,
+                                               pm_ra=pm_ra, parallax=px,
+                                               epoch=2000.0,
+                                               includeRefraction=includeRefraction)
+
+            self.assertEqual(test.shape, (2, n_obj))
+
+            for ii in range(n_obj):
+                control = _observedFromICRS(ra[ii:ii+1], dec[ii:ii+1],
+                                            pm_ra=pm_ra[ii:ii+1], parallax=px[ii:ii+1],
+                                            obs_metadata=obs_list[visit_index[ii]],
+                                            epoch=2000.0,
+                                            includeRefraction=includeRefraction)
+
+                self.assertEqual(control[0][0], test[0][ii])
+                self.assertEqual(control[1][0], test[1][ii])
+
+        # test that visit_index must be valid
+        with self.assertRaises(RuntimeError):
+            _observedFromICRSMultiVisit(ra, dec, visit_index.astype(float), obs_list,
+                                        epoch=2000.0)
+
+        with self.assertRaises(RuntimeError):
+            _observedFromICRSMultiVisit(ra, dec, visit_index+n_visits, obs_list,
+                                        epoch=2000.0)
+
+        with self.assertRaises(RuntimeError):
+            _observedFromICRSMultiVisit(ra, dec, visit_index, obs_list)
+
 
 class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
     pass
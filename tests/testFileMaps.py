@@ -1,6 +1,8 @@
 import os
+import numpy as np
 import unittest
 import lsst.utils.tests
+from future.utils import PY3
 
 from lsst.sims.utils import SpecMap, defaultSpecMap
 
@@ -182,6 +184,49 @@ class SpecMapTest(unittest.TestCase):
         self.assertFalse('banana' in testMap)
         self.assertTrue('abcd.txt' in testMap)
         self.assertTrue('burrows_123.txt' in testMap)
+        self.assertTrue(' burrows_123.txt' in testMap)
+        self.assertTrue(u'abcd.txt' in testMap)
+        self.assertTrue(u'burrows_123.txt' in testMap)
+        self.assertFalse(None in testMap)
+        if PY3:
+            self.assertFalse(b'km01' in testMap)
+            self.assertFalse(b'abcd.txt' in testMap)
+
+    def test_memo(self):
+        """
+        Test that memoized look-ups follow changes to the SpecMap
+        """
+        testMap = SpecMap(memoSize=2)
+        self.assertEqual(testMap['lte_11111.txt'], 'starSED/mlt/lte_11111.txt.gz')
+        self.assertFalse('banana' in testMap)
+        self.assertEqual(testMap['km30_5000.fits_g10_5040'], 'starSED/kurucz/km30_5000.fits_g10_5040.gz')
+        self.assertLessEqual(len(testMap._memo), 2)
+
+        # fileDict takes precedence over names that are already memoized
+        testMap['lte_11111.txt'] = 'file_dir/lte_11111.txt.gz'
+        self.assertEqual(testMap['lte_11111.txt'], 'file_dir/lte_11111.txt.gz')
+
+        # so does a new dirDict
+        testMap.dirDict = {'(^km)': 'dir_dir'}
+        self.assertEqual(testMap['km30_5000.fits_g10_5040'], 'dir_dir/km30_5000.fits_g10_5040.gz')
+
+    def test_resolve_many(self):
+        """
+        Test that SpecMap.resolve_many agrees with looking up each name
+        """
+        testMap = SpecMap(fileDict={'abcd.txt': 'file_dir/abcd.txt.gz'},
+                          dirDict={'(^burrows)': 'dir_dir'})
+        names = ['abcd.txt', 'km30_5000.fits_g10_5040', ' abcd.txt', 'burrows_123.txt',
+                 'Exp.40E08.02Z.spec', 'km30_5000.fits_g10_5040', 'lte_11111.txt']
+        control = [testMap[name] for name in names]
+
+        self.assertEqual(testMap.resolve_many(names).tolist(), control)
+        self.assertEqual(testMap.resolve_many(np.array(names, dtype=bytes)).tolist(), control)
+        self.assertEqual(testMap.resolve_many(np.array(names).reshape(7, 1)).shape, (7, 1))
+        self.assertEqual(len(testMap.resolve_many([])), 0)
+
+        with self.assertRaises(KeyError):
+            testMap.resolve_many(['abcd.txt', 'banana'])
 
 
 class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
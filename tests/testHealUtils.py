@@ -81,6 +81,142 @@ class TestHealUtils(unittest.TestCase):
         self.assertEqual(map3[hpid], 0.)
         self.assertEqual(hp.maptype(map3), 0)
 
+    def testBuiltinReducers(self):
+        """
+        Test that the vectorized reducers give the same results as calling
+        the equivalent numpy functions once per healpixel
+        """
+        rng = np.random.RandomState(6622)
+        nside = 16
+        n_pts = 20000
+        ra = rng.random_sample(n_pts)*360.0
+        dec = np.degrees(np.arcsin(rng.random_sample(n_pts)*2.0-1.0))
+        values = rng.normal(10.0, 3.0, n_pts)
+        values[::1000] = np.nan
+
+        for name, func in (('mean', np.mean), ('sum', np.sum), ('count', len),
+                           ('min', np.min), ('max', np.max), ('std', np.std),
+                           ('median', np.median)):
+
+            # wrapping func in a lambda forces healbin to call it per healpixel
+            control = utils.healbin(ra, dec, values, nside=nside,
+                                    reduceFunc=lambda x, func=func: func(x))
+            for reduceFunc in (name, func):
+                test = utils.healbin(ra, dec, values, nside=nside, reduceFunc=reduceFunc)
+                self.assertEqual(hp.maptype(test), 0)
+                np.testing.assert_array_equal(test == hp.UNSEEN, control == hp.UNSEEN)
+                np.testing.assert_allclose(test, control, rtol=1.0e-10, err_msg=name)
+
+        # test a map with only one occupied healpixel and no points at all
+        test = utils._healbin(np.zeros(3), np.zeros(3), np.array([1.0, 2.0, 6.0]),
+                              nside=nside, reduceFunc='median')
+        self.assertEqual(test[utils._raDec2Hpid(nside, 0.0, 0.0)], 2.0)
+        self.assertEqual((test != hp.UNSEEN).sum(), 1)
+
+        test = utils._healbin(np.zeros(0), np.zeros(0), np.zeros(0),
+                              nside=nside, reduceFunc='mean')
+        self.assertTrue((test == hp.UNSEEN).all())
+
+    def testAccumulator(self):
+        """
+        Test that HealbinAccumulator, fed in chunks (and merged), produces the
+        same maps as healbin
+        """
+        rng = np.random.RandomState(8812)
+        nside = 16
+        n_pts = 30000
+        ra = rng.random_sample(n_pts)*360.0
+        dec = np.degrees(np.arcsin(rng.random_sample(n_pts)*2.0-1.0))
+        values = rng.normal(10.0, 3.0, n_pts)
+        values[::1500] = np.nan
+        bins = np.linspace(-5.0, 25.0, 601)
+
+        accumulator = utils.HealbinAccumulator(nside=nside, histogramBins=bins)
+        for i_start in range(0, 20000, 7000):
+            i_end = min(i_start+7000, 20000)
+            accumulator.add(ra[i_start:i_end], dec[i_start:i_end], values[i_start:i_end])
+
+        other = utils.HealbinAccumulator(nside=nside, histogramBins=bins)
+        other.add(ra[20000:], dec[20000:], values[20000:])
+        accumulator.merge(other)
+
+        for name in ('mean', 'sum', 'count', 'min', 'max', 'std'):
+            control = utils.healbin(ra, dec, values, nside=nside, reduceFunc=name)
+            test = accumulator.finalize(reduceFunc=name)
+            self.assertEqual(hp.maptype(test), 0)
+            np.testing.assert_array_equal(test == hp.UNSEEN, control == hp.UNSEEN)
+            np.testing.assert_allclose(test, control, rtol=1.0e-10, err_msg=name)
+
+        # medians are only as good as the histogram bins
+        control = utils.healbin(ra, dec, values, nside=nside, reduceFunc=np.median)
+        test = accumulator.finalize(reduceFunc=np.median)
+        np.testing.assert_array_equal(test == hp.UNSEEN, control == hp.UNSEEN)
+        np.testing.assert_allclose(test, control, atol=bins[1]-bins[0])
+
+        test = accumulator.finalize(reduceFunc='quantile', q=1.0)
+        valid = np.where(test != hp.UNSEEN)
+        control = utils.healbin(ra, dec, values, nside=nside, reduceFunc='max')
+        np.testing.assert_allclose(test[valid], control[valid], atol=bins[1]-bins[0])
+
+        with self.assertRaises(ValueError):
+            utils.HealbinAccumulator(nside=nside).finalize(reduceFunc='median')
+
+        with self.assertRaises(ValueError):
+            accumulator.merge(utils.HealbinAccumulator(nside=nside*2, histogramBins=bins))
+
+        with self.assertRaises(ValueError):
+            accumulator.finalize(reduceFunc=lambda x: x[0])
+
+        partial = accumulator.finalize(reduceFunc='mean', sparse=True)
+        np.testing.assert_array_equal(partial.toDense(), accumulator.finalize(reduceFunc='mean'))
+
+    def testSparse(self):
+        """
+        Test that the sparse output modes agree with the dense ones
+        """
+        rng = np.random.RandomState(4431)
+        nside = 1024
+        n_pts = 5000
+        # a small patch of sky, with some NaNs
+        ra = 30.0 + rng.random_sample(n_pts)
+        dec = -20.0 + rng.random_sample(n_pts)
+        values = rng.random_sample(n_pts)
+        values[::100] = np.nan
+
+        for reduceFunc in ('mean', np.median, lambda x: np.max(x)):
+            dense = utils.healbin(ra, dec, values, nside=nside, reduceFunc=reduceFunc)
+            partial = utils.healbin(ra, dec, values, nside=nside, reduceFunc=reduceFunc, sparse=True)
+            self.assertIsInstance(partial, utils.PartialMap)
+            self.assertEqual(partial.nside, nside)
+            self.assertEqual(len(partial), (dense != hp.UNSEEN).sum())
+            self.assertFalse(np.isnan(partial.values).any())
+            np.testing.assert_array_equal(partial.toDense(), dense)
+            np.testing.assert_array_equal(partial.get(np.arange(len(dense))), dense)
+
+            round_trip = utils.PartialMap.fromDense(dense)
+            np.testing.assert_array_equal(round_trip.pixels, partial.pixels)
+            np.testing.assert_array_equal(round_trip.values, partial.values)
+
+        counts = utils.raDec2Hpid(nside, ra, dec, sparse=True)
+        hpids = utils.raDec2Hpid(nside, ra, dec)
+        np.testing.assert_array_equal(counts.pixels, np.unique(hpids))
+        self.assertEqual(counts.values.sum(), n_pts)
+        np.testing.assert_array_equal(counts.toDense(dtype=float),
+                                      utils.healbin(ra, dec, values, nside=nside, reduceFunc='count'))
+
+        ra_pix, dec_pix = utils.hpid2RaDec(nside, counts)
+        np.testing.assert_array_equal(utils.raDec2Hpid(nside, ra_pix, dec_pix), counts.pixels)
+        with self.assertRaises(ValueError):
+            utils.hpid2RaDec(nside//2, counts)
+
+        # pixels are sorted on construction
+        partial = utils.PartialMap(nside, [5, 1, 3], [50.0, 10.0, 30.0])
+        np.testing.assert_array_equal(partial.pixels, [1, 3, 5])
+        np.testing.assert_array_equal(partial.get([3, 4]), [30.0, hp.UNSEEN])
+
+        with self.assertRaises(ValueError):
+            utils.PartialMap(nside, [1, 1], [2.0, 3.0])
+
 
 class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
     pass
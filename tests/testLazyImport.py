@@ -0,0 +1,84 @@
+from __future__ import with_statement
+import os
+import sys
+import subprocess
+import importlib
+import unittest
+import lsst.utils.tests
+import lsst.sims.utils
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+def _modules_loaded_by(statement):
+    """
+    Execute statement in a fresh python interpreter and return a set
+    of the top-level names of the modules it loaded
+    """
+    script = ("import sys\n" + statement + "\n" +
+              "print(' '.join(sorted(set(m.split('.')[0] for m in sys.modules))))")
+    output = subprocess.check_output([sys.executable, "-c", script], env=os.environ)
+    return set(output.decode('utf-8').split())
+
+
+class LazyImportTest(unittest.TestCase):
+
+    def test_names(self):
+        """
+        Test that the names lsst/sims/utils/__init__.py reads from the source
+        of each submodule agree with the __all__ of the imported submodule
+        """
+        for module_name, names in lsst.sims.utils._lazy_names.items():
+            module = importlib.import_module('lsst.sims.utils.%s' % module_name)
+            self.assertEqual(list(names), list(module.__all__), msg=module_name)
+
+        for name in lsst.sims.utils.__all__:
+            self.assertTrue(hasattr(lsst.sims.utils, name), msg=name)
+
+        self.assertIn('m5_flat_sed', dir(lsst.sims.utils))
+        with self.assertRaises(AttributeError):
+            lsst.sims.utils.not_a_real_function
+
+    def test_no_shadowing(self):
+        """
+        Test that importing a submodule does not replace the function
+        of the same name in the package namespace
+        """
+        import lsst.sims.utils.m5_flat_sed  # noqa: F401
+        from lsst.sims.utils import m5_flat_sed
+        self.assertTrue(callable(m5_flat_sed))
+        from lsst.sims.utils import ModifiedJulianDate
+        self.assertIsInstance(ModifiedJulianDate, type)
+
+    def test_heavy_dependencies(self):
+        """
+        Test that importing the package, or a name that does not need them,
+        does not import astropy, healpy or palpy
+        """
+        heavy = set(['astropy', 'healpy', 'palpy'])
+
+        loaded = _modules_loaded_by("import lsst.sims.utils")
+        self.assertEqual(loaded & heavy, set())
+
+        loaded = _modules_loaded_by("from lsst.sims.utils import m5_flat_sed")
+        self.assertEqual(loaded & heavy, set())
+
+        loaded = _modules_loaded_by("from lsst.sims.utils import angularSeparation, haversine")
+        self.assertEqual(loaded & heavy, set())
+
+        loaded = _modules_loaded_by("from lsst.sims.utils import _galacticFromEquatorial; "
+                                    "_galacticFromEquatorial(0.1, 0.2)")
+        self.assertIn('palpy', loaded)
+
+        loaded = _modules_loaded_by("from lsst.sims.utils import ModifiedJulianDate")
+        self.assertIn('astropy', loaded)
+
+
+class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
+    pass
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
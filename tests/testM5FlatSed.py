@@ -1,6 +1,9 @@
+import numpy as np
 import unittest
 import lsst.utils.tests
-from lsst.sims.utils import m5_flat_sed
+from lsst.sims.utils import m5_flat_sed, m5_flat_sed_array
+from lsst.sims.utils import m5CoefficientTable, defaultM5Coefficients
+from lsst.sims.utils import expTime_from_m5, FWHMeff_from_m5
 
 
 def setup_module(module):
@@ -30,6 +33,86 @@ class PhotoM5Test(unittest.TestCase):
                 m5_new = m5_flat_sed(filtername, **k_new)
                 assert(m5_new < m5_baseline)
 
+    def testm5Array(self):
+        """
+        Test that m5_flat_sed_array agrees with m5_flat_sed
+        """
+        rng = np.random.RandomState(1215)
+        n_visits = 500
+        indices = rng.randint(0, 6, n_visits)
+        filters = defaultM5Coefficients['filter'][indices]
+        musky = rng.random_sample(n_visits)*4.0 + 18.0
+        FWHMeff = rng.random_sample(n_visits) + 0.5
+        expTime = rng.random_sample(n_visits)*60.0 + 5.0
+        airmass = rng.random_sample(n_visits) + 1.0
+        tauCloud = rng.random_sample(n_visits)*0.5
+
+        control = np.array([m5_flat_sed(*args) for args in
+                            zip(filters, musky, FWHMeff, expTime, airmass, tauCloud)])
+
+        test = m5_flat_sed_array(filters, musky, FWHMeff, expTime, airmass, tauCloud)
+        np.testing.assert_allclose(test, control, rtol=0.0, atol=1.0e-12)
+
+        # filter indices, bytes and broadcasting of scalars
+        np.testing.assert_array_equal(m5_flat_sed_array(indices, musky, FWHMeff, expTime, airmass, tauCloud),
+                                      test)
+        np.testing.assert_array_equal(m5_flat_sed_array(filters.astype(bytes), musky, FWHMeff, expTime,
+                                                        airmass, tauCloud), test)
+        np.testing.assert_array_equal(m5_flat_sed_array(filters.astype(object), musky, FWHMeff, expTime,
+                                                        airmass, tauCloud), test)
+        test = m5_flat_sed_array(filters, 21.0, FWHMeff, 30.0, airmass)
+        control = np.array([m5_flat_sed(ff, 21.0, fwhm, 30.0, am) for ff, fwhm, am in
+                            zip(filters, FWHMeff, airmass)])
+        np.testing.assert_allclose(test, control, rtol=0.0, atol=1.0e-12)
+
+        # a user-supplied coefficient table
+        coefficients = m5CoefficientTable(filters=['r', 'N'], Cm=[24.43, 23.0], dCm_infinity=[0.1, 0.2],
+                                          kAtm=[0.13, 0.15], msky=[21.2, 21.0])
+        test = m5_flat_sed_array(['N', 'r'], 21.0, 0.7, 30.0, 1.0, coefficients=coefficients)
+        self.assertAlmostEqual(test[1], m5_flat_sed('r', 21.0, 0.7, 30.0, 1.0), 12)
+        # musky = msky and expTime = 30 seconds
+        self.assertAlmostEqual(test[0], 23.0 + 0.2 - 1.25*np.log10(10.0**(0.8*0.2)), 12)
+
+        with self.assertRaises(RuntimeError):
+            m5_flat_sed_array(['r', 'X'], 21.0, 0.7, 30.0, 1.0)
+        with self.assertRaises(RuntimeError):
+            m5_flat_sed_array([0, 6], 21.0, 0.7, 30.0, 1.0)
+        with self.assertRaises(RuntimeError):
+            m5_flat_sed_array([0.5], 21.0, 0.7, 30.0, 1.0)
+
+    def testInverse(self):
+        """
+        Test that expTime_from_m5 and FWHMeff_from_m5 invert m5_flat_sed_array
+        """
+        rng = np.random.RandomState(3391)
+        n_visits = 1000
+        filters = defaultM5Coefficients['filter'][rng.randint(0, 6, n_visits)]
+        musky = rng.random_sample(n_visits)*4.0 + 18.0
+        FWHMeff = rng.random_sample(n_visits)*1.5 + 0.5
+        expTime = np.power(10.0, rng.random_sample(n_visits)*3.0)
+        airmass = rng.random_sample(n_visits) + 1.0
+        tauCloud = rng.random_sample(n_visits)*0.5
+
+        m5 = m5_flat_sed_array(filters, musky, FWHMeff, expTime, airmass, tauCloud)
+
+        test = expTime_from_m5(m5, filters, musky, FWHMeff, airmass, tauCloud)
+        np.testing.assert_allclose(test, expTime, rtol=1.0e-10)
+
+        test = FWHMeff_from_m5(m5, filters, musky, expTime, airmass, tauCloud)
+        np.testing.assert_allclose(test, FWHMeff, rtol=1.0e-10)
+
+        # round trip in the other direction, with a scalar filter
+        target = np.linspace(22.0, 26.0, 9)
+        expTime = expTime_from_m5(target, 'r', 21.0, 0.8, 1.2)
+        np.testing.assert_allclose(m5_flat_sed_array('r', 21.0, 0.8, expTime, 1.2), target, atol=1.0e-10)
+        self.assertTrue((np.diff(expTime) > 0.0).all())
+        self.assertAlmostEqual(expTime_from_m5(m5_flat_sed('g', 20.5, 1.1, 30.0, 1.4), 'g', 20.5, 1.1, 1.4),
+                               30.0, 10)
+
+        FWHMeff = FWHMeff_from_m5(target, 'i', 20.0, 30.0, 1.1)
+        np.testing.assert_allclose(m5_flat_sed_array('i', 20.0, FWHMeff, 30.0, 1.1), target, atol=1.0e-10)
+        self.assertTrue((np.diff(FWHMeff) < 0.0).all())
+
 
 class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
     pass
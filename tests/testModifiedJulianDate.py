@@ -2,15 +2,19 @@ from __future__ import with_statement
 from __future__ import division
 from builtins import zip
 import astropy
+from astropy.time import Time
 import unittest
 import warnings
 import numpy as np
 import os
 import copy
+import shutil
+import tempfile
 import lsst.utils.tests
 
 from lsst.utils import getPackageDir
-from lsst.sims.utils import ModifiedJulianDate, UTCtoUT1Warning
+from lsst.sims.utils import ModifiedJulianDate, ModifiedJulianDateArray, UTCtoUT1Warning
+from lsst.sims.utils import TimeScaleTables
 
 
 def setup_module(module):
@@ -327,6 +331,148 @@ class MjdTest(unittest.TestCase):
             self.assertAlmostEqual(mjd.TDB, control.TDB, tol, msg=msg)
             self.assertAlmostEqual(mjd.dut1, control.dut1, tol, msg=msg)
 
+    def test_array(self):
+        """
+        Test that ModifiedJulianDateArray gets results that are consistent
+        with creating ModifiedJulianDates by hand.
+        """
+
+        rng = np.random.RandomState(119)
+        tol = 10  # decimal place tolerance
+
+        tai_list = 40000.0 + 10000.0 * rng.random_sample(20)
+        tai_list = np.append(tai_list, 59580.0 + 10000.0 * rng.random_sample(20))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for mjd_array in (ModifiedJulianDateArray(TAI=tai_list),
+                              ModifiedJulianDateArray(UTC=ModifiedJulianDateArray(TAI=tai_list).UTC)):
+
+                self.assertEqual(len(mjd_array), len(tai_list))
+                for scale in ('TAI', 'UTC', 'TT', 'TDB', 'UT1', 'dut1'):
+                    self.assertIsInstance(getattr(mjd_array, scale), np.ndarray)
+
+                for ix, tai in enumerate(tai_list):
+                    msg = "Offending TAI: %f" % tai
+                    control = ModifiedJulianDate(TAI=tai)
+                    mjd = mjd_array[ix]
+                    self.assertIsInstance(mjd, ModifiedJulianDate)
+                    self.assertAlmostEqual(mjd.TAI, control.TAI, tol, msg=msg)
+                    self.assertAlmostEqual(mjd.UTC, control.UTC, tol, msg=msg)
+                    self.assertAlmostEqual(mjd.UT1, control.UT1, tol, msg=msg)
+                    self.assertAlmostEqual(mjd.TT, control.TT, tol, msg=msg)
+                    self.assertAlmostEqual(mjd.TDB, control.TDB, tol, msg=msg)
+                    self.assertAlmostEqual(mjd.dut1, control.dut1, tol, msg=msg)
+                    self.assertEqual(mjd_array.TT[ix], mjd.TT)
+
+                # test slicing and fancy indexing
+                sub = mjd_array[5:13]
+                self.assertIsInstance(sub, ModifiedJulianDateArray)
+                np.testing.assert_array_equal(sub.TDB, mjd_array.TDB[5:13])
+                np.testing.assert_array_equal(sub.UT1, mjd_array.UT1[5:13])
+
+                dex = np.array([31, 2, 17])
+                sub = mjd_array[dex]
+                np.testing.assert_array_equal(sub.TAI, mjd_array.TAI[dex])
+                np.testing.assert_array_equal(sub.dut1, mjd_array.dut1[dex])
+                self.assertEqual(sub[1], mjd_array[2])
+
+        # test that indexing with an int does not convert the whole array
+        mjd_array = ModifiedJulianDateArray(TAI=tai_list)
+        mjd = mjd_array[27]
+        for scale in ('UTC', 'TT', 'TDB', 'UT1', 'dut1'):
+            self.assertIsNone(mjd_array._values[scale])
+        self.assertIsNone(mjd_array._time)
+        control = ModifiedJulianDate(TAI=tai_list[27])
+        self.assertEqual(mjd.TAI, tai_list[27])
+        self.assertAlmostEqual(mjd.TDB, control.TDB, tol)
+        self.assertAlmostEqual(mjd.UT1, control.UT1, tol)
+        self.assertEqual(mjd_array[-1].TAI, tai_list[-1])
+
+        # ...but reuses the scales that have been converted
+        tt = mjd_array.TT
+        self.assertEqual(mjd_array[27].TT, tt[27])
+        self.assertIsNone(mjd_array._values['UT1'])
+
+        # test that a slice calculates its own properties lazily
+        mjd_array = ModifiedJulianDateArray(TAI=tai_list[25:])
+        sub = mjd_array[3:7]
+        np.testing.assert_array_almost_equal(sub.TT, mjd_array.TT[3:7], decimal=tol)
+
+        self.assertRaises(RuntimeError, ModifiedJulianDateArray)
+        self.assertRaises(RuntimeError, ModifiedJulianDateArray, TAI=tai_list, UTC=tai_list)
+
+    def test_time_scale_tables(self):
+        """
+        Test that converting time scales with TimeScaleTables agrees with
+        astropy.time.Time
+        """
+        rng = np.random.RandomState(4421)
+        scratch_dir = tempfile.mkdtemp()
+        file_name = os.path.join(scratch_dir, 'time_scale_tables.npz')
+        try:
+            tables = TimeScaleTables(filename=file_name)
+            self.assertTrue(os.path.exists(file_name))
+            tables_from_file = TimeScaleTables(filename=file_name)
+        finally:
+            shutil.rmtree(scratch_dir)
+
+        # dates within the IERS B table, plus dates just before leap seconds
+        tai_list = 48000.0 + 12000.0 * rng.random_sample(200)
+        tai_list = np.append(tai_list, [50447.99, 53735.9999, 56108.99995])
+
+        self.assertTrue(tables.covers(TAI=tai_list))
+        self.assertFalse(tables.covers(TAI=np.append(tai_list, 40000.0)))
+
+        for kwarg in ('TAI', 'UTC'):
+            control = Time(tai_list, scale=kwarg.lower(), format='mjd')
+            for tab in (tables, tables_from_file):
+                values, in_range = tab.convert(**{kwarg: tai_list})
+                self.assertTrue(in_range.all())
+                # tolerances in seconds
+                for ix, ref, tol in ((0, control.tai.mjd, 1.0e-6),
+                                     (1, control.utc.mjd, 1.0e-6),
+                                     (2, control.tt.mjd, 1.0e-6),
+                                     (3, control.tdb.mjd, 1.0e-5),
+                                     (4, control.ut1.mjd, 1.0e-6)):
+                    np.testing.assert_array_less(np.abs(values[ix]-ref)*86400.0, tol)
+                np.testing.assert_array_less(np.abs(values[5]-control.delta_ut1_utc), 1.0e-6)
+
+        # test that ModifiedJulianDate and ModifiedJulianDateArray use the tables
+        ModifiedJulianDate.set_time_scale_tables(tables)
+        try:
+            mjd_array = ModifiedJulianDateArray(TAI=tai_list)
+            self.assertIsNone(mjd_array._time)
+            for ix, tai in enumerate(tai_list[:10]):
+                mjd = ModifiedJulianDate(TAI=tai)
+                self.assertIsNone(mjd._time)
+                control = Time(tai, scale='tai', format='mjd')
+                self.assertAlmostEqual(mjd.UTC, control.utc.mjd, 10)
+                self.assertLess(np.abs(mjd.TDB-control.tdb.mjd)*86400.0, 1.0e-5)
+                self.assertAlmostEqual(mjd.UT1, control.ut1.mjd, 10)
+                self.assertEqual(mjd.TDB, mjd_array.TDB[ix])
+            self.assertIsNone(mjd_array._time)
+
+            # dates outside of the UT1 table still warn, once for UT1 and
+            # once for dut1, as they do without the tables
+            with warnings.catch_warnings(record=True) as w_list:
+                warnings.simplefilter("always")
+                mjd = ModifiedJulianDate(TAI=80000.0)
+                self.assertEqual(mjd.UT1, mjd.UTC)
+                self.assertEqual(mjd.dut1, 0.0)
+                self.assertEqual(mjd.UT1, mjd.UTC)
+                self.assertEqual(mjd.dut1, 0.0)
+            self.assertEqual(len(w_list), 2)
+            for w, name in zip(w_list, ('UT1', 'dut1')):
+                self.assertIsInstance(w.message, UTCtoUT1Warning)
+                self.assertIn('ModifiedJulianDate.%s\n' % name, str(w.message))
+
+            # dates before the leap second table fall back on astropy
+            mjd = ModifiedJulianDate(TAI=40000.0)
+            self.assertIsNotNone(mjd._time)
+        finally:
+            ModifiedJulianDate.set_time_scale_tables(None)
+
 
 class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
     pass
@@ -0,0 +1,56 @@
+"""
+An in-memory SQLite database of points on the sky, used to check the
+queries returned by to_SQL() and to_healpixSQL() (and by the benchmarks)
+"""
+from builtins import range
+import sqlite3
+import numpy as np
+
+__all__ = ["createPointDatabase"]
+
+
+def _sqlFunction(func):
+    """
+    Wrap the numpy function func so that SQLite can call it
+    """
+    return lambda *args: float(func(*args))
+
+
+def createPointDatabase(ra, dec, hpid=None, tableName='points'):
+    """
+    Return a connection to an in-memory SQLite database with a table of
+    (id, ra, dec) or, if hpid is given, (id, ra, dec, hpid), indexed on each
+    column but id.
+
+    The database defines the SQL functions that the queries returned by
+    to_SQL() use but that SQLite lacks.
+
+    @param [in] ra is a numpy array of RA in degrees
+
+    @param [in] dec is a numpy array of Dec in degrees
+
+    @param [in] hpid is an optional numpy array of HEALPix pixel numbers
+
+    @param [in] tableName is the name of the table
+    """
+    connection = sqlite3.connect(':memory:')
+    for name, func in (('ASIN', np.arcsin), ('SQRT', np.sqrt), ('SIN', np.sin),
+                       ('COS', np.cos), ('POWER', np.power)):
+        connection.create_function(name, -1, _sqlFunction(func))
+    connection.create_function('PI', 0, lambda: np.pi)
+
+    columns = [range(len(ra)), ra.tolist(), dec.tolist()]
+    if hpid is None:
+        connection.execute('CREATE TABLE %s (id int, ra real, dec real)' % tableName)
+    else:
+        connection.execute('CREATE TABLE %s (id int, ra real, dec real, hpid int)' % tableName)
+        columns.append(hpid.tolist())
+    connection.executemany('INSERT INTO %s VALUES (%s)' % (tableName, ', '.join(['?']*len(columns))),
+                           zip(*columns))
+
+    connection.execute('CREATE INDEX ra_index ON %s (ra)' % tableName)
+    connection.execute('CREATE INDEX dec_index ON %s (dec)' % tableName)
+    if hpid is not None:
+        connection.execute('CREATE INDEX hpid_index ON %s (hpid)' % tableName)
+    connection.execute('ANALYZE')
+    return connection
@@ -4,7 +4,9 @@ import numpy as np
 import unittest
 import lsst.utils.tests
 from lsst.sims.utils import ObservationMetaData, ModifiedJulianDate
-from lsst.sims.utils import Site, BoxBounds, CircleBounds
+from lsst.sims.utils import Site, BoxBounds, CircleBounds, PolygonBounds
+from lsst.sims.utils import _raDecFromPupilCoords
+from lsst.sims.utils import _observedFromICRS
 
 
 def setup_module(module):
@@ -229,6 +231,44 @@ class ObservationMetaDataTest(unittest.TestCase):
         boundControl = BoxBounds(0.0, 0.0, np.radians([0.1, 0.3]))
         self.assertEqual(boxObs.bounds, boundControl)
 
+    def testPolygonBounds(self):
+        """
+        Test that ObservationMetaData builds polygon bounds from the outline
+        of the camera
+        """
+        obs = ObservationMetaData(boundType='polygon', pointingRA=35.0, pointingDec=-40.0,
+                                  rotSkyPos=27.0, boundLength=1.5, mjd=59580.1)
+        self.assertIsInstance(obs.bounds, PolygonBounds)
+
+        halfWidth = np.tan(np.radians(1.5))
+        xCorner = np.array([halfWidth, -halfWidth, -halfWidth, halfWidth])
+        yCorner = np.array([halfWidth, halfWidth, -halfWidth, -halfWidth])
+        raCorner, decCorner = _raDecFromPupilCoords(xCorner, yCorner, obs_metadata=obs)
+        np.testing.assert_array_equal(obs.bounds.vertexRA, raCorner % (2.0*np.pi))
+        np.testing.assert_array_equal(obs.bounds.vertexDEC, decCorner)
+
+        rng = np.random.RandomState(311)
+        xPupil = (rng.random_sample(2000) - 0.5)*4.0*halfWidth
+        yPupil = (rng.random_sample(2000) - 0.5)*4.0*halfWidth
+        ra, dec = _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=obs)
+        inside = obs.bounds._contains(ra, dec)
+        safelyInside = (np.abs(xPupil) < 0.999*halfWidth) & (np.abs(yPupil) < 0.999*halfWidth)
+        safelyOutside = (np.abs(xPupil) > 1.001*halfWidth) | (np.abs(yPupil) > 1.001*halfWidth)
+        self.assertGreater(safelyInside.sum(), 0)
+        self.assertTrue(inside[safelyInside].all())
+        self.assertFalse(inside[safelyOutside].any())
+
+        # the bounds follow rotSkyPos
+        obs.rotSkyPos = 72.0
+        raCorner, decCorner = _raDecFromPupilCoords(xCorner, yCorner, obs_metadata=obs)
+        np.testing.assert_array_equal(obs.bounds.vertexDEC, decCorner)
+
+        # without rotSkyPos, the polygon is a rectangle aligned with RA, Dec
+        obs = ObservationMetaData(boundType='polygon', pointingRA=35.0, pointingDec=-40.0,
+                                  boundLength=[1.5, 1.0])
+        self.assertEqual(obs.bounds, PolygonBounds(np.radians(35.0), np.radians(-40.0),
+                                                   np.radians([1.5, 1.0])))
+
     def testBounds(self):
         """
         Test if ObservationMetaData correctly assigns the pointing[RA,Dec]
@@ -458,6 +498,36 @@ class ObservationMetaDataTest(unittest.TestCase):
         self.assertFalse(ref_obs == other_obs)
         self.assertTrue(ref_obs != other_obs)
 
+    def testObservedPointing(self):
+        """
+        Test that the memoized observed pointing matches _observedFromICRS
+        and is recalculated when the pointing, date or site changes
+        """
+
+        def control(obs, epoch=2000.0, includeRefraction=True):
+            return _observedFromICRS(obs._pointingRA, obs._pointingDec, obs_metadata=obs,
+                                     epoch=epoch, includeRefraction=includeRefraction)
+
+        obs = ObservationMetaData(pointingRA=25.0, pointingDec=-42.0, mjd=59580.0)
+
+        for epoch in (2000.0, 1950.0):
+            for includeRefraction in (True, False):
+                np.testing.assert_array_equal(obs._observedPointing(epoch=epoch,
+                                                                    includeRefraction=includeRefraction),
+                                              control(obs, epoch, includeRefraction))
+
+        self.assertIs(obs._observedPointing(), obs._observedPointing())
+
+        obs.pointingRA = 35.0
+        np.testing.assert_array_equal(obs._observedPointing(), control(obs))
+        obs.pointingDec = -12.0
+        np.testing.assert_array_equal(obs._observedPointing(), control(obs))
+        obs.mjd = 59590.0
+        np.testing.assert_array_equal(obs._observedPointing(), control(obs))
+        obs.site = Site(longitude=10.0, latitude=-20.0, height=100.0,
+                        temperature=20.0, pressure=800.0, humidity=0.5, lapseRate=0.005)
+        np.testing.assert_array_equal(obs._observedPointing(), control(obs))
+
 
 class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
     pass
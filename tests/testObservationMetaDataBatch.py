@@ -0,0 +1,117 @@
+from __future__ import with_statement
+from builtins import range
+
+import numpy as np
+import unittest
+import lsst.utils.tests
+from lsst.sims.utils import ObservationMetaData, ObservationMetaDataBatch
+from lsst.sims.utils import Site
+from lsst.sims.utils import _observedFromICRS, _observedFromICRSMultiVisit
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class ObservationMetaDataBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(8812)
+        self.n_pointings = 20
+        self.ra = rng.random_sample(self.n_pointings)*360.0
+        self.dec = rng.random_sample(self.n_pointings)*90.0-90.0
+        self.mjd = 59580.0+rng.random_sample(self.n_pointings)*3650.0
+        self.rotSkyPos = rng.random_sample(self.n_pointings)*360.0
+        self.bandpass = np.array([('u', 'g', 'r', 'i', 'z', 'y')[ii % 6]
+                                  for ii in range(self.n_pointings)])
+        self.m5 = rng.random_sample(self.n_pointings)*3.0+22.0
+        self.seeing = rng.random_sample(self.n_pointings)+0.5
+        self.skyBrightness = rng.random_sample(self.n_pointings)+19.0
+
+        self.batch = ObservationMetaDataBatch(self.ra, self.dec, self.mjd,
+                                              rotSkyPos=self.rotSkyPos,
+                                              bandpassName=self.bandpass,
+                                              m5=self.m5, seeing=self.seeing,
+                                              skyBrightness=self.skyBrightness,
+                                              boundType='circle', boundLength=1.75)
+
+    def testExceptions(self):
+        """
+        Test that exceptions are raised when the columns are inconsistent
+        """
+        with self.assertRaises(RuntimeError):
+            ObservationMetaDataBatch(self.ra, self.dec[:-1], self.mjd)
+        with self.assertRaises(RuntimeError):
+            ObservationMetaDataBatch(self.ra, self.dec, None)
+        with self.assertRaises(RuntimeError):
+            ObservationMetaDataBatch(list(self.ra), self.dec, self.mjd)
+        with self.assertRaises(RuntimeError):
+            ObservationMetaDataBatch(self.ra, self.dec, self.mjd, m5=self.m5)
+        with self.assertRaises(IndexError):
+            self.batch[self.n_pointings]
+
+    def testIndexing(self):
+        """
+        Test that indexing with an int returns the correct ObservationMetaData
+        """
+        self.assertEqual(len(self.batch), self.n_pointings)
+        for ix in range(self.n_pointings):
+            control = ObservationMetaData(pointingRA=self.ra[ix], pointingDec=self.dec[ix],
+                                          mjd=self.mjd[ix], rotSkyPos=self.rotSkyPos[ix],
+                                          bandpassName=self.bandpass[ix], m5=self.m5[ix],
+                                          seeing=self.seeing[ix],
+                                          skyBrightness=self.skyBrightness[ix],
+                                          boundType='circle', boundLength=1.75,
+                                          site=Site(name='LSST'))
+            self.assertEqual(self.batch[ix], control)
+
+        self.assertEqual(self.batch[-1], self.batch[self.n_pointings-1])
+        self.assertEqual(len(list(self.batch)), self.n_pointings)
+
+    def testSlicing(self):
+        """
+        Test that slicing returns views into the original columns and that
+        fancy indexing selects the correct pointings
+        """
+        sub = self.batch[3:11]
+        self.assertIsInstance(sub, ObservationMetaDataBatch)
+        self.assertEqual(len(sub), 8)
+        self.assertTrue(np.shares_memory(sub.pointingRA, self.ra))
+        self.assertTrue(np.shares_memory(sub.mjd, self.mjd))
+        np.testing.assert_array_equal(sub.m5, self.m5[3:11])
+        self.assertEqual(sub[0], self.batch[3])
+
+        dex = np.array([17, 2, 9])
+        sub = self.batch[dex]
+        self.assertEqual(len(sub), 3)
+        for ii, ix in enumerate(dex):
+            self.assertEqual(sub[ii], self.batch[ix])
+
+        sub = self.batch[self.m5 > 23.0]
+        np.testing.assert_array_equal(sub.seeing, self.seeing[self.m5 > 23.0])
+
+    def testMultiVisit(self):
+        """
+        Test that ObservationMetaDataBatch can be passed to the multi-visit
+        coordinate transformations
+        """
+        rng = np.random.RandomState(441)
+        n_obj = 50
+        ra = rng.random_sample(n_obj)*2.0*np.pi
+        dec = rng.random_sample(n_obj)*np.pi-0.5*np.pi
+        visit_index = rng.randint(0, self.n_pointings, n_obj)
+        test = _observedFromICRSMultiVisit(ra, dec, visit_index, self.batch, epoch=2000.0)
+        for ii in range(n_obj):
+            control = _observedFromICRS(ra[ii:ii+1], dec[ii:ii+1],
+                                        obs_metadata=self.batch[visit_index[ii]],
+                                        epoch=2000.0)
+            self.assertEqual(control[0][0], test[0][ii])
+            self.assertEqual(control[1][0], test[1][ii])
+
+
+class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
+    pass
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -1,7 +1,11 @@
 from __future__ import division
 from builtins import zip
 from builtins import range
+import os
+import shutil
+import tempfile
 import numpy as np
+import palpy
 import unittest
 import lsst.utils.tests
 
@@ -12,6 +16,11 @@ from lsst.sims.utils import _observedFromICRS, _icrsFromObserved
 from lsst.sims.utils import haversine, arcsecFromRadians, solarRaDec, ModifiedJulianDate, distanceToSun
 from lsst.sims.utils import raDecFromAltAz, observedFromICRS, icrsFromObserved
 from lsst.sims.utils import radiansFromArcsec
+from lsst.sims.utils import AstrometryContext
+from lsst.sims.utils import _pupilCoordsFromRaDecMultiVisit
+from lsst.sims.utils.FocalPlaneUtils import _gnomonicProjection
+from lsst.sims.utils import _raDecFromPupilCoordsGrid, raDecFromPupilCoordsGrid
+from lsst.sims.utils import _fieldOfViewIndices, fieldOfViewIndices
 
 
 def setup_module(module):
@@ -253,6 +262,252 @@ class PupilCoordinateUnitTest(unittest.TestCase):
                 np.testing.assert_equal(xt, np.NaN)
                 np.testing.assert_equal(yt, np.NaN)
 
+    def testGnomonicProjection(self):
+        """
+        Test that _gnomonicProjection agrees with palpy.ds2tp, and returns NaN
+        wherever palpy.ds2tp raises an exception
+        """
+        rng = np.random.RandomState(7781)
+        nSamples = 1000
+        raPointing = 1.2
+        decPointing = -0.4
+        raList = rng.random_sample(nSamples)*2.0*np.pi
+        decList = np.arcsin(rng.random_sample(nSamples)*2.0-1.0)
+        raList[3] = np.NaN
+        decList[7] = np.NaN
+
+        xTest, yTest = _gnomonicProjection(raList, decList, raPointing, decPointing)
+
+        nValid = 0
+        for ra, dec, xt, yt in zip(raList, decList, xTest, yTest):
+            try:
+                xc, yc = palpy.ds2tp(ra, dec, raPointing, decPointing)
+            except ValueError:
+                self.assertTrue(np.isnan(xt))
+                self.assertTrue(np.isnan(yt))
+                continue
+            nValid += 1
+            self.assertAlmostEqual(xt, xc, delta=1.0e-12*max(1.0, abs(xc)))
+            self.assertAlmostEqual(yt, yc, delta=1.0e-12*max(1.0, abs(yc)))
+
+        self.assertGreater(nValid, nSamples//3)
+        self.assertLess(nValid, nSamples - nSamples//3)
+
+        xTest, yTest = _gnomonicProjection(0.1, 0.2, 0.0, 0.0)
+        xControl, yControl = palpy.ds2tp(0.1, 0.2, 0.0, 0.0)
+        self.assertAlmostEqual(xTest, xControl, 12)
+        self.assertAlmostEqual(yTest, yControl, 12)
+        self.assertTrue(np.isnan(_gnomonicProjection(2.0, 0.0, 0.0, 0.0)[0]))
+
+    def testGrid(self):
+        """
+        Test that _raDecFromPupilCoordsGrid agrees with _raDecFromPupilCoords
+        """
+        obs = ObservationMetaData(pointingRA=10.0, pointingDec=10.0,
+                                  rotSkyPos=33.0, mjd=59580.05)
+        xPupil = np.linspace(0.01, 0.0135, 150)
+        yPupil = np.linspace(-0.02, -0.0165, 120)
+        xMesh, yMesh = np.meshgrid(xPupil, yPupil)
+        raControl, decControl = _raDecFromPupilCoords(xMesh.flatten(), yMesh.flatten(),
+                                                      obs_metadata=obs)
+        raControl = raControl.reshape(xMesh.shape)
+        decControl = decControl.reshape(xMesh.shape)
+
+        raTest, decTest = _raDecFromPupilCoordsGrid(xPupil, yPupil, obs, tolerance=1.0e-6)
+        self.assertEqual(raTest.shape, (120, 150))
+        self.assertEqual(raTest.dtype, np.float64)
+        distance = arcsecFromRadians(haversine(raTest, decTest, raControl, decControl))
+        self.assertLess(distance.max(), 1.0e-6)
+
+        raTest, decTest = raDecFromPupilCoordsGrid(xPupil, yPupil, obs, dtype=np.float32)
+        self.assertEqual(raTest.dtype, np.float32)
+        np.testing.assert_allclose(raTest, np.degrees(raControl), rtol=1.0e-6)
+        np.testing.assert_allclose(decTest, np.degrees(decControl), rtol=1.0e-6)
+
+        # an unreachable tolerance makes every point be transformed exactly
+        raTest, decTest = _raDecFromPupilCoordsGrid(xPupil, yPupil, obs, tolerance=0.0)
+        np.testing.assert_array_equal(raTest, raControl)
+        np.testing.assert_array_equal(decTest, decControl)
+
+        # output into memory-mapped files
+        scratchDir = tempfile.mkdtemp()
+        try:
+            raOut = np.lib.format.open_memmap(os.path.join(scratchDir, 'ra.npy'), mode='w+',
+                                              dtype=np.float32, shape=(120, 150))
+            decOut = np.lib.format.open_memmap(os.path.join(scratchDir, 'dec.npy'), mode='w+',
+                                               dtype=np.float32, shape=(120, 150))
+            raTest, decTest = raDecFromPupilCoordsGrid(xPupil, yPupil, obs, out=(raOut, decOut))
+            self.assertIs(raTest, raOut)
+            self.assertIs(decTest, decOut)
+            raOut.flush()
+            decOut.flush()
+            del raOut, decOut, raTest, decTest
+            np.testing.assert_allclose(np.load(os.path.join(scratchDir, 'ra.npy')),
+                                       np.degrees(raControl), rtol=1.0e-6)
+        finally:
+            shutil.rmtree(scratchDir)
+
+        with self.assertRaises(RuntimeError):
+            _raDecFromPupilCoordsGrid(xPupil, yPupil, obs, out=(np.zeros((150, 120)),
+                                                                np.zeros((150, 120))))
+        with self.assertRaises(RuntimeError):
+            _raDecFromPupilCoordsGrid(xMesh, yMesh, obs)
+
+        # invalid arguments are reported before the (here, 8 TB) output is allocated
+        xHuge = np.linspace(0.01, 0.0135, 1000000)
+        for badObs in (None,
+                       ObservationMetaData(pointingRA=10.0, pointingDec=10.0, mjd=59580.05),
+                       ObservationMetaData(pointingRA=10.0, pointingDec=10.0, rotSkyPos=33.0)):
+            with self.assertRaises(RuntimeError):
+                _raDecFromPupilCoordsGrid(xHuge, xHuge, badObs)
+            with self.assertRaises(RuntimeError):
+                raDecFromPupilCoordsGrid(xHuge, xHuge, badObs)
+
+    def testFieldOfViewIndices(self):
+        """
+        Test that _fieldOfViewIndices keeps every point that lands in the
+        field of view and drops points far from it
+        """
+        rng = np.random.RandomState(7734)
+        n_pts = 20000
+        radius = 1.75
+        for raPointing, decPointing, mjd in ((10.0, 10.0, 59580.05), (200.0, -60.0, 53000.3),
+                                             (359.5, 0.5, 51544.9)):
+            obs = ObservationMetaData(pointingRA=raPointing, pointingDec=decPointing,
+                                      rotSkyPos=12.0, mjd=mjd,
+                                      boundType='circle', boundLength=radius)
+
+            # points within 3 degrees of the pointing
+            rr = np.radians(3.0)*np.sqrt(rng.random_sample(n_pts))
+            theta = rng.random_sample(n_pts)*2.0*np.pi
+            ra, dec = palpy.dtp2sVector(rr*np.cos(theta), rr*np.sin(theta),
+                                        obs._pointingRA, obs._pointingDec)
+            pm_ra = radiansFromArcsec(rng.normal(0.0, 2.0, n_pts))
+            pm_dec = radiansFromArcsec(rng.normal(0.0, 2.0, n_pts))
+            parallax = radiansFromArcsec(rng.random_sample(n_pts))
+
+            for includeRefraction in (True, False):
+                xPupil, yPupil = _pupilCoordsFromRaDec(ra, dec, pm_ra=pm_ra, pm_dec=pm_dec,
+                                                       parallax=parallax, obs_metadata=obs,
+                                                       epoch=1990.0,
+                                                       includeRefraction=includeRefraction)
+                inField = np.where(np.arctan(np.hypot(xPupil, yPupil)) <= np.radians(radius))[0]
+                self.assertGreater(len(inField), 0)
+
+                indices = _fieldOfViewIndices(ra, dec, obs, pm_ra=pm_ra, pm_dec=pm_dec,
+                                              parallax=parallax, epoch=1990.0,
+                                              includeRefraction=includeRefraction)
+                self.assertEqual(len(np.setdiff1d(inField, indices)), 0)
+                self.assertLess(len(indices), n_pts)
+
+                # points well outside the field are dropped
+                distance = haversine(ra, dec, obs._pointingRA, obs._pointingDec)
+                far = np.where(distance > np.radians(radius + 0.2))[0]
+                self.assertEqual(len(np.intersect1d(far, indices)), 0)
+
+            # the degree-based version agrees
+            np.testing.assert_array_equal(fieldOfViewIndices(np.degrees(ra), np.degrees(dec), obs),
+                                          _fieldOfViewIndices(ra, dec, obs))
+
+        # polygon bounds, whose corners are farther from the pointing than boundLength
+        obs = ObservationMetaData(pointingRA=30.0, pointingDec=-20.0, rotSkyPos=45.0, mjd=59580.1,
+                                  boundType='polygon', boundLength=1.75)
+        rr = np.radians(3.0)*np.sqrt(rng.random_sample(n_pts))
+        theta = rng.random_sample(n_pts)*2.0*np.pi
+        ra, dec = palpy.dtp2sVector(rr*np.cos(theta), rr*np.sin(theta),
+                                    obs._pointingRA, obs._pointingDec)
+        inBounds = np.where(obs.bounds._contains(ra, dec))[0]
+        self.assertGreater(len(inBounds), 0)
+        self.assertGreater(haversine(ra[inBounds], dec[inBounds],
+                                     obs._pointingRA, obs._pointingDec).max(), np.radians(2.0))
+        indices = _fieldOfViewIndices(ra, dec, obs)
+        self.assertEqual(len(np.setdiff1d(inBounds, indices)), 0)
+        self.assertLess(len(indices), n_pts)
+
+        obs = ObservationMetaData(pointingRA=50.0, pointingDec=-20.0, mjd=57000.0,
+                                  boundType='circle', boundLength=1.0)
+        indices = fieldOfViewIndices(np.array([50.0, 50.0, 50.5, 52.0]),
+                                     np.array([-20.0, -21.3, -20.3, -20.0]), obs)
+        np.testing.assert_array_equal(indices, [0, 2])
+
+        # NaNs are dropped
+        indices = fieldOfViewIndices(np.array([50.0, np.NaN]), np.array([-20.0, -20.0]), obs)
+        np.testing.assert_array_equal(indices, [0])
+
+        with self.assertRaises(RuntimeError):
+            fieldOfViewIndices(np.array([50.0]), np.array([-20.0]),
+                               ObservationMetaData(pointingRA=50.0, pointingDec=-20.0, mjd=57000.0))
+
+        with self.assertRaises(RuntimeError):
+            fieldOfViewIndices(np.array([50.0]), np.array([-20.0]), None)
+
+    def testContext(self):
+        """
+        Test that passing an AstrometryContext to _pupilCoordsFromRaDec and
+        _raDecFromPupilCoords does not change the results
+        """
+        obs = ObservationMetaData(pointingRA=42.0, pointingDec=-28.0,
+                                  rotSkyPos=111.0, mjd=52356.0)
+        context = AstrometryContext(obs)
+
+        nSamples = 100
+        rng = np.random.RandomState(99)
+        raList = np.radians(rng.random_sample(nSamples) * 2.0 + 41.0)
+        decList = np.radians(rng.random_sample(nSamples) * 2.0 - 29.0)
+
+        xControl, yControl = _pupilCoordsFromRaDec(raList, decList,
+                                                   obs_metadata=obs,
+                                                   epoch=2000.0)
+
+        xTest, yTest = _pupilCoordsFromRaDec(raList, decList,
+                                             context=context,
+                                             epoch=2000.0)
+
+        np.testing.assert_array_equal(xTest, xControl)
+        np.testing.assert_array_equal(yTest, yControl)
+
+        raControl, decControl = _raDecFromPupilCoords(xControl, yControl,
+                                                      obs_metadata=obs,
+                                                      epoch=2000.0)
+
+        raTest, decTest = _raDecFromPupilCoords(xControl, yControl,
+                                                context=context,
+                                                epoch=2000.0)
+
+        np.testing.assert_array_equal(raTest, raControl)
+        np.testing.assert_array_equal(decTest, decControl)
+
+    def testMultiVisit(self):
+        """
+        Test that _pupilCoordsFromRaDecMultiVisit gives the same results
+        as calling _pupilCoordsFromRaDec one visit at a time
+        """
+        rng = np.random.RandomState(7134)
+        n_visits = 5
+        obs_list = [ObservationMetaData(pointingRA=42.0+rng.random_sample(),
+                                        pointingDec=-28.0+rng.random_sample(),
+                                        rotSkyPos=rng.random_sample()*360.0,
+                                        mjd=52356.0+rng.random_sample()*100.0)
+                    for ii in range(n_visits)]
+
+        nSamples = 100
+        raList = np.radians(rng.random_sample(nSamples) * 2.0 + 41.5)
+        decList = np.radians(rng.random_sample(nSamples) * 2.0 - 28.5)
+        visit_index = rng.randint(0, n_visits, nSamples)
+
+        xTest, yTest = _pupilCoordsFromRaDecMultiVisit(raList, decList,
+                                                       visit_index, obs_list,
+                                                       epoch=2000.0)
+
+        for ix in range(n_visits):
+            valid = np.where(visit_index == ix)
+            xControl, yControl = _pupilCoordsFromRaDec(raList[valid], decList[valid],
+                                                       obs_metadata=obs_list[ix],
+                                                       epoch=2000.0)
+
+            np.testing.assert_array_equal(xTest[valid], xControl)
+            np.testing.assert_array_equal(yTest[valid], yControl)
+
     def test_with_proper_motion(self):
         """
         Test that calculating pupil coordinates in the presence of proper motion, parallax,
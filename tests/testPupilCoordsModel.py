@@ -0,0 +1,108 @@
+import numpy as np
+import unittest
+import lsst.utils.tests
+from lsst.sims.utils import ObservationMetaData, PupilCoordsModel
+from lsst.sims.utils import _pupilCoordsFromRaDec, _raDecFromPupilCoords
+from lsst.sims.utils import pupilCoordsFromRaDec, raDecFromPupilCoords
+from lsst.sims.utils import arcsecFromRadians, haversine
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class PupilCoordsModelTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.obs = ObservationMetaData(pointingRA=10.0, pointingDec=10.0,
+                                      rotSkyPos=33.0, mjd=59580.05)
+        cls.model = PupilCoordsModel(cls.obs, radius=1.75, order=4, tolerance=0.001)
+
+        rng = np.random.RandomState(5512)
+        nSamples = 2000
+        cls.ra = 10.0 + (rng.random_sample(nSamples)-0.5)*3.0
+        cls.dec = 10.0 + (rng.random_sample(nSamples)-0.5)*3.0
+
+    def testFit(self):
+        """
+        Test that the model reproduces the exact transformations to within
+        its accuracy budget
+        """
+        self.assertTrue(self.model.useFit)
+        self.assertLess(self.model.maxResidual, 0.001)
+        self.assertLess(self.model.maxInverseResidual, 0.001)
+
+        xTest, yTest = self.model.pupilCoordsFromRaDec(self.ra, self.dec)
+        xControl, yControl = pupilCoordsFromRaDec(self.ra, self.dec, obs_metadata=self.obs)
+        self.assertLess(arcsecFromRadians(np.hypot(xTest-xControl, yTest-yControl)).max(), 0.001)
+
+        raTest, decTest = self.model.raDecFromPupilCoords(xControl, yControl)
+        raControl, decControl = raDecFromPupilCoords(xControl, yControl, obs_metadata=self.obs)
+        distance = arcsecFromRadians(haversine(np.radians(raTest), np.radians(decTest),
+                                               np.radians(raControl), np.radians(decControl)))
+        self.assertLess(distance.max(), 0.001)
+
+        # numbers as well as arrays
+        xTest, yTest = self.model.pupilCoordsFromRaDec(self.ra[0], self.dec[0])
+        self.assertAlmostEqual(xTest, xControl[0], 10)
+        self.assertAlmostEqual(yTest, yControl[0], 10)
+        raTest, decTest = self.model._raDecFromPupilCoords(xControl[0], yControl[0])
+        self.assertAlmostEqual(raTest, np.radians(raControl[0]), 10)
+        self.assertAlmostEqual(decTest, np.radians(decControl[0]), 10)
+
+    def testOutsideField(self):
+        """
+        Test that points outside of the fitted field of view (and NaNs) are
+        transformed exactly
+        """
+        ra = np.radians(np.array([10.0, 15.0, 10.0, 190.0, np.NaN]))
+        dec = np.radians(np.array([10.0, 5.0, -30.0, -10.0, 10.0]))
+        xTest, yTest = self.model._pupilCoordsFromRaDec(ra, dec)
+        xControl, yControl = _pupilCoordsFromRaDec(ra, dec, obs_metadata=self.obs)
+        np.testing.assert_array_equal(xTest[1:], xControl[1:])
+        np.testing.assert_array_equal(yTest[1:], yControl[1:])
+
+        xPupil = np.array([0.0, 0.05, -0.2, np.NaN])
+        yPupil = np.array([0.0, 0.05, 0.1, 0.0])
+        raTest, decTest = self.model._raDecFromPupilCoords(xPupil, yPupil)
+        raControl, decControl = _raDecFromPupilCoords(xPupil, yPupil, obs_metadata=self.obs)
+        np.testing.assert_array_equal(raTest[1:], raControl[1:])
+        np.testing.assert_array_equal(decTest[1:], decControl[1:])
+
+    def testFallback(self):
+        """
+        Test that a model which misses its accuracy budget uses the
+        exact transformations
+        """
+        model = PupilCoordsModel(self.obs, order=1, tolerance=0.001)
+        self.assertFalse(model.useFit)
+        self.assertGreater(model.maxResidual, 0.001)
+
+        xTest, yTest = model.pupilCoordsFromRaDec(self.ra, self.dec)
+        xControl, yControl = pupilCoordsFromRaDec(self.ra, self.dec, obs_metadata=self.obs)
+        np.testing.assert_array_equal(xTest, xControl)
+        np.testing.assert_array_equal(yTest, yControl)
+
+        raTest, decTest = model.raDecFromPupilCoords(xControl, yControl)
+        raControl, decControl = raDecFromPupilCoords(xControl, yControl, obs_metadata=self.obs)
+        np.testing.assert_array_equal(raTest, raControl)
+        np.testing.assert_array_equal(decTest, decControl)
+
+    def testExceptions(self):
+        with self.assertRaises(RuntimeError):
+            PupilCoordsModel(None)
+        with self.assertRaises(RuntimeError):
+            PupilCoordsModel(ObservationMetaData(mjd=59580.0, rotSkyPos=0.0))
+        with self.assertRaises(RuntimeError):
+            PupilCoordsModel(self.obs, order=6, nGrid=5)
+        with self.assertRaises(RuntimeError):
+            self.model.pupilCoordsFromRaDec(self.ra, self.dec[:5])
+
+
+class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
+    pass
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,151 @@
+from __future__ import with_statement
+import os
+import gzip
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+import unittest
+import lsst.utils.tests
+from lsst.sims.utils import SpecMap, SedCache
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+def writeSed(fileName, wavelen, flux):
+    # Python 2's gzip does not support text mode
+    with gzip.open(fileName, 'wb') as outputFile:
+        outputFile.write(b'# Wavelength(nm) Flambda(ergs/cm^2/s/nm)\n')
+        for ww, ff in zip(wavelen, flux):
+            outputFile.write(('%.6f %.10e\n' % (ww, ff)).encode('ascii'))
+
+
+def loadSum(args):
+    cacheDir, sedDir, name = args
+    specMap = SpecMap(dirDict={'(^kp)': 'starSED/kurucz'})
+    wavelen, flux = SedCache(cacheDir, sedDir, specMap=specMap).load(name)
+    return float(wavelen.sum()), float(flux.sum())
+
+
+class SedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratchDir = tempfile.mkdtemp()
+        self.sedDir = os.path.join(self.scratchDir, 'seds')
+        self.cacheDir = os.path.join(self.scratchDir, 'cache')
+        os.makedirs(os.path.join(self.sedDir, 'starSED', 'kurucz'))
+        os.makedirs(os.path.join(self.sedDir, 'ssmSED'))
+
+        rng = np.random.RandomState(5512)
+        self.wavelen = np.arange(300.0, 1200.0, 0.5)
+        self.flux = {}
+        for name in ('kp10_9000.fits_g40_9100', 'kp00_6000.fits_g45_6000'):
+            self.flux[name] = rng.random_sample(len(self.wavelen))*1.0e-12
+            writeSed(os.path.join(self.sedDir, 'starSED', 'kurucz', name + '.gz'),
+                     self.wavelen, self.flux[name])
+        self.flux['A.dat'] = rng.random_sample(len(self.wavelen))
+        writeSed(os.path.join(self.sedDir, 'ssmSED', 'A.dat.gz'), self.wavelen, self.flux['A.dat'])
+
+        self.specMap = SpecMap(fileDict={'A.dat': 'ssmSED/A.dat.gz'},
+                               dirDict={'(^kp)': 'starSED/kurucz'})
+
+    def tearDown(self):
+        shutil.rmtree(self.scratchDir)
+
+    def testLoad(self):
+        """
+        Test that SedCache returns the spectra in the SED library and reuses
+        its entries
+        """
+        cache = SedCache(self.cacheDir, self.sedDir, specMap=self.specMap)
+        for name in self.flux:
+            wavelen, flux = cache.load(name)
+            self.assertIsInstance(wavelen, np.memmap)
+            self.assertFalse(flux.flags.writeable)
+            np.testing.assert_allclose(wavelen, self.wavelen, rtol=1.0e-12)
+            np.testing.assert_allclose(flux, self.flux[name], rtol=1.0e-9)
+            self.assertTrue(os.path.exists(cache.entryPath(name)))
+        self.assertEqual(len(cache.entries()), 3)
+
+        # a second load reads the entry rather than writing a new one
+        name = 'kp10_9000.fits_g40_9100'
+        entry = cache.entryPath(name)
+        inode = os.stat(entry).st_ino
+        wavelen, flux = cache.load(' ' + name + '.gz')
+        np.testing.assert_allclose(flux, self.flux[name], rtol=1.0e-9)
+        self.assertEqual(cache.entryPath(name), entry)
+        self.assertEqual(os.stat(entry).st_ino, inode)
+
+        # changing the source file invalidates the entry
+        stat = os.stat(cache.sourcePath(name))
+        writeSed(cache.sourcePath(name), self.wavelen, 2.0*self.flux[name])
+        os.utime(cache.sourcePath(name), (stat.st_atime, stat.st_mtime + 10.0))
+        self.assertNotEqual(cache.entryPath(name), entry)
+        wavelen, flux = cache.load(name)
+        np.testing.assert_allclose(flux, 2.0*self.flux[name], rtol=1.0e-9)
+        self.assertFalse(os.path.exists(entry))
+        self.assertEqual(len(cache.entries()), 3)
+
+        with self.assertRaises(KeyError):
+            cache.load('banana')
+
+    def testEvict(self):
+        """
+        Test that SedCache evicts the least recently used entries
+        """
+        cache = SedCache(self.cacheDir, self.sedDir, specMap=self.specMap)
+        names = ['kp10_9000.fits_g40_9100', 'kp00_6000.fits_g45_6000', 'A.dat']
+        for ii, name in enumerate(names):
+            cache.load(name)
+            os.utime(cache.entryPath(name), (1.0e9 + ii, 1.0e9 + ii))
+        entrySize = os.path.getsize(cache.entryPath(names[0]))
+
+        # using an entry makes it the most recently used
+        cache.load(names[0])
+        self.assertEqual(cache.evict(2*entrySize), entrySize)
+        self.assertFalse(os.path.exists(cache.entryPath(names[1])))
+        self.assertTrue(os.path.exists(cache.entryPath(names[0])))
+
+        with self.assertRaises(RuntimeError):
+            cache.evict()
+
+        # a size limit is enforced as entries are added
+        cache = SedCache(self.cacheDir, self.sedDir, specMap=self.specMap, maxBytes=entrySize)
+        wavelen, flux = cache.load(names[1])
+        np.testing.assert_allclose(flux, self.flux[names[1]], rtol=1.0e-9)
+        self.assertEqual([entry[0] for entry in cache.entries()], [cache.entryPath(names[1])])
+
+        self.assertEqual(cache.evict(0), entrySize)
+        self.assertEqual(len(cache.entries()), 0)
+
+    def testConcurrentPopulation(self):
+        """
+        Test several processes populating the same entries at once
+        """
+        names = ['kp10_9000.fits_g40_9100', 'kp00_6000.fits_g45_6000']*8
+        pool = multiprocessing.Pool(4)
+        try:
+            results = pool.map(loadSum, [(self.cacheDir, self.sedDir, name) for name in names])
+        finally:
+            pool.close()
+            pool.join()
+
+        for name, result in zip(names, results):
+            self.assertAlmostEqual(result[0], self.wavelen.sum(), 6)
+            self.assertAlmostEqual(result[1]/self.flux[name].sum(), 1.0, 9)
+
+        cache = SedCache(self.cacheDir, self.sedDir, specMap=self.specMap)
+        self.assertEqual(len(cache.entries()), 2)
+        for dirName, subDirs, fileNames in os.walk(self.cacheDir):
+            for fileName in fileNames:
+                self.assertTrue(fileName.endswith('.npy'))
+
+
+class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
+    pass
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -1,9 +1,13 @@
 from __future__ import with_statement
 
 import numpy as np
+import healpy as hp
+import palpy
 import unittest
 import lsst.utils.tests
-from lsst.sims.utils import SpatialBounds, CircleBounds, BoxBounds
+from testModules.pointDatabase import createPointDatabase
+from lsst.sims.utils import SpatialBounds, CircleBounds, BoxBounds, PolygonBounds
+from lsst.sims.utils import haversine
 
 
 def setup_module(module):
@@ -118,6 +122,240 @@ class SpatialBoundsTest(unittest.TestCase):
         self.assertRaises(RuntimeError, SpatialBounds.getSpatialBounds,
                           'box', 1.0, 2.0, 'moreUtterNonsense')
 
+    def selectWithSQL(self, bounds, ra, dec, where=None):
+        """
+        Return a boolean mask of the points (ra, dec in degrees) selected by
+        bounds.to_SQL() (or the condition where) from an in-memory SQLite database
+        """
+        if where is None:
+            where = bounds.to_SQL('ra', 'dec', dialect='sqlite')
+        connection = createPointDatabase(ra, dec)
+        selected = connection.execute('SELECT id FROM points WHERE %s' % where).fetchall()
+        connection.close()
+        mask = np.zeros(len(ra), dtype=bool)
+        mask[[row[0] for row in selected]] = True
+        return mask
+
+    def testSQL(self):
+        """
+        Test that the queries returned by to_SQL can use the indexes on RA and Dec
+        and select the same points as the queries they replace
+        """
+        rng = np.random.RandomState(5521)
+        n_pts = 20000
+        ra = rng.random_sample(n_pts)*360.0
+        dec = np.degrees(np.arcsin(rng.random_sample(n_pts)*2.0 - 1.0))
+        connection = createPointDatabase(ra, dec)
+
+        for raCenter in (150.0, 1.0, 359.0):
+            circle = CircleBounds(np.radians(raCenter), np.radians(-25.0), np.radians(3.0))
+            box = BoxBounds(np.radians(raCenter), np.radians(-25.0), np.radians(3.0))
+
+            for bound in (circle, box):
+                where = bound.to_SQL('ra', 'dec')
+                self.assertTrue(where.startswith('dec between'))
+                self.assertNotIn('not between', where)
+                plan = ' '.join(str(row) for row in
+                                connection.execute('EXPLAIN QUERY PLAN SELECT id FROM points WHERE %s'
+                                                   % where).fetchall())
+                self.assertIn('USING INDEX', plan)
+                self.assertNotIn('SCAN points', plan.replace('SCAN TABLE', 'SCAN'))
+
+                selected = np.zeros(n_pts, dtype=bool)
+                selected[[row[0] for row in
+                          connection.execute('SELECT id FROM points WHERE %s' % where).fetchall()]] = True
+                self.assertGreater(selected.sum(), 0)
+                np.testing.assert_array_equal(selected, bound.contains(ra, dec))
+
+            # the query formerly returned for boxes
+            if box.RAminDeg > box.RAmaxDeg:
+                where = ("ra not between %f and %f and dec between %f and %f"
+                         % (box.RAmaxDeg, box.RAminDeg, box.DECminDeg, box.DECmaxDeg))
+            else:
+                where = ("ra between %f and %f and dec between %f and %f"
+                         % (box.RAminDeg, box.RAmaxDeg, box.DECminDeg, box.DECmaxDeg))
+            np.testing.assert_array_equal(self.selectWithSQL(box, ra, dec),
+                                          self.selectWithSQL(box, ra, dec, where=where))
+
+        connection.close()
+
+        self.assertIn('SQUARE(', circle.to_SQL('ra', 'dec', dialect='mssql'))
+        self.assertNotIn('SQUARE(', circle.to_SQL('ra', 'dec'))
+        with self.assertRaises(RuntimeError):
+            circle.to_SQL('ra', 'dec', dialect='notADialect')
+        with self.assertRaises(RuntimeError):
+            box.to_SQL('ra', 'dec', dialect='notADialect')
+
+    def testContains(self):
+        """
+        Test that contains() selects the same points as to_SQL() and, for
+        circles, the points within the radius
+        """
+        rng = np.random.RandomState(9913)
+        n_pts = 3000
+
+        for raCenter, decCenter, length in ((30.0, -20.0, 2.0), (200.0, 70.0, 5.0),
+                                            (120.0, 0.0, [3.0, 1.0])):
+            ra = raCenter + (rng.random_sample(n_pts) - 0.5)*30.0
+            dec = decCenter + (rng.random_sample(n_pts) - 0.5)*15.0
+
+            bounds = [BoxBounds(np.radians(raCenter), np.radians(decCenter), np.radians(length))]
+            if not hasattr(length, '__len__'):
+                bounds.append(CircleBounds(np.radians(raCenter), np.radians(decCenter),
+                                           np.radians(length)))
+
+            for bound in bounds:
+                test = bound.contains(ra, dec)
+                self.assertEqual(test.dtype, bool)
+                self.assertGreater(test.sum(), 0)
+                np.testing.assert_array_equal(test, self.selectWithSQL(bound, ra, dec))
+                np.testing.assert_array_equal(test, bound._contains(np.radians(ra), np.radians(dec)))
+
+        # bounds straddling RA = 0
+        ra = (rng.random_sample(n_pts) - 0.5)*20.0
+        dec = -10.0 + (rng.random_sample(n_pts) - 0.5)*20.0
+        circle = CircleBounds(np.radians(359.0), np.radians(-10.0), np.radians(4.0))
+        distance = haversine(np.radians(ra), np.radians(dec), circle.RA, circle.DEC)
+        np.testing.assert_array_equal(circle.contains(ra, dec), distance < circle.radius)
+        np.testing.assert_array_equal(circle.contains(ra % 360.0, dec), distance < circle.radius)
+        np.testing.assert_array_equal(circle.contains(ra, dec), self.selectWithSQL(circle, ra % 360.0, dec))
+
+        box = BoxBounds(np.radians(359.0), np.radians(-10.0), np.radians(4.0))
+        control = (np.abs((ra - 359.0 + 180.0) % 360.0 - 180.0) <= 4.0) & (np.abs(dec + 10.0) <= 4.0)
+        np.testing.assert_array_equal(box.contains(ra, dec), control)
+        np.testing.assert_array_equal(box.contains(ra, dec), self.selectWithSQL(box, ra % 360.0, dec))
+
+        # a circle around the pole
+        circle = CircleBounds(0.0, np.radians(89.0), np.radians(3.0))
+        ra = rng.random_sample(n_pts)*360.0
+        dec = 80.0 + rng.random_sample(n_pts)*10.0
+        distance = haversine(np.radians(ra), np.radians(dec), circle.RA, circle.DEC)
+        np.testing.assert_array_equal(circle.contains(ra, dec), distance < circle.radius)
+
+        # NaNs are not contained
+        self.assertFalse(circle.contains(np.array([np.NaN]), np.array([89.0]))[0])
+
+    def testHealpix(self):
+        """
+        Test that the HEALPix pixel ranges returned by the bounds cover every
+        point in the bounds, and that to_healpixSQL and healpixMask agree
+        """
+        rng = np.random.RandomState(7120)
+        n_pts = 20000
+        nside = 1024
+        ra = rng.random_sample(n_pts)*360.0
+        dec = np.degrees(np.arcsin(rng.random_sample(n_pts)*2.0 - 1.0))
+        hpids = hp.ang2pix(nside, np.radians(90.0 - dec), np.radians(ra), nest=True)
+
+        connection = createPointDatabase(ra, dec, hpid=hpids)
+
+        bounds = []
+        for raCenter, decCenter in ((150.0, -25.0), (359.0, 10.0), (20.0, 87.0), (200.0, -89.0)):
+            bounds.append(CircleBounds(np.radians(raCenter), np.radians(decCenter), np.radians(5.0)))
+            bounds.append(BoxBounds(np.radians(raCenter), np.radians(decCenter), np.radians([8.0, 4.0])))
+
+        for bound in bounds:
+            inside = bound.contains(ra, dec)
+            self.assertGreater(inside.sum(), 0)
+
+            fineRanges = bound.healpixRanges(nside)
+            coarseRanges = bound.healpixRanges(nside, coarseNside=64)
+            self.assertEqual(fineRanges.shape[1], 2)
+            self.assertLess(len(coarseRanges), len(fineRanges))
+            self.assertTrue((np.diff(fineRanges.flatten()) >= 0).all())
+
+            for coarseNside in (None, 64):
+                mask = bound.healpixMask(hpids, nside, coarseNside=coarseNside)
+                self.assertTrue(mask[inside].all())
+                # the pixels do not cover much more than the bounds
+                self.assertLess(mask.sum(), 2*inside.sum() + 50)
+
+                where = bound.to_healpixSQL('hpid', nside, coarseNside=coarseNside)
+                selected = np.zeros(n_pts, dtype=bool)
+                selected[[row[0] for row in
+                          connection.execute('SELECT id FROM points WHERE %s' % where).fetchall()]] = True
+                np.testing.assert_array_equal(selected, mask)
+
+                plan = ' '.join(str(row) for row in
+                                connection.execute('EXPLAIN QUERY PLAN SELECT id FROM points WHERE %s'
+                                                   % where).fetchall())
+                self.assertIn('USING', plan)
+                self.assertIn('INDEX hpid_index', plan)
+
+        connection.close()
+
+        with self.assertRaises(RuntimeError):
+            bounds[0].healpixRanges(64, coarseNside=128)
+        with self.assertRaises(RuntimeError):
+            bounds[0].healpixRanges(100)
+
+    def testPolygon(self):
+        """
+        Test that PolygonBounds contains the points inside of its outline
+        """
+        rng = np.random.RandomState(4402)
+        n_pts = 20000
+
+        # an L-shaped polygon on the plane tangent to the sky, in radians
+        xOutline = np.radians(np.array([-1.0, 2.0, 2.0, 0.5, 0.5, -1.0]))
+        yOutline = np.radians(np.array([-1.5, -1.5, 0.0, 0.0, 1.5, 1.5]))
+
+        def inOutline(x, y):
+            return (((x > xOutline[0]) & (x < xOutline[1]) & (y > yOutline[0]) & (y < yOutline[2])) |
+                    ((x > xOutline[0]) & (x < xOutline[3]) & (y > yOutline[0]) & (y < yOutline[4])))
+
+        for raCenter, decCenter in ((150.0, -25.0), (0.3, 10.0), (20.0, 88.5), (200.0, -89.0)):
+            raCenter = np.radians(raCenter)
+            decCenter = np.radians(decCenter)
+            raVertex, decVertex = palpy.dtp2sVector(xOutline, yOutline, raCenter, decCenter)
+            polygon = PolygonBounds(raCenter, decCenter, np.array([raVertex, decVertex]).transpose())
+            self.assertEqual(polygon, SpatialBounds.getSpatialBounds('polygon', raCenter, decCenter,
+                                                                     np.array([raVertex, decVertex]).T))
+            # the polygon can be given in either direction
+            reverse = PolygonBounds(raCenter, decCenter, np.array([raVertex, decVertex]).T[::-1])
+
+            x = (rng.random_sample(n_pts) - 0.5)*np.radians(6.0)
+            y = (rng.random_sample(n_pts) - 0.5)*np.radians(6.0)
+            ra, dec = palpy.dtp2sVector(x, y, raCenter, decCenter)
+
+            control = inOutline(x, y)
+            self.assertGreater(control.sum(), 0)
+            test = polygon._contains(ra, dec)
+            np.testing.assert_array_equal(test, control)
+            np.testing.assert_array_equal(polygon.contains(np.degrees(ra), np.degrees(dec)), control)
+            np.testing.assert_array_equal(reverse._contains(ra, dec), control)
+
+            # the bounding cap encloses the polygon
+            cap = CircleBounds(raCenter, decCenter, polygon.radius)
+            self.assertTrue(cap._contains(ra, dec)[control].all())
+            self.assertEqual(polygon.to_SQL('ra', 'dec'), cap.to_SQL('ra', 'dec'))
+            self.assertLess(control.sum(), cap._contains(ra, dec).sum())
+
+            hpids = hp.ang2pix(64, 0.5*np.pi - dec, ra, nest=True)
+            self.assertTrue(polygon.healpixMask(hpids, 64)[control].all())
+
+        # a rectangle specified by its half widths
+        polygon = PolygonBounds(np.radians(30.0), np.radians(-45.0), np.radians([1.0, 2.0]))
+        x = (rng.random_sample(n_pts) - 0.5)*np.radians(6.0)
+        y = (rng.random_sample(n_pts) - 0.5)*np.radians(6.0)
+        ra, dec = palpy.dtp2sVector(x, y, np.radians(30.0), np.radians(-45.0))
+        control = (np.abs(x) < np.tan(np.radians(1.0))) & (np.abs(y) < np.tan(np.radians(2.0)))
+        np.testing.assert_array_equal(polygon._contains(ra, dec), control)
+        self.assertEqual(PolygonBounds(np.radians(30.0), np.radians(-45.0), np.radians(1.0)),
+                         PolygonBounds(np.radians(30.0), np.radians(-45.0), np.radians([1.0, 1.0])))
+
+        # points on the far side of the sky
+        self.assertFalse(polygon._contains(np.array([np.radians(210.0)]), np.array([np.radians(45.0)]))[0])
+
+        with self.assertRaises(RuntimeError):
+            PolygonBounds(0.0, 0.0, np.array([[0.0, 0.0], [0.1, 0.0]]))
+        with self.assertRaises(RuntimeError):
+            PolygonBounds(0.0, 0.0, np.array([[0.0, 0.0], [0.1, 0.0], [3.0, 0.0]]))
+        with self.assertRaises(RuntimeError):
+            PolygonBounds(0.0, 0.0, 'abcde')
+        with self.assertRaises(RuntimeError):
+            PolygonBounds('a', 0.0, 0.1)
+
     def test_eq(self):
         """
         Test that we have implemented __eq__and __ne__ correctly
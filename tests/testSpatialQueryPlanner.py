@@ -0,0 +1,119 @@
+from __future__ import with_statement
+
+import numpy as np
+import healpy as hp
+import unittest
+import lsst.utils.tests
+from testModules.pointDatabase import createPointDatabase
+from lsst.sims.utils import ObservationMetaDataBatch, CircleBounds, BoxBounds
+from lsst.sims.utils import SpatialQueryPlanner
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+class SpatialQueryPlannerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.RandomState(6611)
+        cls.nside = 64
+        n_pts = 30000
+        cls.ra = rng.random_sample(n_pts)*360.0
+        cls.dec = np.degrees(np.arcsin(rng.random_sample(n_pts)*2.0 - 1.0))
+        cls.hpid = hp.ang2pix(cls.nside, np.radians(90.0 - cls.dec), np.radians(cls.ra), nest=True)
+
+        cls.connection = createPointDatabase(cls.ra, cls.dec, hpid=cls.hpid, tableName='stars')
+
+        # two deep drilling fields visited many times with small dithers,
+        # and some isolated visits
+        raVisit = np.concatenate((10.0 + rng.normal(0.0, 0.2, 30), 150.0 + rng.normal(0.0, 0.2, 30),
+                                  rng.random_sample(10)*360.0))
+        decVisit = np.concatenate((-45.0 + rng.normal(0.0, 0.2, 30), 2.0 + rng.normal(0.0, 0.2, 30),
+                                   rng.random_sample(10)*60.0 - 80.0))
+        cls.batch = ObservationMetaDataBatch(raVisit, decVisit, 59580.0 + np.arange(len(raVisit)),
+                                             boundType='circle', boundLength=1.75)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.connection.close()
+
+    def select(self, where):
+        return np.array([row[0] for row in
+                         self.connection.execute('SELECT id FROM stars WHERE %s' % where).fetchall()],
+                        dtype=int)
+
+    def checkPlan(self, planner, boundsList, useHealpix):
+        """
+        Check that the rows assigned to each visit by the planner are the rows
+        that the visit's own query selects
+        """
+        assigned = [[] for bounds in boundsList]
+        for region in planner.regions:
+            if useHealpix:
+                ids = self.select(region.to_healpixSQL('hpid'))
+            else:
+                ids = self.select(region.to_SQL('ra', 'dec'))
+            for visit, dex in planner.visitRows(region, self.ra[ids], self.dec[ids]):
+                assigned[visit].append(ids[dex])
+
+        for visit, bounds in enumerate(boundsList):
+            test = np.sort(np.concatenate(assigned[visit]))
+            control = np.sort(self.select(bounds.to_SQL('ra', 'dec')))
+            self.assertGreater(len(control), 0)
+            np.testing.assert_array_equal(test, control)
+
+    def testPlanner(self):
+        """
+        Test that SpatialQueryPlanner merges overlapping visits and assigns
+        each visit the rows it would have selected by itself
+        """
+        boundsList = [obs.bounds for obs in self.batch]
+        planner = SpatialQueryPlanner(self.batch, nside=self.nside)
+
+        # the deep drilling fields are queried once each
+        self.assertLessEqual(len(planner.regions), 12)
+        self.assertEqual(sum(len(region.visits) for region in planner.regions), len(boundsList))
+        for region in planner.regions:
+            # the ranges are sorted, disjoint and not adjacent
+            self.assertTrue((region.ranges[:, 1] >= region.ranges[:, 0]).all())
+            self.assertTrue((region.ranges[1:, 0] > region.ranges[:-1, 1] + 1).all())
+
+        for useHealpix in (True, False):
+            self.checkPlan(planner, boundsList, useHealpix)
+
+        # regions split into tiles
+        planner = SpatialQueryPlanner(boundsList, nside=self.nside, tileNside=8)
+        self.assertGreater(len(planner.regions), 2)
+        # (the circles queried by to_SQL overlap, but each row is assigned once)
+        for useHealpix in (True, False):
+            self.checkPlan(planner, boundsList, useHealpix)
+
+        # pixels are never queried twice
+        pixels = np.concatenate([region.pixels for region in planner.regions])
+        self.assertEqual(len(pixels), len(np.unique(pixels)))
+
+    def testMixedBounds(self):
+        """
+        Test planning for different kinds of bounds
+        """
+        boundsList = [CircleBounds(np.radians(359.5), np.radians(-10.0), np.radians(2.0)),
+                      BoxBounds(np.radians(1.0), np.radians(-10.0), np.radians([2.0, 1.0])),
+                      CircleBounds(np.radians(100.0), np.radians(87.0), np.radians(4.0))]
+        planner = SpatialQueryPlanner(boundsList, nside=self.nside)
+        self.assertEqual(len(planner.regions), 2)
+        self.checkPlan(planner, boundsList, True)
+
+        with self.assertRaises(RuntimeError):
+            SpatialQueryPlanner([boundsList[0], None])
+        with self.assertRaises(RuntimeError):
+            SpatialQueryPlanner(boundsList, nside=8, tileNside=16)
+
+
+class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
+    pass
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
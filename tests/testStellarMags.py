@@ -38,6 +38,47 @@ class StellarMagsTest(unittest.TestCase):
         for key in mags:
             self.assertLess(mags[key], mags2[key])
 
+    def testSMArray(self):
+        """
+        Test that stellarMagsArray agrees with stellarMags
+        """
+        keys = ['O', 'B', 'A', 'F', 'G', 'K', 'M',
+                'HeWD_25200_80', 'WD_11000_85', 'WD_3000_85']
+        rng = np.random.RandomState(4417)
+        n_stars = 200
+        indices = rng.randint(0, len(keys), n_stars)
+        stellarType = np.array(keys)[indices]
+        rmag = rng.random_sample(n_stars)*10.0 + 15.0
+
+        result = utils.stellarMagsArray(stellarType, rmag)
+        for fn in ['u', 'g', 'r', 'i', 'z', 'y']:
+            self.assertEqual(result[fn].shape, (n_stars,))
+            control = np.array([utils.stellarMags(st, rmag=rr)[fn] for st, rr in zip(stellarType, rmag)])
+            np.testing.assert_allclose(result[fn], control, rtol=0.0, atol=1.0e-12)
+
+        # integer codes, bytes and a scalar rmag
+        for test in (utils.stellarMagsArray(indices, rmag),
+                     utils.stellarMagsArray(stellarType.astype(bytes), rmag)):
+            for fn in result:
+                np.testing.assert_array_equal(test[fn], result[fn])
+        test = utils.stellarMagsArray(stellarType)
+        for fn in result:
+            np.testing.assert_allclose(test[fn], result[fn] - rmag + 19.0, rtol=0.0, atol=1.0e-12)
+
+        # a scalar type with an array of magnitudes
+        test = utils.stellarMagsArray('G', rmag)
+        control = utils.stellarMags('G', rmag=rmag)
+        for fn in result:
+            self.assertEqual(test[fn].shape, (n_stars,))
+            np.testing.assert_allclose(test[fn], control[fn], rtol=0.0, atol=1.0e-12)
+
+        # unknown types are reported together
+        with self.assertRaises(ValueError) as context:
+            utils.stellarMagsArray(['G', 'ack', 'M', 'foo', 'ack'])
+        self.assertIn('ack, foo', context.exception.args[0])
+        self.assertRaises(ValueError, utils.stellarMagsArray, [0, len(keys)])
+        self.assertRaises(ValueError, utils.stellarMagsArray, [0.5])
+
 
 class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
     pass
@@ -5,6 +5,7 @@ import lsst.utils.tests
 
 from lsst.sims.utils import raDecFromNativeLonLat, nativeLonLatFromRaDec
 from lsst.sims.utils import _raDecFromNativeLonLat, _nativeLonLatFromRaDec
+from lsst.sims.utils import _nativeLonLatFromPointing, _lonLatFromNativeLonLat
 from lsst.sims.utils import observedFromICRS, icrsFromObserved
 from lsst.sims.utils import ObservationMetaData, haversine
 from lsst.sims.utils import arcsecFromRadians, raDecFromAltAz, Site
@@ -267,6 +268,50 @@ class NativeLonLatTest(unittest.TestCase):
         np.testing.assert_array_almost_equal(np.radians(raDeg), raRad, 15)
         np.testing.assert_array_almost_equal(np.radians(decDeg), decRad, 15)
 
+    def testPointingKernels(self):
+        """
+        Test that the vectorized _nativeLonLatFromPointing and
+        _lonLatFromNativeLonLat agree with their scalar evaluations, handle the
+        boresight, the poles and NaNs, and fill output buffers
+        """
+        rng = np.random.RandomState(1129)
+        nSamples = 1000
+        lonPointing = 1.1
+        latPointing = -0.6
+        lon = rng.random_sample(nSamples) * 2.0 * np.pi
+        lat = np.arcsin(rng.random_sample(nSamples) * 2.0 - 1.0)
+        lon[:4] = [lonPointing, 0.0, 0.0, np.NaN]
+        lat[:4] = [latPointing, 0.5 * np.pi, -0.5 * np.pi, 0.2]
+
+        for func in (_nativeLonLatFromPointing, _lonLatFromNativeLonLat):
+            lonTest, latTest = func(lon, lat, lonPointing, latPointing)
+            self.assertTrue((lonTest >= 0.0).all())
+            self.assertTrue((lonTest < 2.0 * np.pi).all())
+            self.assertEqual(lonTest[3], 0.0)
+            # (native longitude is undefined at the boresight, so skip it)
+            for ix in range(1, nSamples):
+                lonControl, latControl = func(lon[ix], lat[ix], lonPointing, latPointing)
+                self.assertAlmostEqual(lonTest[ix], lonControl, 10)
+                np.testing.assert_almost_equal(latTest[ix], latControl, 10)
+
+            lonBuffer = np.zeros(nSamples)
+            latBuffer = np.zeros(nSamples)
+            lonOut, latOut = func(lon, lat, lonPointing, latPointing, out=(lonBuffer, latBuffer))
+            self.assertIs(lonOut, lonBuffer)
+            self.assertIs(latOut, latBuffer)
+            np.testing.assert_array_equal(lonBuffer, lonTest)
+            np.testing.assert_array_equal(latBuffer, latTest)
+
+        # the boresight is the native pole
+        lonTest, latTest = _nativeLonLatFromPointing(lonPointing, latPointing, lonPointing, latPointing)
+        self.assertAlmostEqual(latTest, 0.5 * np.pi, 10)
+
+        # and the round trip recovers the input positions
+        nativeLon, nativeLat = _nativeLonLatFromPointing(lon[4:], lat[4:], lonPointing, latPointing)
+        lonTest, latTest = _lonLatFromNativeLonLat(nativeLon, nativeLat, lonPointing, latPointing)
+        distance = arcsecFromRadians(haversine(lonTest, latTest, lon[4:], lat[4:]))
+        self.assertLess(distance.max(), 1.0e-6)
+
 
 class MemoryTestClass(lsst.utils.tests.MemoryTestCase):
     pass